@@ -0,0 +1,350 @@
+# Core/bom.py
+"""
+Motor de costos para recetas anidadas (bill of materials).
+
+Una receta (subproducto) rinde una cantidad (``rendimiento``, p. ej. 2 kg de
+masa; por defecto 1 unit = un lote) y cada línea usa una materia prima del
+inventario o parte del rendimiento de otra receta:
+
+    Relleno  <- Jarabe (300 ml) + Fresa (200 g)
+    Jarabe   <- Azúcar (500 g) + Agua (500 ml), rinde 800 ml
+
+El grafo vive en memoria junto con sus aristas inversas (quién usa a quién).
+El costo de cada receta se memoiza; cuando cambia el costo promedio de una
+materia prima solo se invalidan las recetas que la usan directa o
+indirectamente. repreciar_todo() recalcula el catálogo completo en una sola
+pasada en orden topológico (cada receta después de las que usa).
+"""
+
+import threading
+from collections import defaultdict
+from Core.logger import setup_logger
+from Core.money import ZERO, to_decimal, divide
+from Core.units import convert_to_base
+
+logger = setup_logger("bom")
+
+MATERIA = "materia"
+RECETA = "receta"
+
+
+class BomEngine:
+    def __init__(self):
+        self._lock = threading.RLock()
+        # receta_id -> {'nombre', 'rendimiento' (base), 'unidad_base', 'lineas': [(tipo, ref, cantidad_base, unidad_base)]}
+        self._recetas = {}
+        self._costos = {}                   # producto -> (costo_promedio_ponderado, unidad_base)
+        self._usado_por = defaultdict(set)  # (tipo, ref) -> {receta_id que la usa}
+        self._memo = {}                     # receta_id -> costo de un lote (Decimal sin redondear)
+        self.version = 0                    # bumped whenever a recipe is added, replaced or removed
+
+    # --- Grafo ---
+
+    @staticmethod
+    def _linea(ing):
+        """{'producto' | 'subproducto_id', 'cantidad', 'unidad'} -> (tipo, ref, cantidad_base, unidad_base)."""
+        cantidad_base, unidad_base = convert_to_base(ing['cantidad'], ing['unidad'])
+        if cantidad_base is None or cantidad_base <= 0:
+            raise ValueError(f"Cantidad o unidad inválida: {ing['cantidad']} {ing['unidad']}")
+        if ing.get('subproducto_id') is not None:
+            return (RECETA, int(ing['subproducto_id']), cantidad_base, unidad_base)
+        return (MATERIA, ing['producto'], cantidad_base, unidad_base)
+
+    def set_receta(self, receta_id, nombre, ingredientes, rendimiento=1, unidad_rendimiento="unit"):
+        """
+        Adds or replaces a recipe. ``ingredientes`` uses the crear_subproducto format,
+        with ``subproducto_id`` instead of ``producto`` for nested recipes.
+        Raises ValueError on invalid units or if the recipe would use itself.
+        """
+        rendimiento_base, unidad_base = convert_to_base(rendimiento, unidad_rendimiento)
+        if rendimiento_base is None or rendimiento_base <= 0:
+            raise ValueError(f"Rendimiento inválido: {rendimiento} {unidad_rendimiento}")
+        lineas = [self._linea(ing) for ing in ingredientes]
+
+        with self._lock:
+            anterior = self._recetas.get(receta_id)
+            self._desenlazar(receta_id)
+            self._recetas[receta_id] = {
+                'nombre': nombre, 'rendimiento': rendimiento_base,
+                'unidad_base': unidad_base, 'lineas': lineas,
+            }
+            for tipo, ref, _, _ in lineas:
+                self._usado_por[(tipo, ref)].add(receta_id)
+            # Only a recipe that something already uses can close a cycle (loading
+            # a catalog bottom-up never walks the subtree)
+            if self._usado_por.get((RECETA, receta_id)) and self._alcanza(receta_id, receta_id):
+                self._desenlazar(receta_id)
+                del self._recetas[receta_id]
+                if anterior is not None:
+                    self._recetas[receta_id] = anterior
+                    for tipo, ref, _, _ in anterior['lineas']:
+                        self._usado_por[(tipo, ref)].add(receta_id)
+                raise ValueError(f"La receta '{nombre}' se usaría a sí misma")
+            self.invalidar(RECETA, receta_id)
+            self.version += 1
+
+    def remove_receta(self, receta_id):
+        with self._lock:
+            self.invalidar(RECETA, receta_id)
+            self._desenlazar(receta_id)
+            self._recetas.pop(receta_id, None)
+            self.version += 1
+
+    def _desenlazar(self, receta_id):
+        receta = self._recetas.get(receta_id)
+        if receta is None:
+            return
+        for tipo, ref, _, _ in receta['lineas']:
+            usuarios = self._usado_por.get((tipo, ref))
+            if usuarios is not None:
+                usuarios.discard(receta_id)
+                if not usuarios:
+                    del self._usado_por[(tipo, ref)]
+
+    def _alcanza(self, origen, destino):
+        """True if ``destino`` is used (directly or not) by the recipes under ``origen``."""
+        pendientes = [ref for tipo, ref, _, _ in self._recetas[origen]['lineas'] if tipo == RECETA]
+        vistos = set()
+        while pendientes:
+            actual = pendientes.pop()
+            if actual == destino:
+                return True
+            if actual in vistos or actual not in self._recetas:
+                continue
+            vistos.add(actual)
+            pendientes.extend(ref for tipo, ref, _, _ in self._recetas[actual]['lineas'] if tipo == RECETA)
+        return False
+
+    def __contains__(self, receta_id):
+        return receta_id in self._recetas
+
+    def recetas(self):
+        with self._lock:
+            return list(self._recetas)
+
+    def nombre(self, receta_id):
+        with self._lock:
+            receta = self._recetas.get(receta_id)
+            if receta is None:
+                raise ValueError(f"Receta {receta_id} no encontrada")
+            return receta['nombre']
+
+    # --- Costos de materias primas e invalidación ---
+
+    def set_costos_materia(self, costos):
+        """
+        :param costos: {producto: (costo_promedio_ponderado, unidad_base)}.
+        Only recipes above a product whose cost actually changed are invalidated.
+        :return: set of invalidated recipe ids.
+        """
+        invalidadas = set()
+        with self._lock:
+            for producto, (costo, unidad_base) in costos.items():
+                nuevo = (to_decimal(costo), unidad_base)
+                if self._costos.get(producto) == nuevo:
+                    continue
+                self._costos[producto] = nuevo
+                invalidadas |= self.invalidar(MATERIA, producto)
+        return invalidadas
+
+    def invalidar(self, tipo, ref):
+        """
+        Drops the memoized cost of every recipe that uses (tipo, ref), transitively.
+        Returns the ids whose cost was dropped.
+        """
+        invalidadas = set()
+        with self._lock:
+            pendientes = [ref] if tipo == RECETA else list(self._usado_por.get((tipo, ref), ()))
+            while pendientes:
+                receta_id = pendientes.pop()
+                # A memoized recipe always has its whole subtree memoized, so
+                # nothing above a recipe without a cost can have one either
+                if receta_id in invalidadas or receta_id not in self._memo:
+                    continue
+                invalidadas.add(receta_id)
+                self._memo.pop(receta_id, None)
+                pendientes.extend(self._usado_por.get((RECETA, receta_id), ()))
+        return invalidadas
+
+    # --- Rollup ---
+
+    def orden_topologico(self, ids=None, omitir=()):
+        """
+        Recipes in ``ids`` (all by default) plus everything they use, each one
+        after the recipes it uses. Recipes in ``omitir`` are not visited (nor
+        what is below them). Raises ValueError on a missing recipe.
+        """
+        with self._lock:
+            orden, vistos = [], set()
+            for raiz in (self._recetas if ids is None else ids):
+                if raiz in vistos:
+                    continue
+                # Iterative post-order DFS: deep catalogs do not hit the recursion limit
+                pila = [(raiz, False)]
+                while pila:
+                    receta_id, expandida = pila.pop()
+                    if expandida:
+                        orden.append(receta_id)
+                        continue
+                    if receta_id in vistos:
+                        continue
+                    if receta_id not in self._recetas:
+                        raise ValueError(f"Receta {receta_id} no encontrada")
+                    vistos.add(receta_id)
+                    pila.append((receta_id, True))
+                    pila.extend((ref, False) for tipo, ref, _, _ in self._recetas[receta_id]['lineas']
+                                if tipo == RECETA and ref not in vistos and ref not in omitir)
+            return orden
+
+    def _costo_linea(self, receta_id, linea):
+        tipo, ref, cantidad_base, unidad_base = linea
+        if tipo == MATERIA:
+            costo, unidad_inventario = self._costos.get(ref, (ZERO, unidad_base))
+            if unidad_inventario != unidad_base:
+                raise ValueError(f"'{ref}' se usa en {unidad_base} pero el inventario está en {unidad_inventario}")
+            return cantidad_base * costo
+        hija = self._recetas[ref]
+        if hija['unidad_base'] != unidad_base:
+            raise ValueError(
+                f"'{self._recetas[receta_id]['nombre']}' usa '{hija['nombre']}' en {unidad_base} "
+                f"pero rinde en {hija['unidad_base']}"
+            )
+        return cantidad_base * divide(self._memo[ref], hija['rendimiento'])
+
+    def _calcular(self, orden):
+        for receta_id in orden:
+            if receta_id not in self._memo:
+                lineas = self._recetas[receta_id]['lineas']
+                self._memo[receta_id] = sum((self._costo_linea(receta_id, l) for l in lineas), ZERO)
+
+    def costo_lote(self, receta_id):
+        """Cost of one batch at current raw material costs (memoized)."""
+        with self._lock:
+            costo = self._memo.get(receta_id)
+            if costo is None:
+                # Only the invalidated part of the subtree is walked
+                self._calcular(self.orden_topologico([receta_id], omitir=self._memo))
+                costo = self._memo[receta_id]
+            return costo
+
+    def costo_unitario(self, receta_id):
+        """Cost per base unit of the recipe's yield (per g, ml or unit)."""
+        with self._lock:
+            return divide(self.costo_lote(receta_id), self._recetas[receta_id]['rendimiento'])
+
+    def repreciar_todo(self):
+        """Recomputes every recipe in one topological pass. Returns {receta_id: costo_lote}."""
+        with self._lock:
+            self._memo.clear()
+            self._calcular(self.orden_topologico())
+            logger.info(f"Catálogo repreciado: {len(self._memo)} recetas")
+            return dict(self._memo)
+
+    # --- Explosión a materias primas ---
+
+    def explotar(self, ingredientes, lotes=1):
+        """
+        Raw materials needed for ``lotes`` times the given ingredient lines,
+        expanding nested recipes. Returns {producto: (cantidad_base, unidad_base)}.
+        """
+        lotes = to_decimal(lotes)
+        with self._lock:
+            pendientes = [(self._linea(ing), lotes) for ing in ingredientes]
+            return self._explotar(pendientes)
+
+    def explotar_receta(self, receta_id, lotes=1):
+        lotes = to_decimal(lotes)
+        with self._lock:
+            if receta_id not in self._recetas:
+                raise ValueError(f"Receta {receta_id} no encontrada")
+            return self._explotar([(l, lotes) for l in self._recetas[receta_id]['lineas']])
+
+    def explotar_catalogo(self):
+        """
+        Raw materials for one batch of every recipe,
+        {receta_id: {producto: (cantidad_base, unidad_base)}}, in one pass in
+        topological order: each recipe reuses the needs of the recipes it uses
+        instead of walking its whole subtree again. Recipes that cannot be
+        expanded (unit mismatch) are left out with a warning, and so is every
+        recipe that uses them.
+        """
+        with self._lock:
+            try:
+                orden = self.orden_topologico()
+            except ValueError:
+                # A line points to a missing recipe: expand them one by one instead
+                return self._explotar_una_por_una()
+            necesidades, errores = {}, {}
+            for receta_id in orden:
+                total = {}
+                try:
+                    for tipo, ref, cantidad_base, unidad_base in self._recetas[receta_id]['lineas']:
+                        if tipo == MATERIA:
+                            self._sumar(total, ref, cantidad_base, unidad_base)
+                            continue
+                        if ref in errores:
+                            raise ValueError(errores[ref])
+                        hija = self._recetas[ref]
+                        if hija['unidad_base'] != unidad_base:
+                            raise ValueError(f"'{hija['nombre']}' rinde en {hija['unidad_base']}, no en {unidad_base}")
+                        factor = divide(cantidad_base, hija['rendimiento'])
+                        for producto, (cantidad, unidad) in necesidades[ref].items():
+                            actual = total.get(producto)
+                            if actual is None:
+                                total[producto] = (cantidad * factor, unidad)
+                            elif actual[1] == unidad:
+                                total[producto] = (actual[0] + cantidad * factor, unidad)
+                            else:
+                                raise ValueError(f"'{producto}' se usa en {actual[1]} y en {unidad}")
+                except ValueError as e:
+                    errores[receta_id] = str(e)
+                    logger.warning(f"Receta {receta_id} sin explosión: {e}")
+                    continue
+                necesidades[receta_id] = total
+            return necesidades
+
+    def _explotar_una_por_una(self):
+        necesidades = {}
+        for receta_id in self._recetas:
+            try:
+                necesidades[receta_id] = self.explotar_receta(receta_id, 1)
+            except ValueError as e:
+                logger.warning(f"Receta {receta_id} sin explosión: {e}")
+        return necesidades
+
+    @staticmethod
+    def _sumar(necesidades, producto, cantidad_base, unidad_base):
+        actual, unidad = necesidades.get(producto, (ZERO, unidad_base))
+        if unidad != unidad_base:
+            raise ValueError(f"'{producto}' se usa en {unidad} y en {unidad_base}")
+        necesidades[producto] = (actual + cantidad_base, unidad_base)
+
+    def _explotar(self, pendientes):
+        # Batches of every nested recipe are summed over all the paths that reach
+        # it before it is expanded, so a sub-recipe shared by many others is
+        # expanded once (linear in the graph instead of in the number of paths).
+        necesidades = {}
+        lotes = defaultdict(lambda: ZERO)
+
+        def aplicar(linea, factor):
+            tipo, ref, cantidad_base, unidad_base = linea
+            if tipo == MATERIA:
+                actual, unidad = necesidades.get(ref, (ZERO, unidad_base))
+                if unidad != unidad_base:
+                    raise ValueError(f"'{ref}' se usa en {unidad} y en {unidad_base}")
+                necesidades[ref] = (actual + cantidad_base * factor, unidad_base)
+                return
+            hija = self._recetas.get(ref)
+            if hija is None:
+                raise ValueError(f"Receta {ref} no encontrada")
+            if hija['unidad_base'] != unidad_base:
+                raise ValueError(f"'{hija['nombre']}' rinde en {hija['unidad_base']}, no en {unidad_base}")
+            lotes[ref] += factor * divide(cantidad_base, hija['rendimiento'])
+
+        for linea, factor in pendientes:
+            aplicar(linea, factor)
+        # Reverse post-order: every recipe comes after all the recipes that use it
+        for receta_id in reversed(self.orden_topologico(list(lotes))):
+            for linea in self._recetas[receta_id]['lineas']:
+                aplicar(linea, lotes[receta_id])
+        return necesidades
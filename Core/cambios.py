@@ -0,0 +1,149 @@
+# Core/cambios.py
+"""
+Contador de versiones por tabla.
+
+Cada escritura marca las tablas que tocó; la interfaz compara las versiones
+que vio al cargar una página con las actuales para saber si sus datos están
+obsoletos, sin consultar la base de datos.
+
+    marcar_cambio("compras", "inventario", conn=conn)   # tras el commit
+    version("inventario")                                # -> int
+
+Las marcas también se publican en la tabla `cambios` (una fila por tabla,
+dentro de la misma transacción), así los otros terminales se enteran:
+``sincronizar()`` lee esos contadores con una consulta por clave primaria y
+avanza la versión local de lo que cambió en otro proceso, avisando a los
+suscriptores (p.ej. la caché de inventario).
+"""
+
+import threading
+from Core.logger import setup_logger
+
+logger = setup_logger("cambios")
+
+_versiones = {}
+_remotas = {}        # tabla -> last value of its `cambios` row this process knows about
+_sincronizado = False
+_listeners = []
+_lock = threading.Lock()
+
+_PUBLICAR_SQL = """
+    INSERT INTO cambios (tabla, version) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE version = version + 1
+"""
+
+
+def _incrementar(tablas):
+    with _lock:
+        for tabla in tablas:
+            _versiones[tabla] = _versiones.get(tabla, 0) + 1
+
+
+class _Marcas:
+    """Tables written by one unit of work, published right before it commits."""
+
+    def __init__(self, tablas):
+        self.tablas = set(tablas)
+
+    def __call__(self, conn):
+        from Core.database import on_commit
+        tablas = sorted(self.tablas)  # same row lock order in every transaction
+        placeholders = ", ".join(["%s"] * len(tablas))
+        with conn.cursor() as cursor:
+            cursor.executemany(_PUBLICAR_SQL, [(t, 1) for t in tablas])
+            cursor.execute(f"SELECT tabla, version FROM cambios WHERE tabla IN ({placeholders})", tablas)
+            nuevas = {r['tabla']: r['version'] for r in cursor.fetchall()}
+        on_commit(conn, lambda: _confirmar(nuevas))
+
+
+def _confirmar(nuevas):
+    with _lock:
+        for tabla, version_db in nuevas.items():
+            _versiones[tabla] = _versiones.get(tabla, 0) + 1
+            # Nobody else wrote since we last looked: do not report our own change as remote
+            visto = _remotas.get(tabla, 0 if _sincronizado else None)
+            if visto == version_db - 1:
+                _remotas[tabla] = version_db
+
+
+def marcar_cambio(*tablas, conn=None):
+    """
+    Marks ``tablas`` as changed. With ``conn`` the mark is written to
+    `cambios` as the last step of that transaction and counted locally once
+    it commits (dropped if it rolls back); without it, only locally.
+    """
+    if conn is None:
+        _incrementar(tablas)
+        return
+    from Core.database import before_commit  # keeps this module import-light for the GUI
+    marcas = _Marcas(tablas)
+    registradas = before_commit(conn, marcas, key="cambios")
+    if registradas is not marcas:
+        registradas.tablas.update(tablas)
+
+
+def version(tabla):
+    return _versiones.get(tabla, 0)
+
+
+def versiones(tablas):
+    """Returns {tabla: version} for the given tables."""
+    with _lock:
+        return {tabla: _versiones.get(tabla, 0) for tabla in tablas}
+
+
+def versiones_db(tablas, conn=None):
+    """{tabla: version} straight from `cambios` (0 if never written), for freshness checks."""
+    from Core.database import db_connection
+    tablas = list(tablas)
+    placeholders = ", ".join(["%s"] * len(tablas))
+    with db_connection(conn) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT tabla, version FROM cambios WHERE tabla IN ({placeholders})", tablas)
+            actuales = {r['tabla']: r['version'] for r in cursor.fetchall()}
+    return {tabla: actuales.get(tabla, 0) for tabla in tablas}
+
+
+def sincronizar():
+    """
+    Picks up changes committed by other processes: every table whose shared
+    counter moved since the last call gets a new local version and listeners
+    are called with that set (on this thread). The first call only records
+    where the counters are. Returns the set of changed tables.
+    """
+    global _sincronizado
+    from Core.database import db_connection
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT tabla, version FROM cambios")
+            actuales = {r['tabla']: r['version'] for r in cursor.fetchall()}
+
+    with _lock:
+        cambiadas = set()
+        if _sincronizado:
+            cambiadas = {t for t, v in actuales.items() if _remotas.get(t) != v}
+        _remotas.update(actuales)
+        _sincronizado = True
+        for tabla in cambiadas:
+            _versiones[tabla] = _versiones.get(tabla, 0) + 1
+    if cambiadas:
+        logger.info(f"Cambios de otros terminales: {sorted(cambiadas)}")
+        for listener in list(_listeners):
+            try:
+                listener(cambiadas)
+            except Exception as e:
+                logger.error(f"Error notificando cambios remotos: {e}")
+    return cambiadas
+
+
+def suscribir(listener):
+    """
+    Registers listener(tablas) for changes made by other processes (see
+    sincronizar). Returns a function that unsubscribes.
+    """
+    _listeners.append(listener)
+
+    def desuscribir():
+        if listener in _listeners:
+            _listeners.remove(listener)
+    return desuscribir
@@ -0,0 +1,191 @@
+# Core/capacidad_backend.py
+
+import threading
+from Core.logger import setup_logger
+from Core.money import ZERO, QTY_STEP
+from Core.services import services
+
+try:
+    import numpy as np
+except ImportError:  # the full pass falls back to the Decimal loop
+    np = None
+
+logger = setup_logger("capacidad_backend")
+
+ESCALA = -QTY_STEP.as_tuple().exponent  # stock and needs in 10**-ESCALA units of the base unit
+
+
+class CapacidadBackend:
+    """
+    Capacidad de producción: cuántos lotes de cada receta permite el stock
+    actual y qué materia prima lo limita (cuello de botella).
+
+    Las recetas se expanden una sola vez a materias primas por lote (Core.bom,
+    cantidades en unidad base vía Core.units) y se indexan por materia. El
+    resultado es exacto (3 lotes de 0.1 con 0.3 en stock son 3, sin
+    tolerancias de float), igual al de producir_lotes. Cuando cambia el stock
+    de algunos productos solo se recalculan, con Decimal, las recetas que los
+    usan.
+
+    Con NumPy el cálculo completo usa una matriz receta x materia de enteros
+    en diezmilésimas de unidad base (la escala de cantidad_stock): cada
+    necesidad redondeada hacia arriba da una cota inferior de los lotes y
+    redondeada hacia abajo una superior. Donde coinciden el resultado ya es
+    exacto; solo las celdas que todavía pueden ser el mínimo de su fila se
+    recalculan con Decimal.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._bom_version = None  # (BomEngine, version) the needs were built from
+        self._recetas = []        # receta ids with a computable capacity
+        self._necesidades = {}    # receta_id -> {producto: (cantidad_base por lote, unidad_base)}
+        self._usuarios = {}       # producto -> {receta_id}
+        self._resultados = {}     # receta_id -> result dict (see _resultado)
+        self._matriz = None       # see _armar_matriz
+        logger.info("CapacidadBackend initialized")
+
+    @property
+    def bom(self):
+        return services.produccion.bom
+
+    def _construir(self):
+        """(Re)builds the recipe x raw material needs when the recipe graph changed."""
+        bom = self.bom
+        if self._vigente(bom):
+            return
+        necesidades, usuarios = {}, {}
+        for receta_id, por_lote in bom.explotar_catalogo().items():
+            por_lote = {p: (c, u) for p, (c, u) in por_lote.items() if c > 0}
+            if not por_lote:
+                continue
+            necesidades[receta_id] = por_lote
+            for producto in por_lote:
+                usuarios.setdefault(producto, set()).add(receta_id)
+        self._necesidades = necesidades
+        self._usuarios = usuarios
+        self._recetas = list(necesidades)
+        self._matriz = self._armar_matriz() if np is not None and necesidades else None
+        self._bom_version = (bom, bom.version)
+
+    def _armar_matriz(self):
+        """
+        (columnas, techo, piso): columnas are the (producto, unidad_base) pairs
+        in sorted order; techo/piso are int64 recipe x column matrices with
+        each need in QTY_STEP units rounded up/down (0 = not used).
+        """
+        columnas = sorted({(p, u) for por_lote in self._necesidades.values() for p, (_, u) in por_lote.items()})
+        indice = {c: j for j, c in enumerate(columnas)}
+        filas, cols, escaladas = [], [], []
+        for i, receta_id in enumerate(self._recetas):
+            for producto, (necesario, unidad_base) in self._necesidades[receta_id].items():
+                filas.append(i)
+                cols.append(indice[(producto, unidad_base)])
+                escaladas.append(necesario.scaleb(ESCALA))
+        # Needs are positive: truncating rounds down. One beyond int64 is more
+        # than any stock can hold, so it is capped (0 batches either way).
+        tope = np.iinfo(np.int64).max
+        pisos = [min(int(e), tope) for e in escaladas]
+        piso = np.zeros((len(self._recetas), len(columnas)), dtype=np.int64)
+        piso[filas, cols] = pisos
+        techo = piso.copy()
+        techo[filas, cols] += np.array([p != e and p < tope for p, e in zip(pisos, escaladas)])
+        return columnas, techo, piso
+
+    def _vigente(self, bom):
+        """True if the needs were built from this graph (it is replaced on reload) and version."""
+        return self._bom_version is not None and self._bom_version[0] is bom and self._bom_version[1] == bom.version
+
+    def _resultado(self, receta_id, max_lotes, cuello):
+        return {
+            'subproducto_id': receta_id,
+            'nombre': self.bom.nombre(receta_id),
+            'max_lotes': max_lotes,
+            'cuello_botella': cuello,
+        }
+
+    @staticmethod
+    def _disponible(existencias, producto, unidad_base):
+        """Stock in the unit the recipe uses; a unit mismatch or negative stock counts as none."""
+        cantidad, unidad = existencias.get(producto, (ZERO, unidad_base))
+        return max(cantidad, ZERO) if unidad == unidad_base else ZERO
+
+    def _calcular_receta(self, receta_id, existencias):
+        """Exact Decimal computation for one recipe."""
+        max_lotes, cuello = None, None
+        for producto, (necesario, unidad_base) in self._necesidades[receta_id].items():
+            lotes = int(self._disponible(existencias, producto, unidad_base) // necesario)
+            # On ties the first product by name, as in the matrix pass (sorted columns)
+            if max_lotes is None or lotes < max_lotes or (lotes == max_lotes and producto < cuello):
+                max_lotes, cuello = lotes, producto
+        return self._resultado(receta_id, max_lotes or 0, cuello)
+
+    def _calcular_todo(self, existencias):
+        if self._matriz is not None:
+            resultados = self._calcular_matriz(existencias)
+            if resultados is not None:
+                return resultados
+        return {r: self._calcular_receta(r, existencias) for r in self._recetas}
+
+    def _calcular_matriz(self, existencias):
+        """Vectorized full pass (see the class docstring); None if some stock is not an int64 of QTY_STEPs."""
+        columnas, techo, piso = self._matriz
+        disponibles = [self._disponible(existencias, p, u) for p, u in columnas]
+        escalados = [d.scaleb(ESCALA) for d in disponibles]
+        tope = np.iinfo(np.int64).max
+        if any(e != e.to_integral_value() or e >= tope for e in escalados):
+            return None
+        stock = np.array([int(e) for e in escalados], dtype=np.int64)
+
+        minimos = np.full(techo.shape, tope, dtype=np.int64)
+        np.floor_divide(stock, techo, out=minimos, where=techo > 0)
+        maximos = np.full(piso.shape, tope, dtype=np.int64)
+        np.floor_divide(stock, piso, out=maximos, where=piso > 0)
+
+        # Inexact cells that may still be the row minimum: exact Decimal value
+        dudosas = (minimos != maximos) & (minimos <= maximos.min(axis=1)[:, None])
+        for i, j in zip(*np.nonzero(dudosas)):
+            necesario = self._necesidades[self._recetas[i]][columnas[j][0]][0]
+            minimos[i, j] = min(int(disponibles[j] // necesario), tope - 1)
+
+        cuellos = minimos.argmin(axis=1)
+        lotes = minimos[np.arange(len(self._recetas)), cuellos]
+        return {
+            receta_id: self._resultado(receta_id, int(lotes[i]), columnas[cuellos[i]][0])
+            for i, receta_id in enumerate(self._recetas)
+        }
+
+    def calcular(self):
+        """
+        Max batches and bottleneck for every recipe, in one pass.
+        :return: list of {'subproducto_id', 'nombre', 'max_lotes', 'cuello_botella'} sorted by nombre.
+        """
+        with self._lock:
+            self._construir()
+            self._resultados = self._calcular_todo(services.inventario.get_existencias())
+            logger.info(f"Capacidad calculada para {len(self._resultados)} recetas")
+            return sorted(self._resultados.values(), key=lambda r: r['nombre'])
+
+    def actualizar(self, productos):
+        """
+        Recomputes only the recipes that use ``productos`` (e.g. the keys of an
+        InventarioBackend.subscribe event).
+        :return: (resultados, completo). If the recipe graph changed since the
+            last pass everything is recomputed: completo is True and resultados
+            is the whole list, as calcular() returns it (recipes that were
+            deleted are not in it). Otherwise only the updated result dicts.
+        """
+        with self._lock:
+            if not self._vigente(self.bom):
+                return self.calcular(), True
+            afectadas = set()
+            for producto in productos:
+                afectadas |= self._usuarios.get(producto, set())
+            if not afectadas:
+                return [], False
+            existencias = services.inventario.get_existencias(
+                {p for r in afectadas for p in self._necesidades[r]}
+            )
+            for receta_id in afectadas:
+                self._resultados[receta_id] = self._calcular_receta(receta_id, existencias)
+            return [self._resultados[r] for r in afectadas], False
@@ -1,43 +1,100 @@
-from Core.database import get_connection, insert_compra, get_compras
+from Core.database import db_connection, insert_compras, get_compras_pagina
 from Core.logger import setup_logger
-from Core.inventario_backend import InventarioBackend
+from Core.cambios import marcar_cambio
+from Core.contabilidad_backend import COMPRA
+from Core.services import services
+from Core.money import to_decimal, money
 
 class ComprasBackend:
     def __init__(self):
-        self.db = get_connection()
         self.logger = setup_logger()
-        self.inventory_maneger = InventarioBackend()
         self.logger.info("ComprasBackend initialized")
 
-    def save_purchase(self, tipo, nombre, proveedor, cantidad=None, unidad=None, precio_compra=None, cantidad_paq=None, precio_paq=None, peso_paq=None, unidad_peso=None):
-        self.logger.info(f"Attempting to save {tipo} purchase: {nombre}")
+    @property
+    def inventory_maneger(self):
+        # Shared instance, resolved on first use
+        return services.inventario
+
+    def _preparar_linea(self, tipo, nombre, proveedor, cantidad=None, unidad=None, precio_compra=None, cantidad_paq=None, precio_paq=None, peso_paq=None, unidad_peso=None):
+        """
+        Validates one purchase line and returns the values to persist:
+        {'producto', 'cantidad', 'unidad', 'precio_compra', 'precio_total', 'proveedor', 'tipo'}
+        """
         if not nombre or not proveedor:
             self.logger.warning("Save purchase failed: missing product name or supplier")
             raise ValueError("Nombre del producto y proveedor son obligatorios")
+        if tipo == "granel":
+            cantidad = to_decimal(cantidad)
+            precio_compra = money(precio_compra)
+            precio_total = money(precio_compra * cantidad)
+            if not unidad:
+                raise ValueError("Unidad es obligatoria")
+            return {
+                'producto': nombre, 'cantidad': cantidad, 'unidad': unidad,
+                'precio_compra': precio_compra, 'precio_total': precio_total,
+                'proveedor': proveedor, 'tipo': "granel"
+            }
+        elif tipo == "paquetes":
+            cantidad_paq = int(cantidad_paq)
+            precio_paq = money(precio_paq)
+            peso_paq = to_decimal(peso_paq)
+            if not unidad_peso:
+                raise ValueError("Unidad de peso es obligatoria")
+            return {
+                'producto': nombre, 'cantidad': cantidad_paq * peso_paq, 'unidad': unidad_peso,
+                'precio_compra': precio_paq, 'precio_total': money(cantidad_paq * precio_paq),
+                'proveedor': proveedor, 'tipo': "paquetes"
+            }
+        else:
+            raise ValueError("Tipo de compra inválido")
+
+    def insertar_compras(self, filas, conn):
+        """
+        insert_compras by product name: filas are (producto, cantidad, unidad,
+        precio_compra, precio_total, proveedor, tipo). New names are added to
+        `productos` in the same transaction.
+        """
+        ids = services.productos.ids([f[0] for f in filas], conn=conn, crear=True)
+        insert_compras([(ids[f[0]],) + tuple(f[1:]) for f in filas], conn=conn)
+
+    def save_purchase(self, tipo, nombre, proveedor, cantidad=None, unidad=None, precio_compra=None, cantidad_paq=None, precio_paq=None, peso_paq=None, unidad_peso=None):
+        self.logger.info(f"Attempting to save {tipo} purchase: {nombre}")
+        self.save_purchases([{
+            'tipo': tipo, 'nombre': nombre, 'proveedor': proveedor,
+            'cantidad': cantidad, 'unidad': unidad, 'precio_compra': precio_compra,
+            'cantidad_paq': cantidad_paq, 'precio_paq': precio_paq,
+            'peso_paq': peso_paq, 'unidad_peso': unidad_peso,
+        }])
+
+    def save_purchases(self, lineas):
+        """
+        Saves a whole supplier invoice as one unit of work.
+
+        :param lineas: list of dicts with the same keyword arguments as save_purchase.
+        Every line is validated first; then the `compras` rows and the inventory
+        upserts are written on one connection and committed together.
+        """
         try:
-            if tipo == "granel":
-                cantidad = float(cantidad)
-                precio_compra = float(precio_compra)
-                precio_total = precio_compra * cantidad
-                if not unidad:
-                    raise ValueError("Unidad es obligatoria")
-                insert_compra(nombre, str(cantidad), unidad, precio_compra, precio_total, proveedor, "granel")
-                self.inventory_maneger.actualizar_stock_desde_compra(nombre, cantidad, unidad, precio_total)
-                self.logger.info(f"Saved granel purchase: {nombre}, {cantidad} {unidad}, ${precio_total}")
-            elif tipo == "paquetes":
-                cantidad_paq = int(cantidad_paq)
-                precio_paq = float(precio_paq)
-                peso_paq = float(peso_paq)
-                if not unidad_peso:
-                    raise ValueError("Unidad de peso es obligatoria")
-                cantidad_total_peso = cantidad_paq * peso_paq
-                precio_total = cantidad_paq * precio_paq
-                cantidad_str = f"{cantidad_paq} x {peso_paq} {unidad_peso}"
-                insert_compra(nombre, cantidad_total_peso, unidad_peso, precio_paq, precio_total, proveedor, "paquetes")
-                self.inventory_maneger.actualizar_stock_desde_compra(nombre, cantidad_total_peso, unidad_peso, precio_total)
-                self.logger.info(f"Saved paquetes purchase: {nombre}, {cantidad_paq} paquetes, ${precio_paq} each")
-            else:
-                raise ValueError("Tipo de compra inválido")
+            preparadas = [self._preparar_linea(**linea) for linea in lineas]
+            if not preparadas:
+                raise ValueError("No hay líneas de compra para guardar")
+            with db_connection() as conn:
+                self.insertar_compras([
+                    (l['producto'], l['cantidad'], l['unidad'], l['precio_compra'], l['precio_total'], l['proveedor'], l['tipo'])
+                    for l in preparadas
+                ], conn)
+                marcar_cambio("compras", conn=conn)
+                services.contabilidad.registrar_movimientos(
+                    [(COMPRA, f"{l['producto']} - {l['proveedor']}", l['precio_total']) for l in preparadas], conn=conn
+                )
+                # Same row lock order in every invoice, so two invoices with the
+                # same products in a different order cannot deadlock each other
+                for l in sorted(preparadas, key=lambda l: l['producto']):
+                    self.inventory_maneger.actualizar_stock_desde_compra(
+                        l['producto'], l['cantidad'], l['unidad'], l['precio_total'], conn=conn
+                    )
+            for l in preparadas:
+                self.logger.info(f"Saved {l['tipo']} purchase: {l['producto']}, {l['cantidad']} {l['unidad']}, ${l['precio_total']}")
         except ValueError as e:
             self.logger.error(f"Save purchase failed due to invalid input: {e}")
             raise
@@ -45,10 +102,11 @@ class ComprasBackend:
             self.logger.error(f"Save purchase failed: {e}")
             raise
 
-    def get_purchase_history(self):
-        self.logger.info("Retrieving purchase history")
-        return get_compras()
-
-
-
-        
\ No newline at end of file
+    def get_purchase_history(self, limite=100, despues_de=None, **filtros):
+        """
+        One page of the purchase history. Returns (rows, cursor_siguiente);
+        pass cursor_siguiente back as ``despues_de`` to get the next page.
+        Filters: producto, proveedor, tipo, desde, hasta (see get_compras_pagina).
+        """
+        self.logger.info(f"Retrieving purchase history page (filtros={filtros})")
+        return get_compras_pagina(limite=limite, despues_de=despues_de, **filtros)
@@ -0,0 +1,172 @@
+# Core/connection_pool.py
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from Core.logger import setup_logger
+
+logger = setup_logger("connection_pool")
+
+
+class PoolError(Exception):
+    """Raised when the pool cannot lend a connection (factory failed or timeout)."""
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of database connections.
+
+    Connections are created lazily by ``factory`` up to ``size`` and reused
+    afterwards. A connection that has been idle longer than ``ping_interval``
+    seconds is health-checked with ``ping(reconnect=True)`` before being lent;
+    if the check fails it is discarded and replaced with a fresh one.
+    """
+
+    def __init__(self, factory, size=5, timeout=10, ping_interval=30):
+        self._factory = factory
+        self._size = size
+        self._timeout = timeout
+        self._ping_interval = ping_interval
+        # LIFO so the most recently used (warmest) connection is lent first
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._after_commit = {}  # id(conn) -> callbacks for the open unit of work
+        self._before_commit = {}  # id(conn) -> [(key, callback)] for the open unit of work
+
+    def _create(self):
+        try:
+            conn = self._factory()
+        except Exception:
+            conn = None
+        if conn is None:
+            with self._lock:
+                self._created -= 1
+            raise PoolError("No database connection")
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self._ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=True)
+            return True
+        except Exception as e:
+            logger.warning(f"Conexión del pool descartada tras fallar el ping: {e}")
+            return False
+
+    def acquire(self):
+        """Returns a live connection, creating one if the pool is not full yet."""
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self._size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                return self._create()
+            try:
+                conn, last_used = self._idle.get(timeout=self._timeout)
+            except queue.Empty:
+                raise PoolError(f"Timeout esperando una conexión libre ({self._size} en uso)")
+
+        if self._is_healthy(conn, last_used):
+            return conn
+        self._discard(conn)
+        with self._lock:
+            self._created += 1
+        return self._create()
+
+    def release(self, conn, broken=False):
+        """Gives a connection back to the pool. Broken connections are closed instead."""
+        if broken:
+            self._discard(conn)
+            return
+        try:
+            self._idle.put_nowait((conn, time.monotonic()))
+        except queue.Full:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """
+        Lends a connection for one unit of work.
+
+        Commits when the block finishes normally and rolls back if it raises.
+        The connection always goes back to the pool (or is dropped if the
+        rollback itself failed, which means the link is dead).
+        """
+        conn = self.acquire()
+        self._after_commit[id(conn)] = []
+        self._before_commit[id(conn)] = []
+        broken = False
+        try:
+            yield conn
+            for _, callback in self._before_commit.pop(id(conn), None) or []:
+                callback(conn)
+            conn.commit()
+        except BaseException:
+            self._before_commit.pop(id(conn), None)
+            self._after_commit.pop(id(conn), None)
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            callbacks = self._after_commit.pop(id(conn), None) or []
+            self.release(conn, broken=broken)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error en callback post-commit: {e}")
+
+    def after_commit(self, conn, callback):
+        """
+        Runs ``callback`` once the unit of work lent on ``conn`` commits.
+        Dropped if it rolls back. Runs immediately if ``conn`` is not lent.
+        """
+        callbacks = self._after_commit.get(id(conn))
+        if callbacks is None:
+            callback()
+        else:
+            callbacks.append(callback)
+
+    def before_commit(self, conn, callback, key=None):
+        """
+        Runs callback(conn) as the last step of the unit of work lent on
+        ``conn``, right before it commits; if it raises, everything rolls back.
+        With ``key`` only the first callback registered under that key is kept
+        and returned, so several writers can share one (see Core.cambios).
+        Runs immediately if ``conn`` is not lent.
+        """
+        callbacks = self._before_commit.get(id(conn))
+        if callbacks is None:
+            callback(conn)
+            return callback
+        if key is not None:
+            for k, registrado in callbacks:
+                if k == key:
+                    return registrado
+        callbacks.append((key, callback))
+        return callback
+
+    def close_all(self):
+        """Closes every idle connection (used on application exit)."""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
@@ -0,0 +1,143 @@
+# Core/contabilidad_backend.py
+
+from datetime import datetime, timedelta
+from Core.database import db_connection
+from Core.cambios import marcar_cambio
+from Core.logger import setup_logger
+from Core.money import to_decimal, money, divide, ZERO
+
+logger = setup_logger("contabilidad_backend")
+
+# Movement types written to `movimientos`
+COMPRA = "compra"
+VENTA = "venta"
+PRODUCCION = "produccion"
+
+# Share of the profit set aside as the business fund
+FONDO_PCT = to_decimal("0.20")
+
+
+class ContabilidadBackend:
+    """
+    Libro de movimientos del negocio.
+
+    Compras, ventas y producción escriben aquí dentro de su propia transacción
+    (registrar_movimientos con ``conn``). Los indicadores se calculan con una
+    sola consulta agregada sobre el índice (fecha, tipo, monto) y el historial
+    se lee por páginas con keyset pagination sobre (fecha, id).
+    """
+
+    def __init__(self):
+        logger.info("ContabilidadBackend initialized")
+
+    def registrar_movimientos(self, movimientos, conn=None):
+        """
+        :param movimientos: list of (tipo, descripcion, monto).
+        :param conn: connection of the caller's transaction; the movements
+            commit or roll back together with the purchase/sale/production.
+        """
+        filas = [(tipo, descripcion[:255], money(monto)) for tipo, descripcion, monto in movimientos]
+        if not filas:
+            return
+        try:
+            with db_connection(conn) as conn:
+                with conn.cursor() as cursor:
+                    cursor.executemany(
+                        "INSERT INTO movimientos (tipo, descripcion, monto) VALUES (%s, %s, %s)",
+                        filas
+                    )
+                marcar_cambio("movimientos", conn=conn)
+        except Exception as e:
+            logger.error(f"Error registrando movimientos: {e}")
+            raise
+
+    @staticmethod
+    def _rango(desde, hasta):
+        """WHERE conditions for inclusive day bounds (date or datetime)."""
+        desde = desde.date() if isinstance(desde, datetime) else desde
+        hasta = hasta.date() if isinstance(hasta, datetime) else hasta
+        condiciones, params = [], []
+        if desde:
+            condiciones.append("fecha >= %s")
+            params.append(desde)
+        if hasta:
+            condiciones.append("fecha < %s")
+            params.append(hasta + timedelta(days=1))
+        return condiciones, params
+
+    # Covered by idx_movimientos_fecha_tipo (fecha, tipo, monto) when there is a date range
+    _INDICADORES_SQL = """
+        SELECT
+            COALESCE(SUM(CASE WHEN tipo = %s THEN monto END), 0) AS ingresos,
+            COALESCE(SUM(CASE WHEN tipo = %s THEN monto END), 0) AS gastos,
+            COALESCE(SUM(CASE WHEN tipo = %s THEN monto END), 0) AS produccion
+        FROM movimientos
+        {where}
+    """
+
+    def get_indicadores(self, desde=None, hasta=None):
+        """
+        Dashboard indicators for the period (cash basis):
+        ingresos (ventas), gastos (compras), produccion (cost moved into
+        subproducts), ganancias = ingresos - gastos, fondo = FONDO_PCT of
+        positive ganancias, capital = ganancias - fondo, margen_pct.
+        """
+        condiciones, params = self._rango(desde, hasta)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(self._INDICADORES_SQL.format(where=where), [VENTA, COMPRA, PRODUCCION] + params)
+                    row = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Error calculando indicadores: {e}")
+            raise
+
+        ingresos, gastos = row["ingresos"], row["gastos"]
+        ganancias = ingresos - gastos
+        fondo = money(max(ganancias, ZERO) * FONDO_PCT)
+        return {
+            "ingresos": ingresos,
+            "gastos": gastos,
+            "produccion": row["produccion"],
+            "ganancias": ganancias,
+            "fondo": fondo,
+            "capital": ganancias - fondo,
+            "margen_pct": divide(ganancias * 100, ingresos),
+        }
+
+    def get_movimientos_pagina(self, limite=100, despues_de=None, tipo=None, desde=None, hasta=None):
+        """
+        One page of movements, newest first (same contract as get_compras_pagina).
+        :return: (rows, cursor_siguiente); cursor_siguiente is None on the last page.
+        """
+        condiciones, params = self._rango(desde, hasta)
+        if despues_de:
+            fecha, id_ = despues_de
+            condiciones.append("(fecha < %s OR (fecha = %s AND id < %s))")
+            params += [fecha, fecha, id_]
+        if tipo:
+            condiciones.append("tipo = %s")
+            params.append(tipo)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        sql = f"""
+            SELECT id, fecha, tipo, descripcion, monto
+            FROM movimientos
+            {where}
+            ORDER BY fecha DESC, id DESC
+            LIMIT %s
+        """
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Ask for one extra row to know whether there is a next page
+                    cursor.execute(sql, params + [limite + 1])
+                    rows = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error obteniendo movimientos: {e}")
+            raise
+
+        if len(rows) > limite:
+            rows = rows[:limite]
+            return rows, (rows[-1]["fecha"], rows[-1]["id"])
+        return rows, None
@@ -1,8 +1,17 @@
 import pymysql
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from Core.logger import setup_logger
+from Core.connection_pool import ConnectionPool
+from Core.migrations import run_migrations
 
-logger = setup_logger()
+logger = setup_logger("database")
+
+POOL_SIZE = 5
+
+_pool = None
+_pool_lock = threading.Lock()
 
 def get_connection():
     try:
@@ -14,143 +23,133 @@ def get_connection():
             charset="utf8mb4",
             cursorclass=pymysql.cursors.DictCursor,
         )
-        # Tabla para compras 
-        with conn.cursor() as cursor:
-            sql = """
-                CREATE TABLE IF NOT EXISTS compras (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    producto VARCHAR(255) NOT NULL,
-                    cantidad VARCHAR(255) NOT NULL,
-                    unidad VARCHAR(255) NOT NULL,
-                    precio_compra DECIMAL(10,2) NOT NULL,
-                    precio_total DECIMAL(10,2) NOT NULL,
-                    proveedor VARCHAR(255) NOT NULL,
-                    tipo VARCHAR(50) NOT NULL,
-                    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """
-            cursor.execute(sql)
-            sql_inv = """
-                CREATE TABLE IF NOT EXISTS inventario (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    producto VARCHAR(100) UNIQUE NOT NULL,
-                    cantidad_stock DECIMAL(15,4) NOT NULL DEFAULT 0,
-                    unidad_base VARCHAR(20) NOT NULL,
-                    costo_promedio_ponderado DECIMAL(10,4) NOT NULL DEFAULT 0
-                )
-                """
-            cursor.execute(sql_inv)
-            sql_sub = """
-                CREATE TABLE IF NOT EXISTS subproductos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    nombre VARCHAR(255) UNIQUE NOT NULL,
-                    costo_total_subproducto DECIMAL(10,2) NOT NULL
-                )
-                """
-            cursor.execute(sql_sub)
-            sql_ing = """
-                CREATE TABLE IF NOT EXISTS subproducto_ingredientes (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    subproducto_id INT NOT NULL,
-                    producto_ingrediente VARCHAR(255) NOT NULL,
-                    cantidad_usada DECIMAL(10,4) NOT NULL,
-                    unidad_usada VARCHAR(20) NOT NULL,
-                    FOREIGN KEY (subproducto_id) REFERENCES subproductos(id) ON DELETE CASCADE
-                )
-                """
-            cursor.execute(sql_ing)
-
-            sql_prod_final = """
-                CREATE TABLE IF NOT EXISTS productos_finales (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    nombre VARCHAR(255) UNIQUE NOT NULL,
-                    subproducto_id INT NOT NULL,
-                    unidades_producidas INT NOT NULL,
-                    FOREIGN KEY (subproducto_id) REFERENCES subproductos(id) ON DELETE CASCADE
-                )
-                """
-            cursor.execute(sql_prod_final)
-
-            # Ensure precio_venta column exists (migration-safe)
-            try:
-                cursor.execute("SHOW COLUMNS FROM productos_finales LIKE 'precio_venta'")
-                col = cursor.fetchone()
-                if not col:
-                    cursor.execute("ALTER TABLE productos_finales ADD COLUMN precio_venta DECIMAL(10,2) NULL DEFAULT NULL")
-                    logger.info("Columna 'precio_venta' agregada a 'productos_finales'")
-            except Exception as e:
-                logger.warning(f"No se pudo verificar/agregar columna 'precio_venta' en 'productos_finales': {e}")
-
-            sql_clientes = """
-                CREATE TABLE IF NOT EXISTS clientes(
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    nombre VARCHAR(255) UNIQUE NOT NULL
-                )
-                """
-            cursor.execute(sql_clientes)
-
-            # Ensure 'active' column exists in clientes (migration-safe)
-            try:
-                cursor.execute("SHOW COLUMNS FROM clientes LIKE 'active'")
-                col = cursor.fetchone()
-                if not col:
-                    # MariaDB/MySQL: add column if missing
-                    cursor.execute("ALTER TABLE clientes ADD COLUMN active TINYINT(1) NOT NULL DEFAULT 1")
-                    logger.info("Columna 'active' agregada a 'clientes'")
-            except Exception as e:
-                # If something goes wrong, log and continue. This is non-fatal.
-                logger.warning(f"No se pudo verificar/agregar columna 'active' en 'clientes': {e}")
-
-            sql_ventas = """
-                CREATE TABLE IF NOT EXISTS ventas(
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    cliente_id INT NOT NULL,
-                    producto_final_id INT NOT NULL,
-                    cantidad_vendida INT NOT NULL,
-                    precio_unitario_venta DECIMAL(10,2) NOT NULL,
-                    total_venta DECIMAL(10,2) NOT NULL,
-                    fecha_venta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (cliente_id) REFERENCES clientes(id),
-                    FOREIGN KEY (producto_final_id) REFERENCES productos_finales(id)
-                )
-                """
-
-            conn.commit()
-            logger.info("Tables 'compras', 'inventario', 'subproductos', 'subproducto_ingredientes', 'productos_finales', 'clientes', and 'ventas' created or already exist")
         return conn
     except pymysql.Error as e:
         logger.error(f"Error obteniendo coneccion a MariaDb:{e}")
         return None
         
-def insert_compra(producto, cantidad, unidad, precio_compra, precio_total, proveedor, tipo):
-    conn = get_connection()
-    if conn:
-        try:
-            with conn.cursor() as cursor:
-                sql = "INSERT INTO compras (producto, cantidad, unidad, precio_compra, precio_total, proveedor, tipo) VALUES (%s, %s, %s, %s, %s, %s, %s)"
-                cursor.execute(sql, (producto, cantidad, unidad, precio_compra, precio_total, proveedor, tipo))
-                conn.commit()
-                logger.info(f"Inserted purchase: {producto}")
-        except Exception as e:
-            logger.error(f"Error inserting purchase: {e}")
-        finally:
-            conn.close()
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use.
+    Pending schema migrations are applied once, before the pool is handed out.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool(get_connection, size=POOL_SIZE)
+                with pool.connection() as conn:
+                    run_migrations(conn)
+                _pool = pool
+    return _pool
 
-def get_compras():
-    conn = get_connection()
-    if conn:
-        try:
+@contextmanager
+def db_connection(conn=None):
+    """
+    Context manager that lends a pooled connection.
+    Commits on success, rolls back on error and returns the connection to the pool.
+
+        with db_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute("SELECT producto, cantidad, unidad, precio_compra, precio_total, proveedor, tipo, fecha FROM compras ORDER BY fecha DESC")
-                return cursor.fetchall()
-        except Exception as e:
-            logger.error(f"Error retrieving purchases: {e}")
-        finally:
-            conn.close()
-    return []
+                ...
+
+    If ``conn`` is given the caller already owns a transaction: it is yielded
+    as-is and committing/rolling back is left to the caller.
+    """
+    if conn is not None:
+        yield conn
+        return
+    with get_pool().connection() as pooled:
+        yield pooled
+
+def on_commit(conn, callback):
+    """Runs callback after the transaction open on ``conn`` commits (see ConnectionPool.after_commit)."""
+    get_pool().after_commit(conn, callback)
+
+def before_commit(conn, callback, key=None):
+    """Runs callback(conn) just before the transaction open on ``conn`` commits (see ConnectionPool.before_commit)."""
+    return get_pool().before_commit(conn, callback, key=key)
 
+def close_pool():
+    if _pool is not None:
+        _pool.close_all()
 
+_INSERT_COMPRA_SQL = "INSERT INTO compras (producto_id, cantidad, unidad, precio_compra, precio_total, proveedor, tipo) VALUES (%s, %s, %s, %s, %s, %s, %s)"
 
+def insert_compra(producto_id, cantidad, unidad, precio_compra, precio_total, proveedor, tipo, conn=None):
+    insert_compras([(producto_id, cantidad, unidad, precio_compra, precio_total, proveedor, tipo)], conn=conn)
 
+def insert_compras(filas, conn=None):
+    """
+    Inserts several purchase rows with one executemany.
+    filas: list of (producto_id, cantidad, unidad, precio_compra, precio_total, proveedor, tipo)
+    (see ComprasBackend.insertar_compras to insert by product name)
+    """
+    if not filas:
+        return
+    try:
+        with db_connection(conn) as conn:
+            with conn.cursor() as cursor:
+                cursor.executemany(_INSERT_COMPRA_SQL, filas)
+        logger.info(f"Inserted {len(filas)} purchase row(s)")
+    except Exception as e:
+        logger.error(f"Error inserting purchase: {e}")
+        raise
 
+def get_compras_pagina(limite=100, despues_de=None, producto=None, proveedor=None, tipo=None, desde=None, hasta=None):
+    """
+    One page of the purchase history, newest first, using keyset pagination
+    over the (fecha, id) index.
 
+    :param despues_de: cursor (fecha, id) returned by the previous page, or None.
+    :param producto, proveedor: prefix filters (index friendly; producto goes
+        through the productos name index and then compras (producto_id, fecha, id)).
+    :param tipo: exact match ('granel' / 'paquetes').
+    :param desde, hasta: date or datetime bounds, both inclusive days.
+    :return: (rows, cursor_siguiente); cursor_siguiente is None on the last page.
+    """
+    # Whole days: a datetime bound counts from / up to the end of its day
+    desde = desde.date() if isinstance(desde, datetime) else desde
+    hasta = hasta.date() if isinstance(hasta, datetime) else hasta
+    condiciones, params = [], []
+    if despues_de:
+        fecha, id_ = despues_de
+        condiciones.append("(c.fecha < %s OR (c.fecha = %s AND c.id < %s))")
+        params += [fecha, fecha, id_]
+    if producto:
+        condiciones.append("c.producto_id IN (SELECT id FROM productos WHERE nombre LIKE %s)")
+        params.append(producto.replace("%", r"\%").replace("_", r"\_") + "%")
+    if proveedor:
+        condiciones.append("c.proveedor LIKE %s")
+        params.append(proveedor.replace("%", r"\%").replace("_", r"\_") + "%")
+    if tipo:
+        condiciones.append("c.tipo = %s")
+        params.append(tipo)
+    if desde:
+        condiciones.append("c.fecha >= %s")
+        params.append(desde)
+    if hasta:
+        condiciones.append("c.fecha < %s")
+        params.append(hasta + timedelta(days=1))
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    sql = f"""
+        SELECT c.id, p.nombre AS producto, c.cantidad, c.unidad, c.precio_compra, c.precio_total, c.proveedor, c.tipo, c.fecha
+        FROM compras c
+        JOIN productos p ON p.id = c.producto_id
+        {where}
+        ORDER BY c.fecha DESC, c.id DESC
+        LIMIT %s
+    """
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                # Ask for one extra row to know whether there is a next page
+                cursor.execute(sql, params + [limite + 1])
+                rows = cursor.fetchall()
+    except Exception as e:
+        logger.error(f"Error retrieving purchases page: {e}")
+        raise
+    if len(rows) > limite:
+        rows = rows[:limite]
+        return rows, (rows[-1]['fecha'], rows[-1]['id'])
+    return rows, None
@@ -0,0 +1,155 @@
+# Core/importador_compras.py
+
+import csv
+import os
+from Core.database import db_connection
+from Core.logger import setup_logger
+from Core.cambios import marcar_cambio
+from Core.contabilidad_backend import COMPRA
+from Core.services import services
+from Core.units import convert_to_base
+from Core.money import ZERO
+
+try:
+    import openpyxl
+except ImportError:  # Excel import is optional
+    openpyxl = None
+
+logger = setup_logger("importador_compras")
+
+# Column names accepted in the invoice file (same keywords as ComprasBackend.save_purchase)
+COLUMNAS = ("tipo", "nombre", "proveedor", "cantidad", "unidad", "precio_compra",
+            "cantidad_paq", "precio_paq", "peso_paq", "unidad_peso")
+ALIASES = {"producto": "nombre"}
+
+
+class ImportadorCompras:
+    """
+    Streaming importer for supplier invoices (CSV or .xlsx).
+
+    Rows are read one at a time, validated with the same rules as the Compras
+    form plus a unit check through Core.units, and written to `compras` in
+    batches with executemany. Inventory is updated once per product with the
+    aggregated quantity and price, so 300 lines of flour become one upsert.
+    The whole file is one transaction: any invalid line rolls everything back.
+    """
+
+    def __init__(self, compras_backend, batch_size=500):
+        self.compras_backend = compras_backend
+        self.inventario = compras_backend.inventory_maneger
+        self.batch_size = batch_size
+
+    def _guardar_lote(self, lote, conn):
+        """Writes one batch of `compras` rows and its ledger movements."""
+        if not lote:
+            return
+        self.compras_backend.insertar_compras(lote, conn)
+        services.contabilidad.registrar_movimientos(
+            [(COMPRA, f"{producto} - {proveedor}", precio_total)
+             for producto, _, _, _, precio_total, proveedor, _ in lote],
+            conn=conn
+        )
+
+    def leer_filas(self, ruta):
+        """Yields (numero_linea, dict) for every data row of the file."""
+        ext = os.path.splitext(ruta)[1].lower()
+        if ext == ".csv":
+            with open(ruta, newline="", encoding="utf-8-sig") as f:
+                for n, row in enumerate(csv.DictReader(f), start=2):
+                    yield n, self._normalizar(row)
+        elif ext in (".xlsx", ".xlsm"):
+            if openpyxl is None:
+                raise ValueError("Para importar Excel instala openpyxl")
+            wb = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+            try:
+                rows = wb.active.iter_rows(values_only=True)
+                header = [str(h or "").strip() for h in next(rows, [])]
+                for n, values in enumerate(rows, start=2):
+                    if not any(v not in (None, "") for v in values):
+                        continue
+                    yield n, self._normalizar(dict(zip(header, values)))
+            finally:
+                wb.close()
+        else:
+            raise ValueError(f"Formato de archivo no soportado: {ext}")
+
+    def _normalizar(self, row):
+        linea = {}
+        for key, value in row.items():
+            if key is None:
+                continue
+            key = key.strip().lower()
+            key = ALIASES.get(key, key)
+            if key in COLUMNAS:
+                linea[key] = value.strip() if isinstance(value, str) else value
+        linea.setdefault("tipo", "granel")
+        return linea
+
+    def importar(self, ruta, dry_run=False, progress=None):
+        """
+        Imports the invoice at ``ruta``.
+
+        :param dry_run: validate and aggregate only, nothing is written.
+        :param progress: optional callable(lineas_procesadas) called after each batch.
+        :return: dict with 'lineas', 'productos', 'total', 'errores' and 'dry_run'.
+        :raises ValueError: if any line is invalid (after rolling back) and not dry_run.
+        """
+        resumen = {"lineas": 0, "productos": 0, "total": ZERO, "errores": [], "dry_run": dry_run}
+        por_producto = {}  # producto -> [cantidad_base, unidad_base, precio_total]
+        lote = []
+
+        def procesar(conn):
+            for n, linea in self.leer_filas(ruta):
+                try:
+                    l = self.compras_backend._preparar_linea(**linea)
+                    cantidad_base, unidad_base = convert_to_base(l["cantidad"], l["unidad"])
+                    if not cantidad_base or cantidad_base <= 0:
+                        raise ValueError(f"Unidad o cantidad inválida: {l['cantidad']} {l['unidad']}")
+                    acumulado = por_producto.get(l["producto"])
+                    if acumulado and acumulado[1] != unidad_base:
+                        raise ValueError(f"'{l['producto']}' mezcla {acumulado[1]} y {unidad_base}")
+                except (ValueError, TypeError) as e:
+                    resumen["errores"].append(f"Línea {n}: {e}")
+                    continue
+
+                if acumulado:
+                    acumulado[0] += cantidad_base
+                    acumulado[2] += l["precio_total"]
+                else:
+                    por_producto[l["producto"]] = [cantidad_base, unidad_base, l["precio_total"]]
+                resumen["lineas"] += 1
+                resumen["total"] += l["precio_total"]
+                lote.append((l["producto"], l["cantidad"], l["unidad"], l["precio_compra"], l["precio_total"], l["proveedor"], l["tipo"]))
+
+                if len(lote) >= self.batch_size:
+                    if conn is not None and not resumen["errores"]:
+                        self._guardar_lote(lote, conn)
+                    lote.clear()
+                    if progress:
+                        progress(resumen["lineas"])
+
+            if resumen["errores"]:
+                return
+            if conn is not None:
+                self._guardar_lote(lote, conn)
+                marcar_cambio("compras", conn=conn)
+                # Same lock order as save_purchases, so concurrent imports cannot deadlock
+                for producto in sorted(por_producto):
+                    cantidad_base, unidad_base, precio_total = por_producto[producto]
+                    self.inventario.actualizar_stock_desde_compra(producto, cantidad_base, unidad_base, precio_total, conn=conn)
+            lote.clear()
+            if progress:
+                progress(resumen["lineas"])
+
+        if dry_run:
+            procesar(None)
+        else:
+            with db_connection() as conn:
+                procesar(conn)
+                if resumen["errores"]:
+                    raise ValueError(f"{len(resumen['errores'])} línea(s) inválidas; no se importó nada:\n" + "\n".join(resumen["errores"][:10]))
+
+        resumen["productos"] = len(por_producto)
+        logger.info(f"Importación de {ruta}{' (simulada)' if dry_run else ''}: {resumen['lineas']} líneas, "
+                    f"{resumen['productos']} productos, ${resumen['total']:.2f}, {len(resumen['errores'])} errores")
+        return resumen
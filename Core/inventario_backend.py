@@ -1,160 +1,306 @@
 # Codigo 1 backend de la ui (refactorizado)
 
-from Core.database import get_connection
+import threading
+from Core.database import db_connection, on_commit
+from Core.cambios import marcar_cambio, suscribir
 from Core.logger import setup_logger
-from Core.units import convert_to_base, convert_from_base, CONVERSIONS
+from Core.units import convert_to_base, convert_many_to_base, get_base_unit_for
+from Core.money import money, cost, divide, ZERO
+from Core.services import services
 
 class InventarioBackend:
     def __init__(self):
-        self.database = get_connection()
         self.logger = setup_logger()
+        self._cache = None  # producto -> row, loaded on first read and kept up to date by the writes below
+        self._cache_lock = threading.RLock()
+        self._listeners = []
+        # Stock and costs written by other terminals (Core.cambios.sincronizar)
+        suscribir(self._on_cambios_remotos)
         self.logger.info("InventarioBackend initialized")
 
     def _get_unidad_base(self, unidad):
         """Determina la unidad base a partir de una unidad dada."""
-        unidad = unidad.lower()
-        for category, units in CONVERSIONS.items():
-            if unidad in units:
-                if category == 'weight': return 'g'
-                if category == 'volume': return 'ml'
-                if category == 'count': return 'unit'
-        return None
-
-    def actualizar_stock_desde_compra(self, producto, cantidad, unidad, precio_total):
-        """Añade stock al inventario y recalcula el costo promedio."""
-        conn = get_connection()
-        if not conn: return
+        return get_base_unit_for(unidad)
+
+    # Weighted-average upsert in one statement. MariaDB evaluates the UPDATE
+    # assignments left to right, so the cost is computed with the old stock
+    # before cantidad_stock is incremented. The row lock taken by the upsert
+    # serializes concurrent purchases of the same product.
+    _UPSERT_STOCK_SQL = """
+        INSERT INTO inventario (producto_id, cantidad_stock, unidad_base, costo_promedio_ponderado)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            costo_promedio_ponderado = ((cantidad_stock * costo_promedio_ponderado) + %s) / (cantidad_stock + VALUES(cantidad_stock)),
+            cantidad_stock = cantidad_stock + VALUES(cantidad_stock)
+    """
+
+    def actualizar_stock_desde_compra(self, producto, cantidad, unidad, precio_total, conn=None):
+        """
+        Añade stock al inventario y recalcula el costo promedio.
+        Si se pasa ``conn`` la escritura forma parte de la transacción del llamador.
+        """
+        unidad_base = self._get_unidad_base(unidad)
+        if not unidad_base:
+            raise ValueError(f"Unidad '{unidad}' no reconocida.")
+
+        cantidad_base, _ = convert_to_base(cantidad, unidad)
+        if not cantidad_base:
+            raise ValueError("No se pudo convertir la cantidad a la unidad base.")
+
+        precio_total = money(precio_total)
+        costo_unitario_base = cost(divide(precio_total, cantidad_base))
         try:
-            with conn.cursor() as cursor:
-                unidad_base = self._get_unidad_base(unidad)
-                if not unidad_base:
-                    raise ValueError(f"Unidad '{unidad}' no reconocida.")
-
-                cantidad_base, _ = convert_to_base(float(cantidad), unidad)
-                if not cantidad_base:
-                    raise ValueError("No se pudo convertir la cantidad a la unidad base.")
-
-                # Verificar si el producto ya existe
-                cursor.execute("SELECT cantidad_stock, costo_promedio_ponderado FROM inventario WHERE producto = %s", (producto,))
-                result = cursor.fetchone()
-
-                if result:
-                    # Producto existe: actualizar stock y costo promedio
-                    stock_actual, costo_actual = float(result['cantidad_stock']), float(result['costo_promedio_ponderado'])
-                    nuevo_stock = stock_actual + cantidad_base
-                    # Fórmula del costo promedio ponderado
-                    nuevo_costo_promedio = ((stock_actual * costo_actual) + precio_total) / nuevo_stock
+            with db_connection(conn) as conn:
+                producto_id = services.productos.id(producto, conn=conn, crear=True)
+                with conn.cursor() as cursor:
                     cursor.execute(
-                        "UPDATE inventario SET cantidad_stock = %s, costo_promedio_ponderado = %s WHERE producto = %s",
-                        (nuevo_stock, nuevo_costo_promedio, producto)
+                        self._UPSERT_STOCK_SQL,
+                        (producto_id, cantidad_base, unidad_base, costo_unitario_base, precio_total)
                     )
-                    self.logger.info(f"Updated stock for {producto}: +{cantidad_base} {unidad_base}, new total: {nuevo_stock}")
-                else:
-                    # Producto no existe: insertar nuevo
-                    costo_unitario_base = precio_total / cantidad_base
-                    cursor.execute(
-                        "INSERT INTO inventario (producto, cantidad_stock, unidad_base, costo_promedio_ponderado) VALUES (%s, %s, %s, %s)",
-                        (producto, cantidad_base, unidad_base, costo_unitario_base)
-                    )
-                    self.logger.info(f"Inserted new product in inventory: {producto}")
-
-            conn.commit()
+                self._refrescar_cache([producto_id], conn)
+                marcar_cambio("inventario", conn=conn)
+            self.logger.info(f"Updated stock for {producto}: +{cantidad_base} {unidad_base}")
         except Exception as e:
             self.logger.error(f"Error updating stock from purchase: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
+            raise
 
-    def consumir_stock(self, producto, cantidad_a_consumir, unidad_consumo):
+    def consumir_stock(self, producto, cantidad_a_consumir, unidad_consumo, conn=None):
         """Reduce el stock de un producto. Lanza un error si no hay suficiente."""
-        conn = get_connection()
-        if not conn: return
+        self.consumir_stock_lote(
+            [{'producto': producto, 'cantidad': cantidad_a_consumir, 'unidad': unidad_consumo}],
+            conn=conn
+        )
+
+    def consumir_stock_lote(self, items, conn=None):
+        """
+        Consume el stock de varios productos en una sola transacción.
+
+        :param items: lista de dicts {'producto', 'cantidad', 'unidad'}; un mismo
+            producto puede aparecer varias veces y se suma.
+        :param conn: conexión de una transacción ya abierta por el llamador.
+        :return: dict producto -> {'producto_id', 'cantidad_base', 'unidad_base', 'costo_promedio_ponderado'}
+            con lo consumido de cada producto.
+
+        Bloquea todas las filas con un único SELECT ... FOR UPDATE, valida todo
+        antes de escribir y actualiza con un executemany: o se consume todo o nada.
+        """
+        # Agregar cantidades por producto en unidad base
+        requeridos = {}
+        cantidades_base, unidades_base = convert_many_to_base(
+            [item['cantidad'] for item in items], [item['unidad'] for item in items]
+        )
+        for item, cantidad_base, unidad_base in zip(items, cantidades_base, unidades_base):
+            producto = item['producto']
+            if not unidad_base or not cantidad_base:
+                raise ValueError(f"No se pudo convertir la cantidad de consumo '{item['cantidad']} {item['unidad']}'")
+            actual = requeridos.get(producto)
+            if actual and actual[1] != unidad_base:
+                raise ValueError(f"Unidades incompatibles para '{producto}': {actual[1]} y {unidad_base}")
+            requeridos[producto] = ((actual[0] if actual else ZERO) + cantidad_base, unidad_base)
+        if not requeridos:
+            return {}
+
         try:
-            with conn.cursor() as cursor:
-                # Obtener stock actual
-                cursor.execute("SELECT cantidad_stock, unidad_base FROM inventario WHERE producto = %s", (producto,))
-                result = cursor.fetchone()
-                if not result:
-                    raise ValueError(f"El producto '{producto}' no existe en el inventario.")
-
-                stock_actual_base, unidad_base_db = float(result['cantidad_stock']), result['unidad_base']
-
-                # Convertir la cantidad a consumir a la unidad base de la DB
-                cantidad_base_a_consumir, _ = convert_to_base(float(cantidad_a_consumir), unidad_consumo)
-                if not cantidad_base_a_consumir:
-                    raise ValueError(f"No se pudo convertir la cantidad de consumo '{cantidad_a_consumir} {unidad_consumo}'")
-
-                if stock_actual_base < cantidad_base_a_consumir:
-                    raise ValueError(f"Stock insuficiente para '{producto}'. Disponible: {stock_actual_base:.2f} {unidad_base_db}, Requerido: {cantidad_base_a_consumir:.2f} {unidad_base_db}")
-
-                # Actualizar stock
-                nuevo_stock = stock_actual_base - cantidad_base_a_consumir
-                cursor.execute("UPDATE inventario SET cantidad_stock = %s WHERE producto = %s", (nuevo_stock, producto))
-            conn.commit()
+            with db_connection(conn) as conn:
+                ids = services.productos.ids(requeridos, conn=conn)
+                with conn.cursor() as cursor:
+                    stock = {}
+                    if ids:
+                        placeholders = ", ".join(["%s"] * len(ids))
+                        cursor.execute(
+                            f"SELECT producto_id, cantidad_stock, unidad_base, costo_promedio_ponderado FROM inventario WHERE producto_id IN ({placeholders}) FOR UPDATE",
+                            list(ids.values())
+                        )
+                        stock = {r['producto_id']: r for r in cursor.fetchall()}
+
+                    consumidos = {}
+                    for producto, (cantidad_base, unidad_base) in requeridos.items():
+                        row = stock.get(ids.get(producto))
+                        if not row:
+                            raise ValueError(f"El producto '{producto}' no existe en el inventario.")
+                        unidad_base_db = row['unidad_base']
+                        if unidad_base != unidad_base_db:
+                            raise ValueError(f"No se puede consumir '{producto}' en {unidad_base}: el inventario está en {unidad_base_db}")
+                        stock_actual_base = row['cantidad_stock']
+                        if stock_actual_base < cantidad_base:
+                            raise ValueError(f"Stock insuficiente para '{producto}'. Disponible: {stock_actual_base:.2f} {unidad_base_db}, Requerido: {cantidad_base:.2f} {unidad_base_db}")
+                        consumidos[producto] = {
+                            'producto_id': row['producto_id'],
+                            'cantidad_base': cantidad_base,
+                            'unidad_base': unidad_base_db,
+                            'costo_promedio_ponderado': row['costo_promedio_ponderado'],
+                        }
+
+                    cursor.executemany(
+                        "UPDATE inventario SET cantidad_stock = cantidad_stock - %s WHERE producto_id = %s",
+                        [(c['cantidad_base'], c['producto_id']) for c in consumidos.values()]
+                    )
+                self._refrescar_cache([c['producto_id'] for c in consumidos.values()], conn)
+                marcar_cambio("inventario", conn=conn)
+            return consumidos
         except Exception as e:
             self.logger.error(f"Error consumiendo stock: {e}")
-            conn.rollback()
             raise
-        finally:
-            conn.close()
 
     # Core/inventario_backend.py (continuation)
 
+    # --- Cache (producto -> fila de inventario) ---
+
+    # Keyed by name for the rest of the app; the name comes from the productos master table
+    _SELECT_INVENTARIO_SQL = """
+        SELECT p.nombre AS producto, i.producto_id, i.cantidad_stock, i.unidad_base, i.costo_promedio_ponderado
+        FROM inventario i
+        JOIN productos p ON p.id = i.producto_id
+    """
+
+    def _cargar_cache(self):
+        """Fills the cache with one full-table query (only the first time)."""
+        with self._cache_lock:
+            if self._cache is not None:
+                return
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(self._SELECT_INVENTARIO_SQL)
+                    self._cache = {r['producto']: r for r in cursor.fetchall()}
+            self.logger.info(f"Caché de inventario cargada: {len(self._cache)} productos")
+
+    def _refrescar_cache(self, producto_ids, conn):
+        """
+        Re-reads the rows just written on ``conn`` and applies them to the cache
+        once the transaction commits (nothing changes if it rolls back).
+        """
+        producto_ids = list(dict.fromkeys(producto_ids))
+        placeholders = ", ".join(["%s"] * len(producto_ids))
+        with conn.cursor() as cursor:
+            cursor.execute(f"{self._SELECT_INVENTARIO_SQL} WHERE i.producto_id IN ({placeholders})", producto_ids)
+            rows = cursor.fetchall()
+        on_commit(conn, lambda: self._aplicar_cambios(rows))
+
+    def _aplicar_cambios(self, rows):
+        with self._cache_lock:
+            if self._cache is not None:
+                for row in rows:
+                    self._cache[row['producto']] = row
+        self._notificar(rows)
+
+    def _on_cambios_remotos(self, tablas):
+        if "inventario" in tablas or "productos" in tablas:
+            self.sincronizar_cache()
+
+    def sincronizar_cache(self):
+        """
+        Reloads a loaded cache after other terminals wrote to inventario and
+        notifies only the rows that differ (renamed products go out as None).
+        """
+        with self._cache_lock:
+            if self._cache is None:
+                return
+            # Read under the lock: a local commit applied meanwhile cannot be overwritten by an older snapshot
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(self._SELECT_INVENTARIO_SQL)
+                    nuevo = {r['producto']: r for r in cursor.fetchall()}
+            cambiados = [r for p, r in nuevo.items() if self._cache.get(p) != r]
+            borrados = [p for p in self._cache if p not in nuevo]
+            self._cache = nuevo
+        if cambiados or borrados:
+            self.logger.info(f"Inventario de otros terminales: {len(cambiados)} cambio(s), {len(borrados)} baja(s)")
+            self._notificar(cambiados, borrados)
+
+    def _notificar(self, rows, borrados=()):
+        cambios = {row['producto']: self._formatear(row) if row['cantidad_stock'] > 0 else None for row in rows}
+        cambios.update((producto, None) for producto in borrados)
+        for listener in list(self._listeners):
+            try:
+                listener(cambios)
+            except Exception as e:
+                self.logger.error(f"Error notificando cambios de inventario: {e}")
+
+    def subscribe(self, listener):
+        """
+        Registers listener(cambios) called after every committed stock change, where
+        ``cambios`` is {producto: fila de get_inventario_para_resumen, or None if it
+        ran out}. It runs on the thread that committed: GUI code must marshal it
+        to Tk (see Gui.task_runner.listen). Returns a function that unsubscribes.
+        """
+        self._listeners.append(listener)
+
+        def unsubscribe():
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+        return unsubscribe
+
+    def get_costos(self, productos=None):
+        """
+        {producto: (costo_promedio_ponderado, unidad_base)} from the cache, for
+        ``productos`` or every item. Used by the recipe cost engine (Core.bom).
+        """
+        self._cargar_cache()
+        with self._cache_lock:
+            if productos is None:
+                rows = self._cache.values()
+            else:
+                rows = [self._cache[p] for p in productos if p in self._cache]
+            return {r['producto']: (r['costo_promedio_ponderado'], r['unidad_base']) for r in rows}
+
+    def get_existencias(self, productos=None):
+        """{producto: (cantidad_stock, unidad_base)} from the cache, like get_costos."""
+        self._cargar_cache()
+        with self._cache_lock:
+            if productos is None:
+                rows = self._cache.values()
+            else:
+                rows = [self._cache[p] for p in productos if p in self._cache]
+            return {r['producto']: (r['cantidad_stock'], r['unidad_base']) for r in rows}
+
+    def invalidate_cache(self):
+        """Drops the cache; the next read reloads it from the database."""
+        with self._cache_lock:
+            self._cache = None
+
+    @staticmethod
+    def _formatear(item):
+        """Display row for one inventory item (dynamic unit, Decimal total_valor)."""
+        cantidad_base = item['cantidad_stock'] # Decimal, e.g. 800.0000
+        unidad_base = item['unidad_base']      # e.g., 'g'
+        costo_por_base = item['costo_promedio_ponderado'] # Decimal, e.g. 0.1750
+
+        # --- Dynamic Unit Conversion Logic ---
+        display_cantidad = cantidad_base
+        display_unidad = unidad_base
+
+        if unidad_base == 'g':
+            if cantidad_base >= 1000:
+                display_cantidad = cantidad_base / 1000
+                display_unidad = 'kg'
+        elif unidad_base == 'ml':
+            if cantidad_base >= 1000:
+                display_cantidad = cantidad_base / 1000
+                display_unidad = 'l'
+        # You can add more rules here for other units if needed
+
+        return {
+            "producto": item['producto'],
+            "cantidad_display": f"{display_cantidad:.2f}",
+            "unidad_display": display_unidad,
+            "costo_promedio_display": f"${costo_por_base:.4f}", # cost per base unit (e.g. per g)
+            # The total value of the stock for this item
+            "total_valor": money(cantidad_base * costo_por_base)
+        }
+
     def get_inventario_para_resumen(self):
         """
-        Fetches all items from the inventory table, ready for display.
+        All items in stock, ready for display. Served from the cache after the
+        first call; use subscribe() to follow later changes.
         """
-        conn = get_connection()
-        if not conn: return []
         try:
-            with conn.cursor() as cursor:
-                # We only care about items we actually have in stock
-                cursor.execute("SELECT producto, cantidad_stock, unidad_base, costo_promedio_ponderado FROM inventario WHERE cantidad_stock > 0")
-                results = cursor.fetchall()
-                
-                # Here's where we implement the dynamic unit display logic
-                processed_results = []
-                for item in results:
-                    producto = item['producto']
-                    cantidad_base = float(item['cantidad_stock']) # e.g., 800.0
-                    unidad_base = item['unidad_base']      # e.g., 'g'
-                    costo_por_base = float(item['costo_promedio_ponderado']) # e.g., 0.175
-
-                    # --- Dynamic Unit Conversion Logic ---
-                    display_cantidad = cantidad_base
-                    display_unidad = unidad_base
-
-                    if unidad_base == 'g':
-                        if cantidad_base >= 1000:
-                            display_cantidad = cantidad_base / 1000
-                            display_unidad = 'kg'
-                    elif unidad_base == 'ml':
-                        if cantidad_base >= 1000:
-                            display_cantidad = cantidad_base / 1000
-                            display_unidad = 'l'
-                    # You can add more rules here for other units if needed
-
-                    # --- Calculate Display Values ---
-                    # The total value of the stock for this item
-                    total_valor = cantidad_base * costo_por_base
-
-                    # The cost per base unit (e.g., cost per g)
-                    costo_por_display_unidad = costo_por_base
-
-                    processed_results.append({
-                        "producto": producto,
-                        "cantidad_display": f"{display_cantidad:.2f}",
-                        "unidad_display": display_unidad,
-                        "costo_promedio_display": f"${costo_por_display_unidad:.4f}", # e.g., $/kg
-                        "total_valor": total_valor
-                    })
-                    
-                return processed_results
+            self._cargar_cache()
         except Exception as e:
             self.logger.error(f"Error retrieving summary inventory: {e}")
             return []
-        finally:
-            conn.close()
+        with self._cache_lock:
+            items = [r for r in self._cache.values() if r['cantidad_stock'] > 0]
+        return [self._formatear(item) for item in sorted(items, key=lambda r: r['producto'])]
 
 
     # def get_inventario(self):
@@ -1,33 +1,100 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import threading
 
+LOGGER_NAME = "economia_app"
+LOG_DIR = "logs"
+LOG_FILE = os.path.join(LOG_DIR, "app.log")
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
-def setup_logger():
+# Rotation: "size" (default, LOG_MAX_BYTES per file) or "time" (daily, at midnight)
+LOG_ROTATION = os.environ.get("ECONOMIA_LOG_ROTATION", "size")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Global level and per-module levels. Module names are relative to LOGGER_NAME,
+# e.g. ECONOMIA_LOG_LEVELS="units=DEBUG,connection_pool=WARNING".
+LOG_LEVEL = os.environ.get("ECONOMIA_LOG_LEVEL", "DEBUG")
+DEFAULT_MODULE_LEVELS = {}
+
+_listener = None
+_lock = threading.Lock()
+
+
+def _module_levels():
+    levels = dict(DEFAULT_MODULE_LEVELS)
+    for item in os.environ.get("ECONOMIA_LOG_LEVELS", "").split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _file_handler():
+    if LOG_ROTATION == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when="midnight", backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    return logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+
+
+def _configure():
     """
-    Sets up a detailed logger for the application.
-    Logs to console and file with timestamps, levels, and messages.
+    Configures the application logger once per process.
+
+    Records go through a QueueHandler; a QueueListener thread writes them to
+    the console and the rotating log file, so callers never wait on I/O.
     """
-    logger = logging.getLogger("economia_app")
-    logger.setLevel(logging.DEBUG)  # Set to DEBUG for detailed logging
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
 
-    # Create logs directory if it doesn't exist
-    if not os.path.exists("logs"):
-        os.makedirs("logs")
+        os.makedirs(LOG_DIR, exist_ok=True)
+        formatter = logging.Formatter(LOG_FORMAT)
 
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        file_handler = _file_handler()
+        file_handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        app_logger = logging.getLogger(LOGGER_NAME)
+        app_logger.setLevel(LOG_LEVEL.upper())
+        # Drop handlers left by an older setup_logger() in the same process
+        for handler in list(app_logger.handlers):
+            app_logger.removeHandler(handler)
+        app_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        app_logger.propagate = False
+
+        for name, level in _module_levels().items():
+            logging.getLogger(f"{LOGGER_NAME}.{name}").setLevel(level)
+
+        _listener = logging.handlers.QueueListener(
+            log_queue, console_handler, file_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(shutdown_logging)
 
-    # File handler
-    file_handler = logging.FileHandler("logs/app.log")
-    file_formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
 
-    return logger
+def shutdown_logging():
+    """Flushes pending records and stops the listener thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def setup_logger(name=None):
+    """
+    Returns the application logger, or the child logger ``economia_app.<name>``.
+    Safe to call any number of times: handlers are only installed once.
+    """
+    _configure()
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
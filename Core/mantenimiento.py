@@ -0,0 +1,57 @@
+# Core/mantenimiento.py
+"""
+Comandos de mantenimiento de la base de datos.
+
+    python -m Core.mantenimiento rebuild-ventas-diarias [--cliente ID]
+    python -m Core.mantenimiento repreciar-recetas
+    python -m Core.mantenimiento renombrar-producto ID NOMBRE
+"""
+
+import argparse
+from Core.database import close_pool
+from Core.logger import setup_logger
+from Core.services import services
+
+logger = setup_logger("mantenimiento")
+
+
+def rebuild_ventas_diarias(args):
+    filas = services.ventas.rebuild_ventas_diarias(cliente_id=args.cliente)
+    print(f"ventas_diarias reconstruida: {filas} filas")
+
+
+def repreciar_recetas(args):
+    recetas = services.produccion.repreciar_recetas()
+    print(f"Costo actual recalculado para {recetas} recetas")
+
+
+def renombrar_producto(args):
+    services.productos.renombrar(args.id, args.nombre)
+    print(f"Producto {args.id} renombrado a '{args.nombre}'")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m Core.mantenimiento", description="Mantenimiento de la base de datos")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-ventas-diarias", help="Recalcula el resumen diario de ventas desde la tabla ventas")
+    rebuild.add_argument("--cliente", type=int, default=None, help="Solo este cliente_id")
+    rebuild.set_defaults(func=rebuild_ventas_diarias)
+
+    repreciar = commands.add_parser("repreciar-recetas", help="Recalcula el costo actual de todas las recetas")
+    repreciar.set_defaults(func=repreciar_recetas)
+
+    renombrar = commands.add_parser("renombrar-producto", help="Cambia el nombre de un producto (stock, compras y recetas lo siguen)")
+    renombrar.add_argument("id", type=int, help="productos.id")
+    renombrar.add_argument("nombre", help="Nuevo nombre")
+    renombrar.set_defaults(func=renombrar_producto)
+
+    args = parser.parse_args(argv)
+    try:
+        args.func(args)
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
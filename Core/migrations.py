@@ -0,0 +1,364 @@
+# Core/migrations.py
+
+from Core.logger import setup_logger
+
+logger = setup_logger("migrations")
+
+
+class MigrationError(Exception):
+    """A migration refused to run because existing data would not survive it."""
+
+
+def _columna_existe(cursor, tabla, columna):
+    cursor.execute(
+        "SELECT 1 FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (tabla, columna)
+    )
+    return cursor.fetchone() is not None
+
+
+def _si_columna(tabla, columna, sql):
+    """Step that runs ``sql`` only while ``tabla.columna`` exists (so a retried migration skips it)."""
+    def paso(cursor):
+        if _columna_existe(cursor, tabla, columna):
+            cursor.execute(sql)
+    return paso
+
+
+def _si_no_hay(consulta, sql):
+    """Step that runs ``sql`` only while ``consulta`` returns no rows (so a backfill is never applied twice)."""
+    def paso(cursor):
+        cursor.execute(consulta)
+        if cursor.fetchone() is None:
+            cursor.execute(sql)
+    return paso
+
+
+def _exigir_vacio(sql, mensaje):
+    """Guard step: aborts the migration if ``sql`` returns rows (their ids go in the error)."""
+    def paso(cursor):
+        cursor.execute(sql)
+        filas = cursor.fetchall()
+        if filas:
+            raise MigrationError(f"{mensaje} (id {', '.join(str(f['id']) for f in filas)})")
+    return paso
+
+
+# Numbered schema migrations. Each entry is (version, description, [step, ...]),
+# where a step is an SQL string or a callable(cursor) (see the helpers above).
+# Applied once, in order, and recorded in `schema_version`. Never edit a
+# migration that has already shipped: append a new one instead.
+MIGRATIONS = [
+    (1, "Tablas iniciales", [
+        """
+        CREATE TABLE IF NOT EXISTS compras (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            producto VARCHAR(255) NOT NULL,
+            cantidad VARCHAR(255) NOT NULL,
+            unidad VARCHAR(255) NOT NULL,
+            precio_compra DECIMAL(10,2) NOT NULL,
+            precio_total DECIMAL(10,2) NOT NULL,
+            proveedor VARCHAR(255) NOT NULL,
+            tipo VARCHAR(50) NOT NULL,
+            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS inventario (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            producto VARCHAR(100) UNIQUE NOT NULL,
+            cantidad_stock DECIMAL(15,4) NOT NULL DEFAULT 0,
+            unidad_base VARCHAR(20) NOT NULL,
+            costo_promedio_ponderado DECIMAL(10,4) NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS subproductos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(255) UNIQUE NOT NULL,
+            costo_total_subproducto DECIMAL(10,2) NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS subproducto_ingredientes (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            subproducto_id INT NOT NULL,
+            producto_ingrediente VARCHAR(255) NOT NULL,
+            cantidad_usada DECIMAL(10,4) NOT NULL,
+            unidad_usada VARCHAR(20) NOT NULL,
+            FOREIGN KEY (subproducto_id) REFERENCES subproductos(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS productos_finales (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(255) UNIQUE NOT NULL,
+            subproducto_id INT NOT NULL,
+            unidades_producidas INT NOT NULL,
+            FOREIGN KEY (subproducto_id) REFERENCES subproductos(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS clientes(
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(255) UNIQUE NOT NULL
+        )
+        """,
+    ]),
+    (2, "Columna precio_venta en productos_finales", [
+        "ALTER TABLE productos_finales ADD COLUMN IF NOT EXISTS precio_venta DECIMAL(10,2) NULL DEFAULT NULL",
+    ]),
+    (3, "Columna active en clientes", [
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS active TINYINT(1) NOT NULL DEFAULT 1",
+    ]),
+    # The ventas DDL used to be built in get_connection() but never executed.
+    (4, "Tabla ventas", [
+        """
+        CREATE TABLE IF NOT EXISTS ventas(
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            cliente_id INT NOT NULL,
+            producto_final_id INT NOT NULL,
+            cantidad_vendida INT NOT NULL,
+            precio_unitario_venta DECIMAL(10,2) NOT NULL,
+            total_venta DECIMAL(10,2) NOT NULL,
+            fecha_venta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (cliente_id) REFERENCES clientes(id),
+            FOREIGN KEY (producto_final_id) REFERENCES productos_finales(id)
+        )
+        """,
+    ]),
+    (5, "Índices para el historial de compras", [
+        "CREATE INDEX IF NOT EXISTS idx_compras_fecha ON compras (fecha, id)",
+        "CREATE INDEX IF NOT EXISTS idx_compras_producto_fecha ON compras (producto, fecha, id)",
+        "CREATE INDEX IF NOT EXISTS idx_compras_proveedor_fecha ON compras (proveedor, fecha, id)",
+    ]),
+    # Per-client daily totals, maintained by VentasBackend on every sale
+    (6, "Resumen diario de ventas por cliente", [
+        "CREATE INDEX IF NOT EXISTS idx_ventas_cliente_fecha ON ventas (cliente_id, fecha_venta)",
+        """
+        CREATE TABLE IF NOT EXISTS ventas_diarias (
+            cliente_id INT NOT NULL,
+            dia DATE NOT NULL,
+            ventas_count INT NOT NULL DEFAULT 0,
+            total_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (cliente_id, dia),
+            FOREIGN KEY (cliente_id) REFERENCES clientes(id)
+        )
+        """,
+        """
+        INSERT INTO ventas_diarias (cliente_id, dia, ventas_count, total_sum)
+        SELECT cliente_id, DATE(fecha_venta), COUNT(*), COALESCE(SUM(total_venta), 0)
+        FROM ventas
+        GROUP BY cliente_id, DATE(fecha_venta)
+        ON DUPLICATE KEY UPDATE ventas_count = VALUES(ventas_count), total_sum = VALUES(total_sum)
+        """,
+    ]),
+    # Ledger fed by purchases, sales and production (see Core/contabilidad_backend.py).
+    # Production runs have no date in the old tables, so only compras and ventas are backfilled.
+    (7, "Libro de movimientos", [
+        """
+        CREATE TABLE IF NOT EXISTS movimientos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            tipo VARCHAR(20) NOT NULL,
+            descripcion VARCHAR(255) NOT NULL,
+            monto DECIMAL(14,2) NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos (fecha, id)",
+        # (fecha, tipo, monto) covers the indicator sums: no table reads for a date range
+        "CREATE INDEX IF NOT EXISTS idx_movimientos_fecha_tipo ON movimientos (fecha, tipo, monto)",
+        "CREATE INDEX IF NOT EXISTS idx_movimientos_tipo_fecha ON movimientos (tipo, fecha, id)",
+        # Each backfill is skipped if movimientos already has entries of its tipo
+        _si_no_hay("SELECT 1 FROM movimientos WHERE tipo = 'compra' LIMIT 1", """
+        INSERT INTO movimientos (fecha, tipo, descripcion, monto)
+        SELECT fecha, 'compra', LEFT(CONCAT(producto, ' - ', proveedor), 255), precio_total
+        FROM compras
+        """),
+        _si_no_hay("SELECT 1 FROM movimientos WHERE tipo = 'venta' LIMIT 1", """
+        INSERT INTO movimientos (fecha, tipo, descripcion, monto)
+        SELECT v.fecha_venta, 'venta', LEFT(CONCAT('Venta a ', COALESCE(c.nombre, v.cliente_id)), 255), SUM(v.total_venta)
+        FROM ventas v
+        LEFT JOIN clientes c ON c.id = v.cliente_id
+        GROUP BY v.cliente_id, v.fecha_venta, c.nombre
+        """),
+    ]),
+    # Nested recipes (Core/bom.py): an ingredient is either an inventory product or
+    # another subproducto; every recipe declares what one batch yields.
+    (8, "Recetas anidadas", [
+        "ALTER TABLE subproducto_ingredientes MODIFY producto_ingrediente VARCHAR(255) NULL",
+        "ALTER TABLE subproducto_ingredientes ADD COLUMN IF NOT EXISTS subproducto_ingrediente_id INT NULL",
+        """
+        ALTER TABLE subproducto_ingredientes
+        ADD CONSTRAINT fk_ingrediente_subproducto FOREIGN KEY IF NOT EXISTS (subproducto_ingrediente_id)
+        REFERENCES subproductos(id)
+        """,
+        "ALTER TABLE subproductos ADD COLUMN IF NOT EXISTS rendimiento_cantidad DECIMAL(15,4) NOT NULL DEFAULT 1",
+        "ALTER TABLE subproductos ADD COLUMN IF NOT EXISTS rendimiento_unidad VARCHAR(20) NOT NULL DEFAULT 'unit'",
+        # Batch cost at current raw material costs (costo_total_subproducto keeps the cost when it was made)
+        "ALTER TABLE subproductos ADD COLUMN IF NOT EXISTS costo_actual DECIMAL(14,4) NULL",
+    ]),
+    # One row per recipe produced by ProduccionBackend.producir_plan
+    (9, "Corridas de producción", [
+        """
+        CREATE TABLE IF NOT EXISTS produccion_runs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            subproducto_id INT NOT NULL,
+            lotes INT NOT NULL,
+            costo_total DECIMAL(14,2) NOT NULL,
+            fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (subproducto_id) REFERENCES subproductos(id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_produccion_runs_fecha ON produccion_runs (fecha, id)",
+    ]),
+    # Product master table (Core/productos_backend.py). inventario, compras and
+    # subproducto_ingredientes then reference it by id instead of repeating the
+    # name (migrations 11-13, one per table). Each of those is resumable: the
+    # steps that read the old column are skipped once it is gone, data is
+    # checked before anything destructive runs, and the table is rebuilt by a
+    # single idempotent ALTER at the end.
+    (10, "Tabla maestra de productos", [
+        """
+        CREATE TABLE IF NOT EXISTS productos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(255) NOT NULL,
+            UNIQUE KEY uq_productos_nombre (nombre)
+        )
+        """,
+        _si_columna("inventario", "producto", "INSERT IGNORE INTO productos (nombre) SELECT producto FROM inventario"),
+        _si_columna("compras", "producto", "INSERT IGNORE INTO productos (nombre) SELECT DISTINCT producto FROM compras"),
+        _si_columna("subproducto_ingredientes", "producto_ingrediente", """
+            INSERT IGNORE INTO productos (nombre)
+            SELECT DISTINCT producto_ingrediente FROM subproducto_ingredientes WHERE producto_ingrediente IS NOT NULL
+        """),
+    ]),
+    (11, "inventario referencia productos por id", [
+        "ALTER TABLE inventario ADD COLUMN IF NOT EXISTS producto_id INT NULL AFTER id",
+        _si_columna("inventario", "producto",
+                    "UPDATE inventario i JOIN productos p ON p.nombre = i.producto SET i.producto_id = p.id"),
+        _exigir_vacio(
+            "SELECT id FROM inventario WHERE producto_id IS NULL LIMIT 20",
+            "Filas de inventario sin producto en la tabla productos"
+        ),
+        """
+        ALTER TABLE inventario
+            MODIFY producto_id INT NOT NULL,
+            DROP COLUMN IF EXISTS producto,
+            ADD UNIQUE KEY IF NOT EXISTS uq_inventario_producto (producto_id),
+            ADD CONSTRAINT fk_inventario_producto FOREIGN KEY IF NOT EXISTS (producto_id) REFERENCES productos(id)
+        """,
+    ]),
+    (12, "compras referencia productos por id y cantidad numérica", [
+        "ALTER TABLE compras ADD COLUMN IF NOT EXISTS producto_id INT NULL AFTER id",
+        _si_columna("compras", "producto",
+                    "UPDATE compras c JOIN productos p ON p.nombre = c.producto SET c.producto_id = p.id"),
+        # Old package rows were stored as text like '2 x 500.0 g'
+        """
+        UPDATE compras
+        SET cantidad = CAST(SUBSTRING_INDEX(cantidad, ' x ', 1) AS DECIMAL(15,4))
+                     * CAST(REPLACE(SUBSTRING_INDEX(SUBSTRING_INDEX(cantidad, ' x ', -1), ' ', 1), ',', '.') AS DECIMAL(15,4))
+        WHERE cantidad REGEXP '^[0-9]+ x [0-9]+([.,][0-9]+)? [^ ]+$'
+        """,
+        "UPDATE compras SET cantidad = REPLACE(TRIM(cantidad), ',', '.') WHERE cantidad LIKE '%,%' OR cantidad <> TRIM(cantidad)",
+        # MODIFY cantidad DECIMAL fails on anything else, after the ALTER has
+        # started; stop here instead and let the rows be fixed by hand.
+        _exigir_vacio(
+            "SELECT id FROM compras WHERE cantidad NOT REGEXP '^-?[0-9]+([.][0-9]+)?(e-?[0-9]+)?$' LIMIT 20",
+            "Compras con cantidad no numérica"
+        ),
+        _exigir_vacio(
+            "SELECT id FROM compras WHERE producto_id IS NULL LIMIT 20",
+            "Compras sin producto en la tabla productos"
+        ),
+        """
+        ALTER TABLE compras
+            MODIFY producto_id INT NOT NULL,
+            MODIFY cantidad DECIMAL(15,4) NOT NULL,
+            DROP INDEX IF EXISTS idx_compras_producto_fecha,
+            DROP COLUMN IF EXISTS producto,
+            ADD INDEX idx_compras_producto_fecha (producto_id, fecha, id),
+            ADD CONSTRAINT fk_compras_producto FOREIGN KEY IF NOT EXISTS (producto_id) REFERENCES productos(id)
+        """,
+    ]),
+    (13, "subproducto_ingredientes referencia productos por id", [
+        "ALTER TABLE subproducto_ingredientes ADD COLUMN IF NOT EXISTS producto_id INT NULL AFTER subproducto_id",
+        _si_columna("subproducto_ingredientes", "producto_ingrediente", """
+            UPDATE subproducto_ingredientes si JOIN productos p ON p.nombre = si.producto_ingrediente
+            SET si.producto_id = p.id
+        """),
+        # Every line is a product or a nested recipe
+        _exigir_vacio(
+            "SELECT id FROM subproducto_ingredientes WHERE producto_id IS NULL AND subproducto_ingrediente_id IS NULL LIMIT 20",
+            "Ingredientes sin producto en la tabla productos"
+        ),
+        """
+        ALTER TABLE subproducto_ingredientes
+            DROP COLUMN IF EXISTS producto_ingrediente,
+            ADD CONSTRAINT fk_ingrediente_producto FOREIGN KEY IF NOT EXISTS (producto_id) REFERENCES productos(id)
+        """,
+    ]),
+    # Shared per-table change counters (Core/cambios.py): every terminal bumps
+    # them on commit and compares them to notice what the others wrote.
+    (14, "Contadores de cambios compartidos", [
+        """
+        CREATE TABLE IF NOT EXISTS cambios (
+            tabla VARCHAR(64) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+        """,
+    ]),
+    # Keyset pagination of the sales history (VentasBackend.get_historial_ventas_pagina)
+    (15, "Índice para el historial de ventas", [
+        "CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas (fecha_venta, id)",
+    ]),
+]
+
+
+def get_schema_version(cursor):
+    cursor.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_version")
+    row = cursor.fetchone()
+    return int(row["version"]) if row else 0
+
+
+def run_migrations(conn):
+    """
+    Applies every pending migration on ``conn``.
+    Returns the schema version after running.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                descripcion VARCHAR(255) NOT NULL,
+                aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+        current = get_schema_version(cursor)
+
+        for version, descripcion, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            try:
+                for paso in statements:
+                    if callable(paso):
+                        paso(cursor)
+                    else:
+                        cursor.execute(paso)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, descripcion) VALUES (%s, %s)",
+                    (version, descripcion)
+                )
+                conn.commit()
+                current = version
+                logger.info(f"Migración {version} aplicada: {descripcion}")
+            except Exception as e:
+                # DDL auto-commits in MariaDB, so a failed migration may be partial.
+                # Stop here so later migrations never run on top of it.
+                conn.rollback()
+                logger.error(f"Error aplicando migración {version} ({descripcion}): {e}")
+                raise
+
+    logger.info(f"Esquema de base de datos en versión {current}")
+    return current
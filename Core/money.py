@@ -0,0 +1,85 @@
+# Core/money.py
+"""
+Aritmética exacta para dinero y cantidades.
+
+Todo importe, costo y cantidad de stock es un ``Decimal``. pymysql ya
+devuelve las columnas DECIMAL como ``Decimal``, así que las filas se usan tal
+cual: solo se convierte lo que entra como texto o float (formularios,
+archivos importados) y se redondea con el contexto compartido al guardar.
+
+Escalas (iguales a las columnas de la base de datos):
+    money()  -> 2 decimales   (precios, totales)
+    cost()   -> 4 decimales   (costo por unidad base)
+    qty()    -> 4 decimales   (cantidades de stock)
+"""
+
+from decimal import Decimal, Context, ROUND_HALF_UP, InvalidOperation, DivisionByZero, Overflow
+
+# Shared context: every rounding in the app goes through it
+CONTEXT = Context(prec=28, rounding=ROUND_HALF_UP, traps=[InvalidOperation, DivisionByZero, Overflow])
+
+ZERO = Decimal(0)
+CENT = Decimal("0.01")
+COST_STEP = Decimal("0.0001")
+QTY_STEP = Decimal("0.0001")
+
+
+def to_decimal(value):
+    """
+    Converts ``value`` to Decimal without changing its meaning.
+    Decimals pass through untouched; floats go through ``str`` so 0.1 stays 0.1.
+    Accepts a comma as decimal separator. Raises ValueError if it is not a
+    finite number (NaN and infinities are rejected too).
+    """
+    if isinstance(value, Decimal):
+        if value.is_finite():
+            return value
+        raise ValueError(f"Número inválido: {value!r}")
+    if value is None:
+        return ZERO
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        value = repr(value)
+    try:
+        result = Decimal(str(value).strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"Número inválido: {value!r}")
+    if not result.is_finite():
+        raise ValueError(f"Número inválido: {value!r}")
+    return result
+
+
+def _quantize(value, step):
+    try:
+        return to_decimal(value).quantize(step, context=CONTEXT)
+    except InvalidOperation:  # too many digits for the context precision
+        raise ValueError(f"Número fuera de rango: {value!r}")
+
+
+def money(value):
+    """Rounds to cents."""
+    return _quantize(value, CENT)
+
+
+def cost(value):
+    """Rounds to the cost scale (4 decimals)."""
+    return _quantize(value, COST_STEP)
+
+
+def qty(value):
+    """Rounds to the stock quantity scale (4 decimals)."""
+    return _quantize(value, QTY_STEP)
+
+
+def divide(a, b):
+    """a / b with the shared context; returns ZERO when b is zero."""
+    b = to_decimal(b)
+    if not b:
+        return ZERO
+    return CONTEXT.divide(to_decimal(a), b)
+
+
+def fmt_money(value):
+    """'$1234.50' for display."""
+    return f"${money(value)}"
@@ -1,20 +1,36 @@
 # Core/produccion_backend.py (Completed File)
 
+import threading
 import pymysql
-from decimal import Decimal
-from Core.database import get_connection
+from collections import defaultdict
+from Core.database import db_connection, on_commit
+from Core.bom import BomEngine
+from Core.cambios import marcar_cambio, versiones_db, suscribir
+from Core.contabilidad_backend import PRODUCCION
 from Core.logger import setup_logger
-from Core.inventario_backend import InventarioBackend
+from Core.money import money, cost, ZERO
+from Core.services import services
+from Core.units import convert_to_base
 
-logger = setup_logger()
+logger = setup_logger("produccion_backend")
 
 class ProduccionBackend:
     def __init__(self):
-        self.db = get_connection()
-        self.inventory_manager = InventarioBackend() # We need this to consume stock
+        self._bom = None
+        self._bom_lock = threading.Lock()
+        self._bom_suscrito = False
+        self._productos_finales = None   # (versiones, rows) of the read model below
+        self._productos_finales_lock = threading.Lock()
+        # Recipes created (or products renamed) on other terminals
+        suscribir(self._on_cambios_remotos)
         logger.info("ProduccionBackend initialized")
 
-    def crear_subproducto(self, nombre_subproducto, ingredientes):
+    @property
+    def inventory_manager(self):
+        # We need this to consume stock (shared instance, resolved on first use)
+        return services.inventario
+
+    def crear_subproducto(self, nombre_subproducto, ingredientes, rendimiento=1, unidad_rendimiento="unit"):
         """
         Creates a subproduct and consumes the required ingredients from inventory.
         
@@ -22,98 +38,282 @@ class ProduccionBackend:
         :param ingredientes: A list of dictionaries, e.g.,
             [
                 {'producto': 'Harina', 'cantidad': 200, 'unidad': 'g'},
-                {'producto': 'Levadura', 'cantidad': 10, 'unidad': 'g'}
+                {'subproducto_id': 7, 'cantidad': 300, 'unidad': 'ml'}   # nested recipe
             ]
+            Nested recipes are expanded into their raw materials, which are consumed.
+        :param rendimiento, unidad_rendimiento: what one batch yields (default: 1 unit),
+            used when another recipe uses this one.
         :return: The total cost of the created subproduct.
         """
-        conn = get_connection()
-        if not conn: raise Exception("No database connection")
-        
-        total_costo = Decimal(0)
         try:
-            # --- Phase 1: Calculate Cost and Validate Stock ---
-            with conn.cursor() as cursor:
-                for ing in ingredientes:
-                    producto = ing['producto']
-                    cantidad = ing['cantidad']
-                    unidad = ing['unidad']
-
-                    # Get cost per base unit from inventory
-                    cursor.execute("SELECT costo_promedio_ponderado FROM inventario WHERE producto = %s", (producto,))
-                    result = cursor.fetchone()
-                    if not result:
-                        raise ValueError(f"El ingrediente '{producto}' no se encuentra en el inventario.")
-                    
-                    costo_por_base = result['costo_promedio_ponderado']
-                    # Convert used amount to base unit to calculate cost
-                    from Core.units import convert_to_base
-                    cantidad_base, _ = convert_to_base(cantidad, unidad)
-                    if not cantidad_base:
-                        raise ValueError(f"No se pudo convertir la cantidad para '{producto}'")
-                    
-                    total_costo += Decimal(cantidad_base) * costo_por_base
-
-            # --- Phase 2: Consume Stock (All or Nothing) ---
-            for ing in ingredientes:
-                self.inventory_manager.consumir_stock(ing['producto'], ing['cantidad'], ing['unidad'])
-
-            # --- Phase 3: Save Subproduct to Database ---
-            with conn.cursor() as cursor:
-                # Insert the main subproduct record
-                cursor.execute(
-                    "INSERT INTO subproductos (nombre, costo_total_subproducto) VALUES (%s, %s)",
-                    (nombre_subproducto, total_costo)
+            rendimiento_base, _ = convert_to_base(rendimiento, unidad_rendimiento)
+            if not rendimiento_base or rendimiento_base <= 0:
+                raise ValueError(f"Rendimiento inválido: {rendimiento} {unidad_rendimiento}")
+            # Raw materials of the whole tree, in base units
+            anidadas = [ing['subproducto_id'] for ing in ingredientes if ing.get('subproducto_id') is not None]
+            necesidades = self._bom_con(anidadas).explotar(ingredientes)
+            with db_connection() as conn:
+                # --- Phase 1: Lock, validate and consume all stock (all or nothing) ---
+                consumidos = self.inventory_manager.consumir_stock_lote(
+                    [{'producto': p, 'cantidad': q, 'unidad': u} for p, (q, u) in necesidades.items()], conn=conn
                 )
-                subproducto_id = cursor.lastrowid
 
-                # Insert each ingredient
-                for ing in ingredientes:
+                # --- Phase 2: Cost from the locked weighted-average costs ---
+                total_costo = money(sum(
+                    (c['cantidad_base'] * c['costo_promedio_ponderado'] for c in consumidos.values()), ZERO
+                ))
+
+                # --- Phase 3: Save Subproduct to Database ---
+                with conn.cursor() as cursor:
+                    # Insert the main subproduct record
                     cursor.execute(
-                        "INSERT INTO subproducto_ingredientes (subproducto_id, producto_ingrediente, cantidad_usada, unidad_usada) VALUES (%s, %s, %s, %s)",
-                        (subproducto_id, ing['producto'], ing['cantidad'], ing['unidad'])
+                        "INSERT INTO subproductos (nombre, costo_total_subproducto, costo_actual, rendimiento_cantidad, rendimiento_unidad) "
+                        "VALUES (%s, %s, %s, %s, %s)",
+                        (nombre_subproducto, total_costo, total_costo, rendimiento, unidad_rendimiento)
+                    )
+                    subproducto_id = cursor.lastrowid
+
+                    # Insert all ingredients at once (raw materials by id, all consumed above so they exist)
+                    producto_ids = services.productos.ids(
+                        [ing['producto'] for ing in ingredientes if ing.get('subproducto_id') is None], conn=conn
+                    )
+                    cursor.executemany(
+                        "INSERT INTO subproducto_ingredientes "
+                        "(subproducto_id, producto_id, subproducto_ingrediente_id, cantidad_usada, unidad_usada) "
+                        "VALUES (%s, %s, %s, %s, %s)",
+                        [(subproducto_id, producto_ids.get(ing.get('producto')), ing.get('subproducto_id'), ing['cantidad'], ing['unidad'])
+                         for ing in ingredientes]
                     )
-            
-            conn.commit()
+                marcar_cambio("subproductos", conn=conn)
+                on_commit(conn, lambda: self.bom.set_receta(
+                    subproducto_id, nombre_subproducto, ingredientes, rendimiento, unidad_rendimiento
+                ))
+                services.contabilidad.registrar_movimientos(
+                    [(PRODUCCION, f"Producción de {nombre_subproducto}", total_costo)], conn=conn
+                )
+
             logger.info(f"Subproducto '{nombre_subproducto}' creado con éxito. Costo: ${total_costo:.2f}")
             return total_costo
 
         except Exception as e:
             logger.error(f"Error al crear subproducto: {e}")
-            conn.rollback()
             raise # Re-raise the error to be caught by the GUI
-        finally:
-            conn.close()
 
     def get_subproductos_disponibles(self):
         """Returns a list of all created subproducts for use in final products."""
-        conn = get_connection()
-        if not conn: return []
         try:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT id, nombre, costo_total_subproducto FROM subproductos ORDER BY nombre")
-                return cursor.fetchall()
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT id, nombre, costo_total_subproducto, rendimiento_cantidad, rendimiento_unidad "
+                        "FROM subproductos ORDER BY nombre"
+                    )
+                    subproductos = cursor.fetchall()
         except Exception as e:
             logger.error(f"Error al obtener subproductos: {e}")
             return []
-        finally:
-            conn.close()
+        # Current batch cost from the memoized rollup (only recipes whose inputs changed are recomputed)
+        for sub in subproductos:
+            try:
+                sub['costo_actual'] = money(self.bom.costo_lote(sub['id']))
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Sin costo actual para '{sub['nombre']}': {e}")
+                sub['costo_actual'] = None
+        return subproductos
 
     def get_ingredientes_subproducto(self, subproducto_id):
         """Returns the ingredients of a specific subproduct."""
-        conn = get_connection()
-        if not conn: return []
         try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Nested recipes show the recipe name as producto_ingrediente
+                    cursor.execute(
+                        """
+                        SELECT COALESCE(p.nombre, sp.nombre) AS producto_ingrediente,
+                               si.producto_id, si.subproducto_ingrediente_id, si.cantidad_usada, si.unidad_usada
+                        FROM subproducto_ingredientes si
+                        LEFT JOIN productos p ON p.id = si.producto_id
+                        LEFT JOIN subproductos sp ON sp.id = si.subproducto_ingrediente_id
+                        WHERE si.subproducto_id = %s
+                        """,
+                        (subproducto_id,)
+                    )
+                    return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error al obtener ingredientes del subproducto: {e}")
+            return []
+
+    # --- Recetas anidadas (Core.bom) ---
+
+    @property
+    def bom(self):
+        """Recipe graph with memoized costs; loaded on first use and kept in sync afterwards."""
+        if self._bom is None:
+            with self._bom_lock:
+                if self._bom is None:
+                    self._bom = self._cargar_bom()
+        return self._bom
+
+    @staticmethod
+    def _ingrediente(row):
+        """subproducto_ingredientes row -> ingredient dict as accepted by crear_subproducto."""
+        ing = {'cantidad': row['cantidad_usada'], 'unidad': row['unidad_usada']}
+        if row['subproducto_ingrediente_id'] is not None:
+            ing['subproducto_id'] = row['subproducto_ingrediente_id']
+        else:
+            ing['producto'] = row['producto_ingrediente']
+        return ing
+
+    def _cargar_bom(self):
+        bom = BomEngine()
+        with db_connection() as conn:
             with conn.cursor() as cursor:
+                cursor.execute("SELECT id, nombre, rendimiento_cantidad, rendimiento_unidad FROM subproductos")
+                recetas = cursor.fetchall()
                 cursor.execute(
-                    "SELECT producto_ingrediente, cantidad_usada, unidad_usada FROM subproducto_ingredientes WHERE subproducto_id = %s",
-                    (subproducto_id,)
+                    "SELECT si.subproducto_id, p.nombre AS producto_ingrediente, si.subproducto_ingrediente_id, "
+                    "si.cantidad_usada, si.unidad_usada "
+                    "FROM subproducto_ingredientes si LEFT JOIN productos p ON p.id = si.producto_id"
+                )
+                por_receta = defaultdict(list)
+                for row in cursor.fetchall():
+                    por_receta[row['subproducto_id']].append(self._ingrediente(row))
+        for r in recetas:
+            try:
+                bom.set_receta(r['id'], r['nombre'], por_receta[r['id']], r['rendimiento_cantidad'], r['rendimiento_unidad'])
+            except ValueError as e:
+                logger.error(f"Receta '{r['nombre']}' ignorada: {e}")
+        bom.set_costos_materia(self.inventory_manager.get_costos())
+        # New weighted-average costs invalidate only the recipes above the changed products
+        if not self._bom_suscrito:
+            self.inventory_manager.subscribe(self._on_inventario_cambiado)
+            self._bom_suscrito = True
+        logger.info(f"Recetas cargadas: {len(recetas)}")
+        return bom
+
+    def recargar_bom(self):
+        """Drops the recipe graph; it is reloaded on next use (e.g. after a product rename)."""
+        with self._bom_lock:
+            self._bom = None
+
+    def _on_cambios_remotos(self, tablas):
+        if "subproductos" in tablas or "productos" in tablas:
+            logger.info("Recetas modificadas en otro terminal: se recarga el grafo")
+            self.recargar_bom()
+
+    def _bom_con(self, receta_ids):
+        """
+        The recipe graph, reloaded once if some of ``receta_ids`` are missing
+        (created on another terminal and not synchronized yet).
+        """
+        bom = self.bom
+        if any(r not in bom for r in receta_ids):
+            self.recargar_bom()
+            bom = self.bom
+        return bom
+
+    def _on_inventario_cambiado(self, cambios):
+        bom = self._bom
+        if bom is None:
+            return
+        invalidadas = bom.set_costos_materia(self.inventory_manager.get_costos(cambios))
+        if invalidadas:
+            logger.info(f"{len(invalidadas)} receta(s) a recalcular por cambios de costo")
+
+    def costo_receta(self, subproducto_id):
+        """{'costo_lote', 'costo_unitario'} at current raw material costs."""
+        return {
+            'costo_lote': money(self.bom.costo_lote(subproducto_id)),
+            'costo_unitario': cost(self.bom.costo_unitario(subproducto_id)),
+        }
+
+    def repreciar_recetas(self):
+        """
+        Recomputes every recipe in one topological pass and stores the result in
+        subproductos.costo_actual with one executemany. Returns the number of recipes.
+        """
+        costos = self.bom.repreciar_todo()
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.executemany(
+                        "UPDATE subproductos SET costo_actual = %s WHERE id = %s",
+                        [(cost(costo), receta_id) for receta_id, costo in costos.items()]
+                    )
+                marcar_cambio("subproductos", conn=conn)
+            logger.info(f"Costo actual guardado para {len(costos)} recetas")
+            return len(costos)
+        except Exception as e:
+            logger.error(f"Error al repreciar recetas: {e}")
+            raise
+
+    # --- Corridas de producción ---
+
+    def producir_lotes(self, subproducto_id, n_lotes):
+        """
+        Produces ``n_lotes`` batches of an existing recipe: scales it, locks and
+        checks every raw material in one query, consumes them and records a
+        produccion_runs row, all in one transaction.
+        :return: {'run_id', 'subproducto_id', 'lotes', 'costo_total'}
+        """
+        return self.producir_plan([(subproducto_id, n_lotes)])[0]
+
+    def producir_plan(self, plan):
+        """
+        Produces a whole plan, e.g. the morning's batches, in a single commit.
+
+        :param plan: list of (subproducto_id, n_lotes).
+        :return: one dict per entry, as producir_lotes.
+        Stock is checked for the plan as a whole: if anything is short, nothing is made.
+        """
+        try:
+            plan = list(plan)
+            bom = self._bom_con([subproducto_id for subproducto_id, _ in plan])
+            entradas = []
+            for subproducto_id, n_lotes in plan:
+                n_lotes = int(n_lotes)
+                if n_lotes <= 0:
+                    raise ValueError("La cantidad de lotes debe ser mayor que cero")
+                necesidades = bom.explotar_receta(subproducto_id, n_lotes)
+                if not necesidades:
+                    raise ValueError(f"'{bom.nombre(subproducto_id)}' no tiene ingredientes")
+                entradas.append((subproducto_id, n_lotes, necesidades))
+            if not entradas:
+                raise ValueError("El plan de producción está vacío")
+
+            with db_connection() as conn:
+                # One locked SELECT for every raw material of the plan (consumir_stock_lote sums repeats)
+                consumidos = self.inventory_manager.consumir_stock_lote(
+                    [{'producto': p, 'cantidad': q, 'unidad': u}
+                     for _, _, necesidades in entradas for p, (q, u) in necesidades.items()],
+                    conn=conn
+                )
+                corridas = []
+                with conn.cursor() as cursor:
+                    for subproducto_id, n_lotes, necesidades in entradas:
+                        costo_total = money(sum(
+                            (q * consumidos[p]['costo_promedio_ponderado'] for p, (q, _) in necesidades.items()), ZERO
+                        ))
+                        cursor.execute(
+                            "INSERT INTO produccion_runs (subproducto_id, lotes, costo_total) VALUES (%s, %s, %s)",
+                            (subproducto_id, n_lotes, costo_total)
+                        )
+                        corridas.append({
+                            'run_id': cursor.lastrowid, 'subproducto_id': subproducto_id,
+                            'lotes': n_lotes, 'costo_total': costo_total,
+                        })
+                marcar_cambio("produccion_runs", conn=conn)
+                services.contabilidad.registrar_movimientos(
+                    [(PRODUCCION, f"Producción de {c['lotes']} lote(s) de {bom.nombre(c['subproducto_id'])}", c['costo_total'])
+                     for c in corridas],
+                    conn=conn
                 )
-                return cursor.fetchall()
+
+            logger.info(f"Plan de producción registrado: {[(c['subproducto_id'], c['lotes']) for c in corridas]}")
+            return corridas
         except Exception as e:
-            logger.error(f"Error al obtener ingredientes del subproducto: {e}")
-            return []
-        finally:
-            conn.close()
+            logger.error(f"Error al producir lotes: {e}")
+            raise
 
     def crear_producto_final(self, nombre_producto, subproducto_id, unidades_producidas):
         """
@@ -123,47 +323,117 @@ class ProduccionBackend:
         :param subproducto_id: The ID of the subproduct used (e.g., ID of "Masa de Donas")
         :param unidades_producidas: How many final units were made (e.g., 30 donas)
         """
-        conn = get_connection()
-        if not conn: raise Exception("No database connection")
         try:
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    "INSERT INTO productos_finales (nombre, subproducto_id, unidades_producidas) VALUES (%s, %s, %s)",
-                    (nombre_producto, subproducto_id, unidades_producidas)
-                )
-            conn.commit()
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "INSERT INTO productos_finales (nombre, subproducto_id, unidades_producidas) VALUES (%s, %s, %s)",
+                        (nombre_producto, subproducto_id, unidades_producidas)
+                    )
+                marcar_cambio("productos_finales", conn=conn)
             logger.info(f"Producto Final '{nombre_producto}' creado con éxito.")
         except Exception as e:
             logger.error(f"Error al crear producto final: {e}")
-            conn.rollback()
             raise
-        finally:
-            conn.close()
+
+    # --- Read model de productos finales (Producción, Precios y Registrar Venta) ---
+
+    # Tables whose writes change the read model: prices live in productos_finales,
+    # costs in subproductos
+    _PRODUCTOS_FINALES_TABLAS = ("productos_finales", "subproductos")
+
+    # One join (productos_finales.subproducto_id FK index -> subproductos PK).
+    # Unit cost comes from the batch cost at current raw material costs
+    # (costo_actual, kept by repreciar_recetas), or the cost when the recipe
+    # was made if it was never repriced. Margin is computed from the rounded
+    # unit cost, as the screens show it.
+    _PRODUCTOS_FINALES_SQL = """
+        SELECT
+            t.*,
+            ROUND(t.precio_venta - t.costo_unitario, 4) AS ganancia_unitaria,
+            ROUND((t.precio_venta - t.costo_unitario) / NULLIF(t.costo_unitario, 0) * 100, 2) AS ganancia_pct
+        FROM (
+            SELECT
+                pf.id,
+                pf.nombre,
+                sp.id AS subproducto_id,
+                sp.nombre AS subproducto_nombre,
+                sp.costo_total_subproducto,
+                COALESCE(sp.costo_actual, sp.costo_total_subproducto) AS costo_lote,
+                COALESCE(NULLIF(pf.unidades_producidas, 0), 1) AS unidades_producidas,
+                ROUND(COALESCE(sp.costo_actual, sp.costo_total_subproducto)
+                      / COALESCE(NULLIF(pf.unidades_producidas, 0), 1), 4) AS costo_unitario,
+                COALESCE(pf.precio_venta, 0) AS precio_venta
+            FROM productos_finales pf
+            JOIN subproductos sp ON pf.subproducto_id = sp.id
+        ) t
+        ORDER BY t.nombre
+    """
+
+    @staticmethod
+    def _producto_final(row):
+        """Normalizes a row of _PRODUCTOS_FINALES_SQL; amounts stay Decimal (see Core.money)."""
+        return {
+            "id": row["id"],
+            "nombre": row["nombre"],
+            "subproducto_id": row["subproducto_id"],
+            "subproducto_nombre": row["subproducto_nombre"],
+            "costo_total_subproducto": row["costo_total_subproducto"] or ZERO,
+            "costo_lote": row["costo_lote"] or ZERO,
+            "unidades_producidas": row["unidades_producidas"],
+            "costo_unitario": row["costo_unitario"] or ZERO,
+            "precio_venta": row["precio_venta"] or ZERO,
+            "ganancia_unitaria": row["ganancia_unitaria"] or ZERO,
+            "ganancia_pct": row.get("ganancia_pct"),
+        }
+
+    def get_productos_finales_con_precios(self):
+        """
+        Final products with subproduct name, unit cost, sale price and margin.
+
+        The Producción, Precios and Registrar Venta screens share one cached
+        result. Every call checks it against the shared change counters in the
+        database (one primary-key read), so a price or cost written on another
+        terminal is picked up at once; the join only runs when they moved.
+        The returned dicts are shared: treat them as read-only.
+        """
+        with self._productos_finales_lock:
+            try:
+                with db_connection() as conn:
+                    # Read first: the join below sees the same snapshot as these versions
+                    actuales = versiones_db(self._PRODUCTOS_FINALES_TABLAS, conn)
+                    if self._productos_finales is not None and self._productos_finales[0] == actuales:
+                        return list(self._productos_finales[1])
+                    with conn.cursor() as cursor:
+                        cursor.execute(self._PRODUCTOS_FINALES_SQL)
+                        rows = [self._producto_final(r) for r in cursor.fetchall()]
+            except Exception as e:
+                logger.error(f"Error al obtener productos finales con precios: {e}")
+                raise
+            self._productos_finales = (actuales, rows)
+            return list(rows)
 
     def get_productos_finales_info(self):
         """
         Returns a list of final products with their cost per unit.
         This is crucial for the sales page.
         """
-        conn = get_connection()
-        if not conn: return []
         try:
-            with conn.cursor() as cursor:
-                sql = """
-                SELECT
-                    pf.id,
-                    pf.nombre,
-                    pf.unidades_producidas,
-                    sp.costo_total_subproducto,
-                    (sp.costo_total_subproducto / pf.unidades_producidas) AS costo_por_unidad
-                FROM productos_finales pf
-                JOIN subproductos sp ON pf.subproducto_id = sp.id
-                ORDER BY pf.nombre
-                """
-                cursor.execute(sql)
-                return cursor.fetchall()
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    sql = """
+                    SELECT
+                        pf.id,
+                        pf.nombre,
+                        pf.unidades_producidas,
+                        sp.costo_total_subproducto,
+                        (sp.costo_total_subproducto / pf.unidades_producidas) AS costo_por_unidad
+                    FROM productos_finales pf
+                    JOIN subproductos sp ON pf.subproducto_id = sp.id
+                    ORDER BY pf.nombre
+                    """
+                    cursor.execute(sql)
+                    return cursor.fetchall()
         except Exception as e:
             logger.error(f"Error al obtener info de productos finales: {e}")
-            return []
-        finally:
-            conn.close()
+            return []
\ No newline at end of file
@@ -0,0 +1,110 @@
+# Core/productos_backend.py
+
+import threading
+from Core.database import db_connection, on_commit
+from Core.cambios import marcar_cambio, suscribir
+from Core.logger import setup_logger
+from Core.services import services
+
+logger = setup_logger("productos_backend")
+
+
+class ProductosBackend:
+    """
+    Catálogo maestro `productos` (nombre <-> id).
+
+    inventario, compras y subproducto_ingredientes guardan ``producto_id``; la
+    aplicación sigue hablando en nombres y este backend los traduce. Los ids
+    resueltos se guardan en memoria, así que traducir un nombre conocido no
+    toca la base de datos.
+    """
+
+    def __init__(self):
+        self._ids = {}  # nombre -> id (only committed products)
+        self._lock = threading.Lock()
+        # A rename on another terminal leaves cached names pointing at the wrong product
+        suscribir(self._on_cambios_remotos)
+        logger.info("ProductosBackend initialized")
+
+    @staticmethod
+    def _buscar(cursor, nombres):
+        """
+        {nombre pedido: id}. The comparison is done by the database, so it uses
+        the column collation (same matching the old string joins had).
+        """
+        pedidos = " UNION ALL ".join(["SELECT %s AS pedido"] * len(nombres))
+        cursor.execute(
+            f"SELECT q.pedido, p.id FROM ({pedidos}) q JOIN productos p ON p.nombre = q.pedido",
+            nombres
+        )
+        return {r['pedido']: r['id'] for r in cursor.fetchall()}
+
+    def ids(self, nombres, conn=None, crear=False):
+        """
+        :param nombres: product names.
+        :param conn: connection of the caller's transaction.
+        :param crear: insert the names that do not exist yet (purchases).
+        :return: {nombre: id}; without ``crear``, unknown names are left out.
+        """
+        nombres = list(dict.fromkeys(nombres))
+        with self._lock:
+            encontrados = {n: self._ids[n] for n in nombres if n in self._ids}
+        faltantes = [n for n in nombres if n not in encontrados]
+        if not faltantes:
+            return encontrados
+
+        try:
+            with db_connection(conn) as conn:
+                with conn.cursor() as cursor:
+                    nuevos = self._buscar(cursor, faltantes)
+                    sin_id = sorted(n for n in faltantes if n not in nuevos)  # stable lock order
+                    if crear and sin_id:
+                        cursor.executemany("INSERT IGNORE INTO productos (nombre) VALUES (%s)", [(n,) for n in sin_id])
+                        nuevos.update(self._buscar(cursor, sin_id))
+                        marcar_cambio("productos", conn=conn)
+                # Remember them once they are committed (a rollback would drop new rows)
+                on_commit(conn, lambda: self._recordar(nuevos))
+        except Exception as e:
+            logger.error(f"Error resolviendo productos: {e}")
+            raise
+        encontrados.update(nuevos)
+        return encontrados
+
+    def id(self, nombre, conn=None, crear=False):
+        """Id of one product, or None if it does not exist (and not ``crear``)."""
+        return self.ids([nombre], conn=conn, crear=crear).get(nombre)
+
+    def _on_cambios_remotos(self, tablas):
+        if "productos" in tablas:
+            with self._lock:
+                self._ids = {}
+
+    def _recordar(self, ids):
+        with self._lock:
+            self._ids.update(ids)
+
+    def renombrar(self, producto_id, nombre):
+        """
+        Renames a product. Stock, purchases and recipes follow it because they
+        reference the id, not the name.
+        """
+        nombre = (nombre or "").strip()
+        if not nombre:
+            raise ValueError("El nombre del producto es obligatorio")
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT id FROM productos WHERE id = %s FOR UPDATE", (producto_id,))
+                    if not cursor.fetchone():
+                        raise ValueError(f"Producto {producto_id} no encontrado")
+                    cursor.execute("UPDATE productos SET nombre = %s WHERE id = %s", (nombre, producto_id))
+                marcar_cambio("productos", "inventario", "compras", conn=conn)
+        except Exception as e:
+            logger.error(f"Error renombrando producto {producto_id}: {e}")
+            raise
+        with self._lock:
+            self._ids = {n: i for n, i in self._ids.items() if i != producto_id}
+        # In-memory views keyed by name are rebuilt on their next use
+        services.inventario.invalidate_cache()
+        services.produccion.recargar_bom()
+        logger.info(f"Producto {producto_id} renombrado a '{nombre}'")
@@ -0,0 +1,97 @@
+# Core/services.py
+"""
+Backends compartidos por toda la aplicación.
+
+Cada backend se crea una sola vez por proceso y solo cuando alguien lo usa;
+todos comparten el pool de Core.database. Construirlos no toca la base de
+datos: el pool (y sus migraciones) se crea en la primera consulta real.
+
+    from Core.services import services
+    self.backend = services.ventas
+"""
+
+import threading
+
+
+def _inventario():
+    from Core.inventario_backend import InventarioBackend
+    return InventarioBackend()
+
+
+def _compras():
+    from Core.compras_backend import ComprasBackend
+    return ComprasBackend()
+
+
+def _produccion():
+    from Core.produccion_backend import ProduccionBackend
+    return ProduccionBackend()
+
+
+def _ventas():
+    from Core.ventas_backend import VentasBackend
+    return VentasBackend()
+
+
+def _contabilidad():
+    from Core.contabilidad_backend import ContabilidadBackend
+    return ContabilidadBackend()
+
+
+def _capacidad():
+    from Core.capacidad_backend import CapacidadBackend
+    return CapacidadBackend()
+
+
+def _productos():
+    from Core.productos_backend import ProductosBackend
+    return ProductosBackend()
+
+
+class ServiceContainer:
+    """Lazy, thread-safe registry of backend singletons."""
+
+    def __init__(self):
+        self._instances = {}
+        self._lock = threading.RLock()
+
+    def _get(self, name, factory):
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = factory()
+                    self._instances[name] = instance
+        return instance
+
+    @property
+    def productos(self):
+        return self._get("productos", _productos)
+
+    @property
+    def inventario(self):
+        return self._get("inventario", _inventario)
+
+    @property
+    def compras(self):
+        return self._get("compras", _compras)
+
+    @property
+    def produccion(self):
+        return self._get("produccion", _produccion)
+
+    @property
+    def ventas(self):
+        return self._get("ventas", _ventas)
+
+    @property
+    def contabilidad(self):
+        return self._get("contabilidad", _contabilidad)
+
+    @property
+    def capacidad(self):
+        return self._get("capacidad", _capacidad)
+
+
+services = ServiceContainer()
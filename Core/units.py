@@ -1,8 +1,14 @@
 # Core/units.py
 
 from Core.logger import setup_logger
+from Core.money import to_decimal, divide
 
-logger = setup_logger()
+try:
+    import numpy as np
+except ImportError:  # batch conversions fall back to plain lists
+    np = None
+
+logger = setup_logger("units")
 
 # --- (Tu código de conversiones existente no cambia) ---
 
@@ -26,60 +32,106 @@ CONVERSIONS = {
     }
 }
 
+# Other spellings used in the GUI and in supplier invoices
+ALIASES = {
+    'gr': 'g', 'gramo': 'g', 'gramos': 'g', 'grams': 'g',
+    'kgs': 'kg', 'kilo': 'kg', 'kilos': 'kg',
+    'l': 'lt', 'liter': 'lt', 'liters': 'lt', 'litro': 'lt', 'litros': 'lt',
+    'units': 'unit', 'unidad': 'unit', 'unidades': 'unit', 'u': 'unit',
+}
+
+BASE_UNITS = {'weight': 'g', 'volume': 'ml', 'count': 'unit'}
+
+
+def _build_index():
+    """Flat unit -> (category, Decimal factor, base_unit) index, aliases included."""
+    index = {}
+    for category, factors in CONVERSIONS.items():
+        for unit, factor in factors.items():
+            index[unit] = (category, to_decimal(factor), BASE_UNITS[category])
+    for alias, unit in ALIASES.items():
+        index[alias] = index[unit]
+    return index
+
+
+UNIT_INDEX = _build_index()
+
+
+def unit_info(unit):
+    """Returns (category, factor, base_unit) for ``unit`` (any case or alias), or None."""
+    if not isinstance(unit, str):
+        return None
+    info = UNIT_INDEX.get(unit)
+    if info is None:
+        info = UNIT_INDEX.get(unit.strip().lower())
+    return info
+
+
 def get_base_unit(category):
-    if category == 'weight':
-        return 'g'
-    elif category == 'volume':
-        return 'ml'
-    elif category == 'count':
-        return 'unit'
-    else:
+    base = BASE_UNITS.get(category)
+    if base is None:
         logger.error(f"Unknown category: {category}")
-        return None
+    return base
+
+def get_base_unit_for(unit):
+    """Base unit ('g', 'ml' or 'unit') of ``unit``, or None if it is not recognized."""
+    info = unit_info(unit)
+    return info[2] if info else None
 
 def convert_to_base(quantity, unit):
-    """ Convert quantity to base unit. Returns (converted_quantity, base_unit) or (None, None) if error. """
+    """ Convert quantity to base unit. Returns (Decimal converted_quantity, base_unit) or (None, None) if error. """
     try:
-        quantity = float(quantity)
-        unit = unit.lower()
-        for category, factors in CONVERSIONS.items():
-            if unit in factors:
-                base_unit = get_base_unit(category)
-                converted = quantity * factors[unit]
-                logger.debug(f"Converted {quantity} {unit} to {converted} {base_unit}")
-                return converted, base_unit
-        logger.error(f"Unit {unit} not recognized")
-        return None, None
-    except ValueError as e:
+        quantity = to_decimal(quantity)
+    except (TypeError, ValueError) as e:
         logger.error(f"Error converting quantity: {e}")
         return None, None
+    info = unit_info(unit)
+    if info is None:
+        logger.error(f"Unit {unit} not recognized")
+        return None, None
+    _, factor, base_unit = info
+    return quantity * factor, base_unit
 
 def convert_from_base(quantity, from_unit, to_unit):
-    """ Convert from base unit to another unit. """
+    """ Convert from base unit to another unit. Returns a Decimal or None. """
     try:
-        quantity = float(quantity)
-        from_unit = from_unit.lower()
-        to_unit = to_unit.lower()
-        # Find category
-        category = None
-        for cat, factors in CONVERSIONS.items():
-            if from_unit in factors:
-                category = cat
-                break
-        if not category or to_unit not in CONVERSIONS[category]:
-            logger.error(f"Cannot convert from {from_unit} to {to_unit}")
-            return None
-        # Convert to base first if not already
-        if from_unit != get_base_unit(category):
-            quantity, _ = convert_to_base(quantity, from_unit)
-        # Then to target
-        factor = CONVERSIONS[category][to_unit]
-        converted = quantity / factor
-        logger.debug(f"Converted {quantity} {get_base_unit(category)} to {converted} {to_unit}")
-        return converted
-    except ValueError as e:
+        quantity = to_decimal(quantity)
+    except (TypeError, ValueError) as e:
         logger.error(f"Error converting: {e}")
         return None
+    source = unit_info(from_unit)
+    target = unit_info(to_unit)
+    if not source or not target or source[0] != target[0]:
+        logger.error(f"Cannot convert from {from_unit} to {to_unit}")
+        return None
+    # Convert to base first if not already, then to target
+    return divide(quantity * source[1], target[1])
+
+def convert_many_to_base(quantities, units, as_array=False):
+    """
+    Batch version of convert_to_base for parallel sequences of quantities and units.
+
+    Each distinct unit is looked up once. Returns (converted, base_units):
+    ``converted`` is a list of exact Decimals (None for unrecognized units).
+    With ``as_array=True`` and NumPy installed it is a float array instead
+    (nan for unrecognized units), for analytics where exactness is not needed.
+    """
+    lookup = {}
+    factors = []
+    base_units = []
+    for unit in units:
+        info = lookup.get(unit, False)
+        if info is False:
+            info = lookup[unit] = unit_info(unit)
+            if info is None:
+                logger.error(f"Unit {unit} not recognized")
+        factors.append(info[1] if info else None)
+        base_units.append(info[2] if info else None)
+
+    if as_array and np is not None:
+        factors = [float(f) if f is not None else float('nan') for f in factors]
+        return np.asarray(quantities, dtype=float) * np.asarray(factors, dtype=float), base_units
+    return [to_decimal(q) * f if f is not None else None for q, f in zip(quantities, factors)], base_units
 
 # --- NUEVA FUNCIÓN AÑADIDA AQUÍ ---
 
@@ -98,10 +150,10 @@ def calculate_cost_per_base_unit(item_data: dict) -> dict:
               Returns 0 if calculation is not possible.
     """
     # 1. Obtener la cantidad total y el precio total del diccionario
-    total_quantity_bulk = item_data.get('cantidad_granel', 0)
-    total_quantity_packages = item_data.get('cantidad_paquetes', 0)
+    total_quantity_bulk = to_decimal(item_data.get('cantidad_granel', 0))
+    total_quantity_packages = to_decimal(item_data.get('cantidad_paquetes', 0))
     unidad = item_data.get('unidad')
-    total_precio = float(item_data.get('total_precio', 0))
+    total_precio = to_decimal(item_data.get('total_precio', 0))
 
     # 2. Sumar las cantidades para obtener el total físico del producto
     total_physical_quantity = total_quantity_bulk + total_quantity_packages
@@ -117,7 +169,7 @@ def calculate_cost_per_base_unit(item_data: dict) -> dict:
 
     # 5. Calcular el costo por unidad base
     if converted_quantity and converted_quantity > 0:
-        cost_per_unit = total_precio / converted_quantity
+        cost_per_unit = divide(total_precio, converted_quantity)
         logger.info(f"Calculated cost for {item_data.get('producto')}: ${cost_per_unit:.4f} per {base_unit}")
         item_data['costo_promedio'] = cost_per_unit
     else:
@@ -1,24 +1,29 @@
 import pymysql
-from Core.database import get_connection
+from Core.database import db_connection
+from Core.cambios import marcar_cambio
+from Core.contabilidad_backend import VENTA
 from Core.logger import setup_logger
-from Core.produccion_backend import ProduccionBackend
+from Core.money import to_decimal, money, ZERO
+from Core.services import services
 
-logger = setup_logger()
+logger = setup_logger("ventas_backend")
 
 class VentasBackend:
     def __init__(self):
-        self.db = get_connection()
-        self.prod_backend = ProduccionBackend() # To get product costs
         logger.info("VentasBackend initialized")
 
+    @property
+    def prod_backend(self):
+        # To get product costs (shared instance, resolved on first use)
+        return services.produccion
+
     def add_cliente(self, nombre_cliente):
         """Adds a new client to the database."""
-        conn = get_connection()
-        if not conn: raise Exception("No database connection")
         try:
-            with conn.cursor() as cursor:
-                cursor.execute("INSERT INTO clientes (nombre) VALUES (%s)", (nombre_cliente,))
-            conn.commit()
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("INSERT INTO clientes (nombre) VALUES (%s)", (nombre_cliente,))
+                marcar_cambio("clientes", conn=conn)
             logger.info(f"Cliente '{nombre_cliente}' añadido.")
         except pymysql.IntegrityError:
             # This error happens if the client name already exists (due to UNIQUE constraint)
@@ -26,64 +31,39 @@ class VentasBackend:
             raise ValueError("Este cliente ya existe.")
         except Exception as e:
             logger.error(f"Error al añadir cliente: {e}")
-            conn.rollback()
             raise
-        finally:
-            conn.close()
 
     def get_clientes(self, only_active=False):
         """Returns a list of clients. If only_active=True, filter active clients."""
-        conn = get_connection()
-        if not conn: return []
         try:
-            with conn.cursor() as cursor:
-                # Check if 'active' column exists
-                cursor.execute("SHOW COLUMNS FROM clientes LIKE 'active'")
-                has_active = bool(cursor.fetchone())
-                if has_active:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
                     if only_active:
                         cursor.execute("SELECT id, nombre, active FROM clientes WHERE active = 1 ORDER BY nombre")
                     else:
                         cursor.execute("SELECT id, nombre, active FROM clientes ORDER BY nombre")
-                else:
-                    # Older DB without 'active' column -> assume active
-                    cursor.execute("SELECT id, nombre FROM clientes ORDER BY nombre")
-                    rows = cursor.fetchall()
-                    # normalize rows to include 'active' field = 1
-                    return [{"id": r["id"], "nombre": r["nombre"], "active": 1} for r in rows]
-                return cursor.fetchall()
+                    return cursor.fetchall()
         except Exception as e:
             logger.error(f"Error al obtener clientes: {e}")
             return []
-        finally:
-            conn.close()
 
     def toggle_cliente_active(self, cliente_id):
         """Toggle active state for a client. Returns new state (1 or 0)."""
-        conn = get_connection()
-        if not conn: raise Exception("No database connection")
         try:
-            with conn.cursor() as cursor:
-                # ensure column exists
-                cursor.execute("SHOW COLUMNS FROM clientes LIKE 'active'")
-                if not cursor.fetchone():
-                    # create column if missing (safe)
-                    cursor.execute("ALTER TABLE clientes ADD COLUMN active TINYINT(1) NOT NULL DEFAULT 1")
-                # Toggle
-                cursor.execute("SELECT active FROM clientes WHERE id = %s", (cliente_id,))
-                row = cursor.fetchone()
-                if not row:
-                    raise ValueError("Cliente no encontrado")
-                new_state = 0 if row.get("active", 1) == 1 else 1
-                cursor.execute("UPDATE clientes SET active = %s WHERE id = %s", (new_state, cliente_id))
-            conn.commit()
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Toggle
+                    cursor.execute("SELECT active FROM clientes WHERE id = %s", (cliente_id,))
+                    row = cursor.fetchone()
+                    if not row:
+                        raise ValueError("Cliente no encontrado")
+                    new_state = 0 if row.get("active", 1) == 1 else 1
+                    cursor.execute("UPDATE clientes SET active = %s WHERE id = %s", (new_state, cliente_id))
+                marcar_cambio("clientes", conn=conn)
             return new_state
         except Exception as e:
             logger.error(f"Error toggling cliente active: {e}")
-            conn.rollback()
             raise
-        finally:
-            conn.close()
 
     def get_clientes_activos(self):
         """Convenience wrapper to get active clients."""
@@ -91,99 +71,82 @@ class VentasBackend:
 
     def get_productos_con_costo(self):
         """
-        Gets final products and adds their calculated cost for the sales UI.
-        Also reads precio_venta from productos_finales if present.
+        Final products with unit cost, precio_venta and margin for the sales UI.
+        Served by the shared, cached read model of ProduccionBackend.
         """
-        productos_info = self.prod_backend.get_productos_finales_info()
-        result = []
-        conn = get_connection()
-        try:
-            for p in productos_info:
-                pid = p.get("id")
-                # get precio_venta from DB if available
-                precio_venta = None
-                try:
-                    if conn:
-                        with conn.cursor() as cursor:
-                            cursor.execute("SELECT precio_venta FROM productos_finales WHERE id = %s", (pid,))
-                            row = cursor.fetchone()
-                            if row and row.get("precio_venta") is not None:
-                                precio_venta = float(row.get("precio_venta") or 0)
-                except Exception:
-                    precio_venta = None
-
-                try:
-                    unidades_prod = float(p.get("unidades_producidas", 1)) if p.get("unidades_producidas") else 1.0
-                except Exception:
-                    unidades_prod = 1.0
-                costo_total = float(p.get("costo_total_subproducto", 0) or 0)
-                costo_unitario = round(costo_total / unidades_prod, 4) if unidades_prod else 0.0
+        return self.prod_backend.get_productos_finales_con_precios()
 
-                # Prefer precio_venta from DB; otherwise try from p dict, otherwise 0
-                precio_venta_final = precio_venta if precio_venta is not None else float(p.get("precio_venta", 0) or 0)
-                ganancia = round(precio_venta_final - costo_unitario, 4)
-                ganancia_pct = round((ganancia / costo_unitario * 100), 2) if costo_unitario else None
-                result.append({
-                    "id": pid,
-                    "nombre": p.get("nombre"),
-                    "costo_total_subproducto": costo_total,
-                    "unidades_producidas": unidades_prod,
-                    "costo_unitario": costo_unitario,
-                    "precio_venta": precio_venta_final,
-                    "ganancia_unitaria": ganancia,
-                    "ganancia_pct": ganancia_pct
-                })
-            return result
-        finally:
-            if conn:
-                conn.close()
+    def get_productos_con_costo_por_ids(self, producto_ids):
+        """
+        Same rows as get_productos_con_costo for a list of producto_final ids.
+        Returns a dict {id: producto}; ids that don't exist are left out.
+        """
+        ids = set(producto_ids)
+        return {p["id"]: p for p in self.get_productos_con_costo() if p["id"] in ids}
 
     def set_precio_venta(self, producto_final_id, precio):
         """
         Set or update the precio_venta for a producto_final.
-        Adds the column if it doesn't exist (migration-safe).
         """
-        conn = get_connection()
-        if not conn: raise Exception("No database connection")
         try:
-            with conn.cursor() as cursor:
-                # Ensure column exists
-                cursor.execute("SHOW COLUMNS FROM productos_finales LIKE 'precio_venta'")
-                if not cursor.fetchone():
-                    cursor.execute("ALTER TABLE productos_finales ADD COLUMN precio_venta DECIMAL(10,2) NULL DEFAULT NULL")
-                cursor.execute("UPDATE productos_finales SET precio_venta = %s WHERE id = %s", (round(float(precio),2), producto_final_id))
-            conn.commit()
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("UPDATE productos_finales SET precio_venta = %s WHERE id = %s", (money(precio), producto_final_id))
+                marcar_cambio("productos_finales", conn=conn)
             logger.info(f"Precio de venta actualizado: ProductoID {producto_final_id} -> {precio}")
         except Exception as e:
             logger.error(f"Error al setear precio de venta: {e}")
-            conn.rollback()
             raise
-        finally:
-            conn.close()
+
+    _INSERT_VENTA_SQL = "INSERT INTO ventas (cliente_id, producto_final_id, cantidad_vendida, precio_unitario_venta, total_venta, fecha_venta) VALUES (%s, %s, %s, %s, %s, %s)"
+
+    # Incremental upkeep of the per-client daily summary (see migration 6)
+    _UPSERT_VENTAS_DIARIAS_SQL = """
+        INSERT INTO ventas_diarias (cliente_id, dia, ventas_count, total_sum)
+        VALUES (%s, DATE(%s), %s, %s)
+        ON DUPLICATE KEY UPDATE
+            ventas_count = ventas_count + VALUES(ventas_count),
+            total_sum = total_sum + VALUES(total_sum)
+    """
+
+    def _registrar_items(self, cursor, cliente_id, filas):
+        """
+        Inserts ventas rows [(producto_final_id, cantidad, precio_unitario, total)]
+        with one shared timestamp and adds them to ventas_diarias and to the
+        ledger (one movement per ticket) in the same transaction.
+        """
+        cursor.execute("SELECT NOW() AS ahora, (SELECT nombre FROM clientes WHERE id = %s) AS cliente", (cliente_id,))
+        row = cursor.fetchone()
+        ahora = row["ahora"]
+        total_ticket = sum((total for *_, total in filas), ZERO)
+        cursor.executemany(
+            self._INSERT_VENTA_SQL,
+            [(cliente_id, producto_id, cantidad, precio, total, ahora) for producto_id, cantidad, precio, total in filas]
+        )
+        cursor.execute(
+            self._UPSERT_VENTAS_DIARIAS_SQL,
+            (cliente_id, ahora, len(filas), total_ticket)
+        )
+        services.contabilidad.registrar_movimientos(
+            [(VENTA, f"Venta a {row['cliente'] or cliente_id}", total_ticket)], conn=cursor.connection
+        )
 
     def registrar_venta(self, cliente_id, producto_final_id, cantidad_vendida, precio_unitario_venta):
         """
         Records a single sale transaction.
         """
-        conn = get_connection()
-        if not conn: raise Exception("No database connection")
         try:
-            with conn.cursor() as cursor:
-                # Calculate the total sale value
-                total_venta = cantidad_vendida * precio_unitario_venta
-                
-                cursor.execute(
-                    "INSERT INTO ventas (cliente_id, producto_final_id, cantidad_vendida, precio_unitario_venta, total_venta) VALUES (%s, %s, %s, %s, %s)",
-                    (cliente_id, producto_final_id, cantidad_vendida, precio_unitario_venta, total_venta)
-                )
-            conn.commit()
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Calculate the total sale value
+                    precio_unitario_venta = money(precio_unitario_venta)
+                    total_venta = money(cantidad_vendida * precio_unitario_venta)
+                    self._registrar_items(cursor, cliente_id, [(producto_final_id, cantidad_vendida, precio_unitario_venta, total_venta)])
+                marcar_cambio("ventas", conn=conn)
             logger.info(f"Venta registrada: ClienteID {cliente_id}, ProductoID {producto_final_id}, Cantidad {cantidad_vendida}")
         except Exception as e:
             logger.error(f"Error al registrar venta: {e}")
-            conn.rollback()
             raise
-        finally:
-            conn.close()
 
     def crear_venta_multiple(self, cliente_id, items):
         """
@@ -193,103 +156,135 @@ class VentasBackend:
         """
         if not items:
             raise ValueError("No hay items para registrar")
-        conn = get_connection()
-        if not conn: raise Exception("No database connection")
         try:
-            total_venta = 0
-            with conn.cursor() as cursor:
-                # Optional: check cliente exists and active
-                cursor.execute("SELECT id, COALESCE(active,1) as active FROM clientes WHERE id = %s", (cliente_id,))
-                klient = cursor.fetchone()
-                if not klient:
-                    raise ValueError("Cliente no encontrado")
-                if klient.get("active",1) != 1:
-                    raise ValueError("Cliente inactivo. Activa el cliente antes de registrar ventas.")
+            with db_connection() as conn:
+                total_venta = ZERO
+                with conn.cursor() as cursor:
+                    # Optional: check cliente exists and active
+                    cursor.execute("SELECT id, COALESCE(active,1) as active FROM clientes WHERE id = %s", (cliente_id,))
+                    klient = cursor.fetchone()
+                    if not klient:
+                        raise ValueError("Cliente no encontrado")
+                    if klient.get("active",1) != 1:
+                        raise ValueError("Cliente inactivo. Activa el cliente antes de registrar ventas.")
 
-                for it in items:
-                    producto_id = it["product_id"]
-                    cantidad = int(it.get("quantity", 1))
-                    unit_price = float(it.get("unit_price", 0))
-                    subtotal = round(cantidad * unit_price, 2)
-                    total_venta += subtotal
-                    cursor.execute(
-                        "INSERT INTO ventas (cliente_id, producto_final_id, cantidad_vendida, precio_unitario_venta, total_venta) VALUES (%s, %s, %s, %s, %s)",
-                        (cliente_id, producto_id, cantidad, unit_price, subtotal)
-                    )
-            conn.commit()
+                    filas = []
+                    for it in items:
+                        producto_id = it["product_id"]
+                        cantidad = int(it.get("quantity", 1))
+                        unit_price = money(it.get("unit_price", 0))
+                        subtotal = money(cantidad * unit_price)
+                        total_venta += subtotal
+                        filas.append((producto_id, cantidad, unit_price, subtotal))
+                    self._registrar_items(cursor, cliente_id, filas)
+                marcar_cambio("ventas", conn=conn)
             logger.info(f"Venta multiple registrada para cliente {cliente_id}. Total: {total_venta}")
             return {"cliente_id": cliente_id, "total": total_venta}
         except Exception as e:
             logger.error(f"Error al crear venta multiple: {e}")
-            conn.rollback()
             raise
-        finally:
-            conn.close()
 
     def get_cliente_stats(self, cliente_id):
-        """Return purchases_count and total_revenue for a given client."""
-        conn = get_connection()
-        if not conn: return {"purchases_count": 0, "total_revenue": 0.0}
+        """Return purchases_count and total_revenue for a given client (from ventas_diarias)."""
         try:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT COUNT(*) AS cnt, COALESCE(SUM(total_venta),0) AS total FROM ventas WHERE cliente_id = %s", (cliente_id,))
-                row = cursor.fetchone() or {"cnt": 0, "total": 0}
-                return {"purchases_count": int(row.get("cnt", 0)), "total_revenue": float(row.get("total", 0.0))}
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT COALESCE(SUM(ventas_count),0) AS cnt, COALESCE(SUM(total_sum),0) AS total FROM ventas_diarias WHERE cliente_id = %s", (cliente_id,))
+                    row = cursor.fetchone() or {"cnt": 0, "total": ZERO}
+                    return {"purchases_count": int(row.get("cnt", 0)), "total_revenue": to_decimal(row.get("total"))}
         except Exception as e:
             logger.error(f"Error en get_cliente_stats: {e}")
-            return {"purchases_count": 0, "total_revenue": 0.0}
-        finally:
-            conn.close()
+            return {"purchases_count": 0, "total_revenue": ZERO}
 
     def get_ventas_por_dia(self, cliente_id):
         """
-        Returns list grouped by day:
+        Returns list grouped by day, read from the ventas_diarias summary:
         [{day: 'YYYY-MM-DD', sales_count: n, total_sum: x.xx}, ...]
         """
-        conn = get_connection()
-        if not conn: return []
         try:
-            with conn.cursor() as cursor:
-                sql = """
-                    SELECT DATE(fecha_venta) AS dia, COUNT(*) AS ventas_count, COALESCE(SUM(total_venta),0) AS total_sum
-                    FROM ventas
-                    WHERE cliente_id = %s
-                    GROUP BY dia
-                    ORDER BY dia DESC
-                """
-                cursor.execute(sql, (cliente_id,))
-                rows = cursor.fetchall()
-                return [{"day": str(r["dia"]), "sales_count": int(r["ventas_count"]), "total_sum": float(r["total_sum"])} for r in rows]
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    sql = """
+                        SELECT dia, ventas_count, total_sum
+                        FROM ventas_diarias
+                        WHERE cliente_id = %s
+                        ORDER BY dia DESC
+                    """
+                    cursor.execute(sql, (cliente_id,))
+                    rows = cursor.fetchall()
+                    return [{"day": str(r["dia"]), "sales_count": int(r["ventas_count"]), "total_sum": r["total_sum"]} for r in rows]
         except Exception as e:
             logger.error(f"Error en get_ventas_por_dia: {e}")
             return []
-        finally:
-            conn.close()
 
-    def get_historial_ventas(self):
-        """Returns the full sales history with client and product names."""
-        conn = get_connection()
-        if not conn: return []
+    def rebuild_ventas_diarias(self, cliente_id=None):
+        """
+        Recomputes ventas_diarias from ventas (for backfills or after editing
+        ventas by hand). Only ``cliente_id`` if given. Returns the rows written.
+        """
+        where, params = ("WHERE cliente_id = %s", (cliente_id,)) if cliente_id is not None else ("", ())
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"DELETE FROM ventas_diarias {where}", params)
+                    cursor.execute(
+                        f"""
+                        INSERT INTO ventas_diarias (cliente_id, dia, ventas_count, total_sum)
+                        SELECT cliente_id, DATE(fecha_venta), COUNT(*), COALESCE(SUM(total_venta), 0)
+                        FROM ventas
+                        {where}
+                        GROUP BY cliente_id, DATE(fecha_venta)
+                        """,
+                        params
+                    )
+                    filas = cursor.rowcount
+                marcar_cambio("ventas", conn=conn)
+            logger.info(f"ventas_diarias reconstruida ({filas} filas{f', cliente {cliente_id}' if cliente_id is not None else ''})")
+            return filas
+        except Exception as e:
+            logger.error(f"Error reconstruyendo ventas_diarias: {e}")
+            raise
+
+    def get_historial_ventas_pagina(self, limite=100, despues_de=None):
+        """
+        One page of the sales history with client and product names, newest
+        first, using keyset pagination over the (fecha_venta, id) index.
+        :param despues_de: cursor (fecha_venta, id) returned by the previous page, or None.
+        :return: (rows, cursor_siguiente); cursor_siguiente is None on the last page.
+        """
+        condiciones, params = [], []
+        if despues_de:
+            fecha, id_ = despues_de
+            condiciones.append("(v.fecha_venta < %s OR (v.fecha_venta = %s AND v.id < %s))")
+            params += [fecha, fecha, id_]
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        sql = f"""
+            SELECT
+                v.id,
+                v.fecha_venta,
+                c.nombre AS cliente,
+                pf.nombre AS producto,
+                v.cantidad_vendida,
+                v.precio_unitario_venta,
+                v.total_venta
+            FROM ventas v
+            LEFT JOIN clientes c ON v.cliente_id = c.id
+            LEFT JOIN productos_finales pf ON v.producto_final_id = pf.id
+            {where}
+            ORDER BY v.fecha_venta DESC, v.id DESC
+            LIMIT %s
+        """
         try:
-            with conn.cursor() as cursor:
-                sql = """
-                SELECT
-                    v.id,
-                    v.fecha_venta,
-                    c.nombre AS cliente,
-                    pf.nombre AS producto,
-                    v.cantidad_vendida,
-                    v.precio_unitario_venta,
-                    v.total_venta
-                FROM ventas v
-                LEFT JOIN clientes c ON v.cliente_id = c.id
-                LEFT JOIN productos_finales pf ON v.producto_final_id = pf.id
-                ORDER BY v.fecha_venta DESC
-                """
-                cursor.execute(sql)
-                return cursor.fetchall()
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Ask for one extra row to know whether there is a next page
+                    cursor.execute(sql, params + [limite + 1])
+                    rows = cursor.fetchall()
         except Exception as e:
             logger.error(f"Error al obtener historial de ventas: {e}")
-            return []
-        finally:
-            conn.close()
\ No newline at end of file
+            raise
+
+        if len(rows) > limite:
+            rows = rows[:limite]
+            return rows, (rows[-1]["fecha_venta"], rows[-1]["id"])
+        return rows, None
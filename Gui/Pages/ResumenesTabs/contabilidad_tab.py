@@ -3,32 +3,38 @@ Tab de Contabilidad - Gestión de ingresos, gastos, inversiones y fondos
 """
 
 import tkinter as tk
+from datetime import date, timedelta
 from tkinter import ttk, messagebox
-from datetime import datetime
 from Core.inventario_backend import InventarioBackend
+from Core.contabilidad_backend import ContabilidadBackend, COMPRA, VENTA, PRODUCCION
 from Core.logger import setup_logger
-from decimal import Decimal
+from Core.money import ZERO, fmt_money
+from Gui.Widgets.virtual_treeview import VirtualTreeview, PagedRowSource
+from Gui.task_runner import listen, get_task_runner
 
 
 class ContabilidadTab(ttk.Frame):
     """Tab para gestionar contabilidad del negocio."""
     
     tab_name = "Contabilidad"
+
+    MOVIMIENTOS_PAGE_SIZE = 100
+    TIPOS = {"Todos": None, "Compras": COMPRA, "Ventas": VENTA, "Producción": PRODUCCION}
+    PERIODOS = ("Este mes", "Este año", "Últimos 30 días", "Todo")
     
-    def __init__(self, parent, backend:  InventarioBackend):
+    def __init__(self, parent, backend:  InventarioBackend, contabilidad: ContabilidadBackend):
         super().__init__(parent)
         self.backend = backend
+        self.contabilidad = contabilidad
         self.logger = setup_logger()
         
-        # Variables de contabilidad
-        self.total_inversiones = Decimal(0)
-        self.total_ganancias = Decimal(0)
-        self.total_gastos = Decimal(0)
-        self.fondo_negocio = Decimal(0)
-        self.capital_disponible = Decimal(0)
+        # Valor del stock (desde el inventario); el resto de indicadores sale del libro
+        self.total_inversiones = ZERO
         
         self.setup_ui()
         self.load_contabilidad()
+        # Purchases and production update only the affected inventory rows
+        listen(self, self.backend.subscribe, self.on_inventario_cambiado)
         self.logger.info("ContabilidadTab initialized")
     
     def setup_ui(self):
@@ -49,6 +55,15 @@ class ContabilidadTab(ttk.Frame):
         )
         resumen_card. pack(fill=tk.X, pady=(0, 15))
         
+        # Período de los indicadores y del historial de movimientos
+        periodo_frame = tk.Frame(resumen_card, bg="white")
+        periodo_frame.pack(fill=tk.X, pady=(0, 5))
+        tk.Label(periodo_frame, text="Período:", bg="white").pack(side=tk.LEFT, padx=(0, 4))
+        self.periodo_combo = ttk.Combobox(periodo_frame, values=self.PERIODOS, state="readonly", width=16)
+        self.periodo_combo.set(self.PERIODOS[0])
+        self.periodo_combo.pack(side=tk.LEFT)
+        self.periodo_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh_ledger())
+        
         # Crear grid para los indicadores
         indicators_frame = ttk.Frame(resumen_card)
         indicators_frame.pack(fill=tk.X)
@@ -61,12 +76,12 @@ class ContabilidadTab(ttk.Frame):
             "inversiones_label"
         )
         
-        # Indicador 2: Total de Ganancias
+        # Indicador 2: Ingresos (ventas del período)
         self._create_indicator(
             indicators_frame, 0, 1,
-            "💰 Ganancias Reales",
+            "🧾 Ingresos",
             "$0.00",
-            "ganancias_label"
+            "ingresos_label"
         )
         
         # Indicador 3: Total de Gastos
@@ -77,7 +92,15 @@ class ContabilidadTab(ttk.Frame):
             "gastos_label"
         )
         
-        # Indicador 4: Fondo del Negocio
+        # Indicador 4: Total de Ganancias
+        self._create_indicator(
+            indicators_frame, 0, 3,
+            "💰 Ganancias Reales",
+            "$0.00",
+            "ganancias_label"
+        )
+        
+        # Indicador 5: Fondo del Negocio
         self._create_indicator(
             indicators_frame, 1, 0,
             "🏦 Fondo de Negocio (20%)",
@@ -85,7 +108,7 @@ class ContabilidadTab(ttk.Frame):
             "fondo_label"
         )
         
-        # Indicador 5: Capital Disponible
+        # Indicador 6: Capital Disponible
         self._create_indicator(
             indicators_frame, 1, 1,
             "💎 Capital Disponible",
@@ -93,7 +116,7 @@ class ContabilidadTab(ttk.Frame):
             "capital_label"
         )
         
-        # Indicador 6: Estado del Negocio
+        # Indicador 7: Estado del Negocio
         self._create_indicator(
             indicators_frame, 1, 2,
             "📊 Margen Neto",
@@ -113,12 +136,23 @@ class ContabilidadTab(ttk.Frame):
         )
         detalles_card.pack(fill=tk. BOTH, expand=True, pady=(0, 15))
         
-        # Tabla de inventario con costos
+        # Tabla de inventario con costos (virtual: solo se dibujan las filas visibles)
         cols = ("Producto", "Cantidad", "Unidad", "Costo Unit.", "Inversión Total")
-        self.inventario_tree = ttk.Treeview(
+        self.inventario_tree = VirtualTreeview(
             detalles_card,
             columns=cols,
-            show="headings",
+            values=lambda item: (
+                item['producto'],
+                item['cantidad_display'],
+                item['unidad_display'],
+                item['costo_promedio_display'],
+                f"${item['total_valor']:.2f}"
+            ),
+            key=lambda item: item['producto'],
+            sort_keys={
+                "Producto": lambda item: item['producto'].lower(),
+                "Inversión Total": lambda item: item['total_valor'],
+            },
             height=10
         )
         
@@ -136,15 +170,6 @@ class ContabilidadTab(ttk.Frame):
         
         self.inventario_tree.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
-        # Scrollbar
-        scrollbar = ttk. Scrollbar(
-            detalles_card,
-            orient=tk.VERTICAL,
-            command=self.inventario_tree.yview
-        )
-        self.inventario_tree.configure(yscroll=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
         # ===== SECCIÓN 3: Historial de Movimientos =====
         movimientos_card = tk.LabelFrame(
             main,
@@ -157,12 +182,28 @@ class ContabilidadTab(ttk.Frame):
         )
         movimientos_card.pack(fill=tk.BOTH, expand=True)
         
-        # Tabla de movimientos
+        filtro_frame = ttk.Frame(movimientos_card)
+        filtro_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(filtro_frame, text="Tipo:").pack(side=tk.LEFT, padx=(0, 4))
+        self.tipo_combo = ttk.Combobox(filtro_frame, values=list(self.TIPOS), state="readonly", width=12)
+        self.tipo_combo.set("Todos")
+        self.tipo_combo.pack(side=tk.LEFT)
+        self.tipo_combo.bind("<<ComboboxSelected>>", lambda e: self.load_movimientos())
+
+        # Tabla de movimientos: páginas del libro pedidas a medida que se hace scroll
         mov_cols = ("Fecha", "Tipo", "Descripción", "Monto")
-        self.movimientos_tree = ttk.Treeview(
+        self.movimientos_source = PagedRowSource(self._fetch_movimientos_page, page_size=self.MOVIMIENTOS_PAGE_SIZE)
+        self.movimientos_tree = VirtualTreeview(
             movimientos_card,
             columns=mov_cols,
-            show="headings",
+            values=lambda mov: (
+                f"{mov['fecha']:%Y-%m-%d %H:%M}",
+                mov['tipo'],
+                mov['descripcion'],
+                fmt_money(mov['monto'])
+            ),
+            key=lambda mov: mov['id'],
+            source=self.movimientos_source,
             height=8
         )
         
@@ -178,20 +219,11 @@ class ContabilidadTab(ttk.Frame):
         
         self.movimientos_tree.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
-        # Scrollbar
-        mov_scrollbar = ttk. Scrollbar(
-            movimientos_card,
-            orient=tk. VERTICAL,
-            command=self.movimientos_tree.yview
-        )
-        self.movimientos_tree.configure(yscroll=mov_scrollbar.set)
-        mov_scrollbar. pack(side=tk.RIGHT, fill=tk.Y)
-        
         # Botón de actualizar
         refresh_btn = tk.Button(
             movimientos_card,
             text="🔄 Actualizar",
-            command=self.load_contabilidad,
+            command=self.refresh_ledger,
             bg="#0078d4",
             fg="white",
             font=("Segoe UI", 10, "bold"),
@@ -231,96 +263,79 @@ class ContabilidadTab(ttk.Frame):
         setattr(self, attr_name, value_label)
     
     def load_contabilidad(self):
-        """Cargar datos de contabilidad."""
+        """Cargar datos de contabilidad (inventario, movimientos e indicadores en segundo plano)."""
+        get_task_runner(self).submit(
+            self.backend.get_inventario_para_resumen,
+            on_success=self._show_inventario,
+            on_error=lambda e: messagebox.showerror("Error", f"Error cargando contabilidad: {e}"),
+            key="inventario", owner=self
+        )
+        self.load_movimientos()
+        self.load_indicadores()
+
+    def _show_inventario(self, inventario):
+        self.inventario_tree.set_rows(inventario)
+        self._update_total_inversiones()
+        self.logger.info("Contabilidad cargada")
+
+    def refresh_ledger(self):
+        """Recarga indicadores y movimientos (el inventario se actualiza solo)."""
         try:
-            # Limpiar tablas
-            for item in self.inventario_tree. get_children():
-                self. inventario_tree.delete(item)
-            for item in self. movimientos_tree.get_children():
-                self.movimientos_tree.delete(item)
-            
-            # Obtener datos del inventario
-            inventario = self.backend.get_inventario_para_resumen()
-            
-            total_inversiones = Decimal(0)
-            
-            for item in inventario: 
-                total_inversiones += Decimal(str(item['total_valor']))
-                
-                self.inventario_tree.insert(
-                    "",
-                    tk.END,
-                    values=(
-                        item['producto'],
-                        item['cantidad_display'],
-                        item['unidad_display'],
-                        item['costo_promedio_display'],
-                        f"${item['total_valor']:.2f}"
-                    )
-                )
-            
-            self.total_inversiones = total_inversiones
-            
-            # Actualizar indicadores (valores de ejemplo, se pueden conectar a BD)
-            self._update_indicators()
-            
-            # Agregar movimientos de ejemplo
-            self._load_sample_movements()
-            
-            self.logger.info("Contabilidad cargada")
-            
+            self.load_movimientos()
+            self.load_indicadores()
         except Exception as e:
-            messagebox.showerror("Error", f"Error cargando contabilidad: {e}")
-            self.logger.error(f"Error en load_contabilidad: {e}")
-    
-    def _update_indicators(self):
-        """Actualizar indicadores de estado."""
-        # Estos valores deberían venir de la base de datos
-        # Por ahora usamos valores de ejemplo
-        
-        self.inversiones_label.config(text=f"${float(self.total_inversiones):.2f}")
-        
-        # Calcular margen neto (ganancias - gastos - inversiones)
-        margen = self.total_ganancias - self.total_gastos
-        margen_pct = (float(margen) / float(self.total_inversiones) * 100) if self.total_inversiones > 0 else 0
-        
-        self. ganancias_label.config(text=f"${float(self.total_ganancias):.2f}")
-        self.gastos_label.config(text=f"${float(self.total_gastos):.2f}")
-        self.fondo_label.config(text=f"${float(self.fondo_negocio):.2f}")
-        self.capital_label.config(text=f"${float(self.capital_disponible):.2f}")
-        self.margen_label.config(text=f"{margen_pct:.2f}%")
+            self.logger.error(f"Error refrescando el libro: {e}")
+
+    def _rango_periodo(self):
+        """(desde, hasta) del período elegido, ambos días inclusive; (None, None) para "Todo"."""
+        hoy = date.today()
+        periodo = self.periodo_combo.get()
+        if periodo == "Este mes":
+            return hoy.replace(day=1), hoy
+        if periodo == "Este año":
+            return hoy.replace(month=1, day=1), hoy
+        if periodo == "Últimos 30 días":
+            return hoy - timedelta(days=29), hoy
+        return None, None
+
+    def load_indicadores(self):
+        """Las sumas del período se calculan en SQL, en segundo plano."""
+        desde, hasta = self._rango_periodo()
+        get_task_runner(self).submit(
+            self.contabilidad.get_indicadores,
+            desde=desde, hasta=hasta,
+            on_success=self._update_indicators,
+            on_error=lambda e: self.logger.error(f"Error cargando indicadores: {e}"),
+            key="indicadores", owner=self
+        )
+
+    def _fetch_movimientos_page(self, despues_de, limite, **filtros):
+        return self.contabilidad.get_movimientos_pagina(limite=limite, despues_de=despues_de, **filtros)
+
+    def load_movimientos(self):
+        """Vuelve a la primera página con el filtro de tipo y el período actuales."""
+        desde, hasta = self._rango_periodo()
+        self.movimientos_source.set_filters(tipo=self.TIPOS[self.tipo_combo.get()], desde=desde, hasta=hasta)
+        self.movimientos_tree.set_source(self.movimientos_source)
     
-    def _load_sample_movements(self):
-        """Cargar movimientos de ejemplo."""
-        movements = [
-            {
-                'fecha': datetime.now().strftime("%Y-%m-%d"),
-                'tipo': "Inversión",
-                'descripcion':  "Compra de inventario inicial",
-                'monto': float(self.total_inversiones)
-            },
-            {
-                'fecha': datetime.now().strftime("%Y-%m-%d"),
-                'tipo': "Venta",
-                'descripcion':  "Venta de productos",
-                'monto': 150.00
-            },
-            {
-                'fecha': datetime.now().strftime("%Y-%m-%d"),
-                'tipo': "Fondo",
-                'descripcion':  "Transferencia a fondo del negocio (20%)",
-                'monto': 30.00
-            }
-        ]
-        
-        for mov in movements:
-            self. movimientos_tree.insert(
-                "",
-                tk.END,
-                values=(
-                    mov['fecha'],
-                    mov['tipo'],
-                    mov['descripcion'],
-                    f"${mov['monto']:.2f}"
-                )
-            )
\ No newline at end of file
+    def on_inventario_cambiado(self, cambios):
+        """Actualiza solo las filas de inventario que cambiaron y el total invertido."""
+        self.inventario_tree.update_rows(
+            [item for item in cambios.values() if item is not None],
+            removed_keys=[producto for producto, item in cambios.items() if item is None]
+        )
+        self._update_total_inversiones()
+
+    def _update_total_inversiones(self):
+        # total_valor is already a Decimal: no per-row conversion
+        self.total_inversiones = sum((item['total_valor'] for item in self.inventario_tree.source.rows()), ZERO)
+        self.inversiones_label.config(text=fmt_money(self.total_inversiones))
+
+    def _update_indicators(self, indicadores):
+        """Actualizar indicadores con el resultado de ContabilidadBackend.get_indicadores."""
+        self.ingresos_label.config(text=fmt_money(indicadores["ingresos"]))
+        self.ganancias_label.config(text=fmt_money(indicadores["ganancias"]))
+        self.gastos_label.config(text=fmt_money(indicadores["gastos"]))
+        self.fondo_label.config(text=fmt_money(indicadores["fondo"]))
+        self.capital_label.config(text=fmt_money(indicadores["capital"]))
+        self.margen_label.config(text=f"{indicadores['margen_pct']:.2f}%")
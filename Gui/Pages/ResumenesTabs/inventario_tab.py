@@ -1,7 +1,9 @@
 import tkinter as tk
 from tkinter import ttk
-from decimal import Decimal
+from Core.money import ZERO
 from Core.inventario_backend import InventarioBackend
+from Gui.task_runner import listen, get_task_runner
+from Gui.Widgets.tree_binder import TreeBinder
 
 class InventarioTab(ttk.Frame):
     tab_name = "Inventario"
@@ -11,7 +13,10 @@ class InventarioTab(ttk.Frame):
         self.backend = backend
         self.display_units = {}
         self.available_units = ['gr', 'Kg', 'Lb', 'Oz', 'L', 'ml'] # unidades comunes
+        self.totales = {}  # producto -> total_valor of the rows shown
         self.setup_ui()
+        # Purchases and production update only the affected rows
+        listen(self, self.backend.subscribe, self.on_inventario_cambiado)
 
     def setup_ui(self):
         # Frame Inventario
@@ -34,6 +39,7 @@ class InventarioTab(ttk.Frame):
         self.inv_tree.column("Costo Promedio", width=100)
         self.inv_tree.column("Total Precio", width=100)
         self.inv_tree.pack(fill=tk.BOTH, expand=True)
+        self.inv_binder = TreeBinder(self.inv_tree, key=lambda item: item['producto'], values=self._row_values)
 
         # Doble click para seleccion de unidades
         self.inv_tree.bind("<Double-1>", self.on_tree_double_click)
@@ -51,32 +57,61 @@ class InventarioTab(ttk.Frame):
         self.total_label.pack()
 
         # Boton para refrescar 
-        refresh_btn = tk.Button(self, text="Actualizar", command=self.load_inventario)
+        refresh_btn = tk.Button(self, text="Actualizar", command=self.reload_inventario)
         refresh_btn.pack(pady=5)
 
         self.load_inventario()
 
     def load_inventario(self):
-        # Limpiar inventario
-        for item in self.inv_tree.get_children():
-            self.inv_tree.delete(item)
-        
-        # --- CHANGE THIS LINE ---
-        # obtener datos del backend usando el nuevo método
-        inventario_data = self.backend.get_inventario_para_resumen()
-        
-        total_invertido = 0
-        for item in inventario_data:
-            # The new method already prepares the data for display
-            self.inv_tree.insert("", tk.END, values=(
-                item['producto'],
-                item['cantidad_display'], # e.g., "0.80"
-                item['unidad_display'],    # e.g., "kg"
-                item['costo_promedio_display'], # e.g., "$0.1750"
-                f"${item['total_valor']:.2f}"
-            ))
-            total_invertido += item['total_valor']
-            
+        # obtener datos del backend (servidos desde la caché de inventario), en segundo plano
+        get_task_runner(self).submit(
+            self.backend.get_inventario_para_resumen,
+            on_success=self._show_inventario,
+            key="inventario", owner=self
+        )
+
+    def reload_inventario(self):
+        """Descarta la caché y vuelve a leer el inventario de la base de datos."""
+        get_task_runner(self).submit(
+            self._releer_inventario,
+            on_success=self._show_inventario,
+            key="inventario", owner=self
+        )
+
+    def _releer_inventario(self):
+        # Runs on the worker: the cache reload is a full-table query
+        self.backend.invalidate_cache()
+        return self.backend.get_inventario_para_resumen()
+
+    def _show_inventario(self, inventario_data):
+        self.inv_binder.bind(inventario_data)
+        self.totales = {item['producto']: item['total_valor'] for item in inventario_data}
+        self._update_total()
+
+    def on_inventario_cambiado(self, cambios):
+        """Actualiza solo las filas de los productos que cambiaron."""
+        agotados = [producto for producto, item in cambios.items() if item is None]
+        actualizados = [item for item in cambios.values() if item is not None]
+        self.inv_binder.remove(agotados)
+        self.inv_binder.update_rows(actualizados)
+        for producto in agotados:
+            self.totales.pop(producto, None)
+        self.totales.update({item['producto']: item['total_valor'] for item in actualizados})
+        self._update_total()
+
+    @staticmethod
+    def _row_values(item):
+        # The backend already prepares the data for display
+        return (
+            item['producto'],
+            item['cantidad_display'], # e.g., "0.80"
+            item['unidad_display'],    # e.g., "kg"
+            item['costo_promedio_display'], # e.g., "$0.1750"
+            f"${item['total_valor']:.2f}"
+        )
+
+    def _update_total(self):
+        total_invertido = sum(self.totales.values(), ZERO)
         self.total_label.config(text=f"Total invertido: ${total_invertido:.2f}")
 
     def on_tree_double_click(self, event):
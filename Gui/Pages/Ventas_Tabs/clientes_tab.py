@@ -1,6 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from Core.ventas_backend import VentasBackend
+from Gui.Widgets.virtual_treeview import VirtualTreeview
+from Gui.Widgets.tree_binder import TreeBinder
+from Gui.task_runner import get_task_runner
 
 class ClientesTab(ttk.Frame):
     tab_name = "Clientes"
@@ -21,7 +24,8 @@ class ClientesTab(ttk.Frame):
         ttk.Label(create_frame, text="Nuevo cliente:").pack(side=tk.LEFT)
         self.new_client_entry = ttk.Entry(create_frame)
         self.new_client_entry.pack(side=tk.LEFT, padx=5)
-        ttk.Button(create_frame, text="Crear", command=self.create_client, style="Primary.TButton").pack(side=tk.LEFT, padx=5)
+        self.create_btn = ttk.Button(create_frame, text="Crear", command=self.create_client, style="Primary.TButton")
+        self.create_btn.pack(side=tk.LEFT, padx=5)
 
         # Middle: clientes list + acciones
         mid = ttk.Frame(main)
@@ -29,17 +33,24 @@ class ClientesTab(ttk.Frame):
 
         # Clients list
         cols = ("Nombre", "Activo")
-        self.clients_tree = ttk.Treeview(mid, columns=cols, show="headings", height=10, style="Modern.Treeview")
+        self.clients_tree = VirtualTreeview(
+            mid,
+            columns=cols,
+            values=lambda r: (r["nombre"], "Sí" if r.get("active", 1) else "No"),
+            key=lambda r: r["id"],
+            sort_keys={
+                "Nombre": lambda r: r["nombre"].lower(),
+                "Activo": lambda r: r.get("active", 1),
+            },
+            height=10,
+            style="Modern.Treeview"
+        )
         self.clients_tree.heading("Nombre", text="Nombre")
         self.clients_tree.heading("Activo", text="Activo")
         self.clients_tree.column("Nombre", width=220)
         self.clients_tree.column("Activo", width=80, anchor=tk.CENTER)
         self.clients_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.clients_tree.bind("<<TreeviewSelect>>", self.on_client_select)
-
-        scrollbar = ttk.Scrollbar(mid, orient=tk.VERTICAL, command=self.clients_tree.yview)
-        self.clients_tree.configure(yscroll=scrollbar.set)
-        scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        self.clients_tree.bind("<<VirtualSelect>>", self.on_client_select)
 
         # Right: stats and toggle
         right = ttk.Frame(main)
@@ -59,62 +70,83 @@ class ClientesTab(ttk.Frame):
         self.ventas_tree.column("Ventas", width=60, anchor=tk.E)
         self.ventas_tree.column("Total", width=80, anchor=tk.E)
         self.ventas_tree.pack(fill=tk.BOTH, expand=True)
+        self.ventas_binder = TreeBinder(
+            self.ventas_tree, key=lambda v: v["day"],
+            values=lambda v: (v["day"], v["sales_count"], f"${v['total_sum']:.2f}")
+        )
 
     def load_clients(self):
-        try:
-            rows = self.backend.get_clientes()
-            # Clear
-            for i in self.clients_tree.get_children():
-                self.clients_tree.delete(i)
-            for r in rows:
-                active = r.get("active", 1)
-                self.clients_tree.insert("", tk.END, iid=str(r["id"]), values=(r["nombre"], "Sí" if active else "No"))
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudieron cargar clientes: {e}")
+        """Clientes en segundo plano; una recarga nueva descarta la anterior."""
+        get_task_runner(self).submit(
+            self.backend.get_clientes,
+            on_success=self.clients_tree.set_rows,
+            on_error=lambda e: messagebox.showerror("Error", f"No se pudieron cargar clientes: {e}"),
+            key="clientes", owner=self
+        )
 
     def create_client(self):
         name = self.new_client_entry.get().strip()
         if not name:
             messagebox.showwarning("Aviso", "Ingresa el nombre del cliente")
             return
-        try:
-            self.backend.add_cliente(name)
+
+        def on_success(_):
             self.new_client_entry.delete(0, tk.END)
             self.load_clients()
             messagebox.showinfo("OK", "Cliente creado")
-        except ValueError as ve:
-            messagebox.showwarning("Aviso", str(ve))
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo crear cliente: {e}")
+
+        def on_error(e):
+            if isinstance(e, ValueError):
+                messagebox.showwarning("Aviso", str(e))
+            else:
+                messagebox.showerror("Error", f"No se pudo crear cliente: {e}")
+
+        get_task_runner(self).submit(
+            self.backend.add_cliente, name,
+            on_success=on_success, on_error=on_error,
+            owner=self, cancellable=False, busy_widget=self.create_btn
+        )
 
     def on_client_select(self, _evt):
-        selected = self.clients_tree.selection()
+        selected = self.clients_tree.selected_keys()
         if not selected:
+            get_task_runner(self).cancel("client_stats", owner=self)
             self.toggle_btn.config(state=tk.DISABLED)
             self.stats_label.config(text="Selecciona un cliente")
             return
-        cliente_id = int(selected[0])
+        cliente_id = selected[0]
         self.toggle_btn.config(state=tk.NORMAL)
-        # load stats
-        stats = self.backend.get_cliente_stats(cliente_id)
+        self.stats_label.config(text="Cargando...")
+        # Stats y ventas por día en segundo plano; un clic nuevo descarta el anterior
+        get_task_runner(self).submit(
+            self._fetch_client_stats, cliente_id,
+            on_success=self._show_client_stats,
+            on_error=lambda e: self.stats_label.config(text=f"Error: {e}"),
+            key="client_stats", owner=self
+        )
+
+    def _fetch_client_stats(self, cliente_id):
+        return self.backend.get_cliente_stats(cliente_id), self.backend.get_ventas_por_dia(cliente_id)
+
+    def _show_client_stats(self, result):
+        stats, ventas = result
         self.stats_label.config(text=f"Compras: {stats['purchases_count']}  —  Ganancias: ${stats['total_revenue']:.2f}")
         # ventas por día
-        ventas = self.backend.get_ventas_por_dia(cliente_id)
-        for i in self.ventas_tree.get_children():
-            self.ventas_tree.delete(i)
-        for v in ventas:
-            self.ventas_tree.insert("", tk.END, values=(v["day"], v["sales_count"], f"${v['total_sum']:.2f}"))
+        self.ventas_binder.bind(ventas)
 
     def toggle_active(self):
-        selected = self.clients_tree.selection()
+        selected = self.clients_tree.selected_keys()
         if not selected:
             return
-        cliente_id = int(selected[0])
-        try:
-            new_state = self.backend.toggle_cliente_active(cliente_id)
+
+        def on_success(new_state):
             self.load_clients()
             state_text = "Activo" if new_state == 1 else "Inactivo"
             messagebox.showinfo("OK", f"Cliente ahora: {state_text}")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo cambiar estado: {e}")
 
+        get_task_runner(self).submit(
+            self.backend.toggle_cliente_active, selected[0],
+            on_success=on_success,
+            on_error=lambda e: messagebox.showerror("Error", f"No se pudo cambiar estado: {e}"),
+            owner=self, cancellable=False, busy_widget=self.toggle_btn
+        )
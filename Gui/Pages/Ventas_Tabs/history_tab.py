@@ -1,9 +1,13 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk
 from Core.ventas_backend import VentasBackend
+from Core.money import fmt_money
+from Gui.Widgets.virtual_treeview import VirtualTreeview, PagedRowSource
 
 class HistorialTab(ttk.Frame):
     tab_name = "Historial"
+
+    PAGE_SIZE = 100
     
     def __init__(self, parent, backend: VentasBackend):
         super().__init__(parent)
@@ -15,7 +19,17 @@ class HistorialTab(ttk.Frame):
         frame = ttk.Frame(self)
         frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         cols = ("Fecha", "Cliente", "Producto", "Cantidad", "Precio/u", "Total")
-        self.tree = ttk.Treeview(frame, columns=cols, show="headings", height=15, style="Modern.Treeview")
+        # Páginas pedidas al servidor a medida que se hace scroll (más nuevas primero)
+        self.source = PagedRowSource(self._fetch_page, page_size=self.PAGE_SIZE)
+        self.tree = VirtualTreeview(
+            frame,
+            columns=cols,
+            values=self._row_values,
+            key=lambda r: r.get("id"),
+            source=self.source,
+            height=15,
+            style="Modern.Treeview"
+        )
         for c in cols:
             self.tree.heading(c, text=c)
         self.tree.column("Fecha", width=140)
@@ -26,19 +40,21 @@ class HistorialTab(ttk.Frame):
         self.tree.column("Total", width=100, anchor=tk.E)
         self.tree.pack(fill=tk.BOTH, expand=True)
 
+    @staticmethod
+    def _row_values(r):
+        return (
+            str(r.get("fecha_venta")),
+            r.get("cliente"),
+            r.get("producto"),
+            r.get("cantidad_vendida"),
+            fmt_money(r.get('precio_unitario_venta')),
+            fmt_money(r.get('total_venta'))
+        )
+
+    def _fetch_page(self, despues_de, limite):
+        return self.backend.get_historial_ventas_pagina(limite=limite, despues_de=despues_de)
+
     def load_historial(self):
-        try:
-            rows = self.backend.get_historial_ventas()
-            for i in self.tree.get_children():
-                self.tree.delete(i)
-            for r in rows:
-                self.tree.insert("", tk.END, values=(
-                    str(r.get("fecha_venta")),
-                    r.get("cliente"),
-                    r.get("producto"),
-                    r.get("cantidad_vendida"),
-                    f"${float(r.get('precio_unitario_venta') or 0):.2f}",
-                    f"${float(r.get('total_venta') or 0):.2f}"
-                ))
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo cargar historial: {e}")
\ No newline at end of file
+        """Vuelve a la primera página."""
+        self.source.reset()
+        self.tree.set_source(self.source)
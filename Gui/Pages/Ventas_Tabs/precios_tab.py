@@ -1,6 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from Core.ventas_backend import VentasBackend
+from Core.money import money, ZERO
+from Gui.task_runner import get_task_runner
 
 class PreciosTab(ttk.Frame):
     tab_name = "Precios"
@@ -34,22 +36,27 @@ class PreciosTab(ttk.Frame):
         self.precios_tree.bind("<Double-1>", self.on_double_click)
 
     def load_precios(self):
-        try:
-            productos = self.backend.get_productos_con_costo()
-            # Clear
-            for i in self.precios_tree.get_children():
-                self.precios_tree.delete(i)
-            for p in productos:
-                pid = p.get("id")
-                costo = p.get("costo_unitario", 0.0)
-                venta = p.get("precio_venta", 0.0) or 0.0
-                gan = p.get("ganancia_unitaria", 0.0)
-                pct = p.get("ganancia_pct", None)
-                pct_display = f"{pct:.2f}%" if pct is not None else "-"
-                # Use product id as iid so we can retrieve it later
-                self.precios_tree.insert("", tk.END, iid=str(pid), values=(p.get("nombre"), f"${costo:.2f}", f"${venta:.2f}", f"${gan:.2f}", pct_display))
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudieron cargar los precios: {e}")
+        """Precios en segundo plano; una recarga nueva descarta la anterior."""
+        get_task_runner(self).submit(
+            self.backend.get_productos_con_costo,
+            on_success=self._show_precios,
+            on_error=lambda e: messagebox.showerror("Error", f"No se pudieron cargar los precios: {e}"),
+            key="precios", owner=self
+        )
+
+    def _show_precios(self, productos):
+        # Clear
+        for i in self.precios_tree.get_children():
+            self.precios_tree.delete(i)
+        for p in productos:
+            pid = p.get("id")
+            costo = p.get("costo_unitario") or ZERO
+            venta = p.get("precio_venta") or ZERO
+            gan = p.get("ganancia_unitaria") or ZERO
+            pct = p.get("ganancia_pct", None)
+            pct_display = f"{pct:.2f}%" if pct is not None else "-"
+            # Use product id as iid so we can retrieve it later
+            self.precios_tree.insert("", tk.END, iid=str(pid), values=(p.get("nombre"), f"${costo:.2f}", f"${venta:.2f}", f"${gan:.2f}", pct_display))
 
     def _start_edit_cell(self, item_id, col_name, bbox):
         # Remove previous editing entry if any
@@ -75,21 +82,31 @@ class PreciosTab(ttk.Frame):
         entry.focus_set()
 
         def finish_edit(event=None):
+            if not entry.winfo_exists():
+                return  # <Return> already saved; this is the <FocusOut> of the destroyed entry
             new_text = entry.get().strip()
             try:
-                new_price = float(new_text) if new_text != "" else 0.0
+                new_price = money(new_text) if new_text != "" else ZERO
             except Exception:
                 messagebox.showwarning("Valor inválido", "Ingresa un número válido para precio")
                 entry.focus_set()
                 return
-            # save to DB via backend
-            try:
-                self.backend.set_precio_venta(int(item_id), new_price)
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo guardar el precio: {e}")
-                entry.destroy()
-                self.editing_entry = None
-                return
+            entry.destroy()
+            self.editing_entry = None
+            # save to DB via backend, off the Tk thread
+            get_task_runner(self).submit(
+                self.backend.set_precio_venta, int(item_id), new_price,
+                on_success=lambda _: self._precio_guardado(item_id, new_price),
+                on_error=lambda e: messagebox.showerror("Error", f"No se pudo guardar el precio: {e}"),
+                owner=self, cancellable=False
+            )
+
+        entry.bind("<Return>", finish_edit)
+        entry.bind("<FocusOut>", finish_edit)
+        self.editing_entry = entry
+
+    def _precio_guardado(self, item_id, new_price):
+        if self.precios_tree.exists(item_id):
             # update tree display
             vals = list(self.precios_tree.item(item_id, "values"))
             # precio venta is column "Precio Venta"
@@ -99,19 +116,13 @@ class PreciosTab(ttk.Frame):
                 self.precios_tree.item(item_id, values=vals)
             except Exception:
                 pass
-            # notify other tabs that price changed
-            try:
-                # generate virtual event on the notebook (parent) so RegistrarVentaTab can reload
-                if hasattr(self.master, "event_generate"):
-                    self.master.event_generate("<<PrecioActualizado>>")
-            except Exception:
-                pass
-            entry.destroy()
-            self.editing_entry = None
-
-        entry.bind("<Return>", finish_edit)
-        entry.bind("<FocusOut>", finish_edit)
-        self.editing_entry = entry
+        # notify other tabs that price changed
+        try:
+            # generate virtual event on the notebook (parent) so RegistrarVentaTab can reload
+            if hasattr(self.master, "event_generate"):
+                self.master.event_generate("<<PrecioActualizado>>")
+        except Exception:
+            pass
 
     def on_double_click(self, event):
         region = self.precios_tree.identify("region", event.x, event.y)
@@ -2,6 +2,9 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from Core.ventas_backend import VentasBackend
 from Core.logger import setup_logger
+from Core.money import ZERO
+from Gui.Widgets.tree_binder import TreeBinder
+from Gui.task_runner import get_task_runner
 
 
 class RegistrarVentaTab(ttk.Frame):
@@ -181,6 +184,7 @@ class RegistrarVentaTab(ttk.Frame):
         self.clients_tree.column("Estado", width=80, anchor=tk.CENTER)
         
         self.clients_tree.pack(side=tk.LEFT, fill=tk. BOTH, expand=True)
+        self.clients_binder = TreeBinder(self.clients_tree, key=lambda c: c["id"], values=lambda c: (c["nombre"], "✅ Activo"))
         
         # Scrollbar clientes
         client_scrollbar = ttk. Scrollbar(
@@ -247,7 +251,7 @@ class RegistrarVentaTab(ttk.Frame):
         buttons_frame = tk.Frame(footer, bg="white")
         buttons_frame. pack(fill=tk.X)
         
-        register_btn = tk.Button(
+        self.register_btn = register_btn = tk.Button(
             buttons_frame,
             text="✅ Registrar Venta",
             command=self.submit_sale,
@@ -299,19 +303,10 @@ class RegistrarVentaTab(ttk.Frame):
     def load_clients(self):
         """Cargar clientes activos."""
         try:
-            for item in self.clients_tree.get_children():
-                self.clients_tree.delete(item)
-            
             rows = self.backend.get_clientes_activos()
             self.client_name_to_id = {r["nombre"]: r["id"] for r in rows}
-            
-            for client in rows:
-                self.clients_tree.insert(
-                    "",
-                    tk.END,
-                    iid=str(client["id"]),
-                    values=(client["nombre"], "✅ Activo")
-                )
+            # Only the rows that changed are touched; selection and scroll are kept
+            self.clients_binder.bind(rows)
             
             self.logger.info(f"Cargados {len(rows)} clientes")
             
@@ -423,7 +418,7 @@ class RegistrarVentaTab(ttk.Frame):
                 item_id = self.next_item_id
                 self. next_item_id += 1
                 
-                unit_price = float(prod.get("precio_venta", 0) or 0)
+                unit_price = prod.get("precio_venta") or ZERO
                 subtotal = unit_price * qty
                 
                 self.products_tree.insert(
@@ -635,7 +630,7 @@ class RegistrarVentaTab(ttk.Frame):
 
     def update_total(self):
         """Actualizar totales."""
-        subtotal = sum(r['unit_price'] * r['quantity'] for r in self.item_rows)
+        subtotal = sum((r['unit_price'] * r['quantity'] for r in self.item_rows), ZERO)
         self.subtotal_label.config(text=f"${subtotal:.2f}")
         self.total_label.config(text=f"${subtotal:.2f}")
 
@@ -650,34 +645,38 @@ class RegistrarVentaTab(ttk.Frame):
             messagebox. showwarning("Aviso", "Agrega al menos un producto")
             return
         
-        try:
-            # Preparar items
-            items = [
-                {
-                    'product_id': r['product_id'],
-                    'quantity': r['quantity'],
-                    'unit_price': r['unit_price']
-                }
-                for r in self.item_rows
-            ]
-            
-            # Registrar en backend
-            result = self.backend.crear_venta_multiple(self.selected_client_id, items)
+        # Preparar items
+        items = [
+            {
+                'product_id': r['product_id'],
+                'quantity': r['quantity'],
+                'unit_price': r['unit_price']
+            }
+            for r in self.item_rows
+        ]
+        client_name = self.selected_client_name
+        
+        def on_success(result):
             total = result. get('total', 0)
-            
             messagebox.showinfo(
                 "✅ Éxito",
                 f"Venta registrada exitosamente\n\n"
-                f"Cliente: {self.selected_client_name}\n"
+                f"Cliente: {client_name}\n"
                 f"Total: ${total:.2f}"
             )
-            
             self.clear_form()
-            self.logger.info(f"Venta registrada - {self.selected_client_name}:  ${total:.2f}")
-            
-        except Exception as e:
+            self.logger.info(f"Venta registrada - {client_name}:  ${total:.2f}")
+        
+        def on_error(e):
             messagebox.showerror("Error", f"No se pudo registrar:  {str(e)}")
             self.logger.error(f"Error al registrar venta: {e}")
+        
+        # Registrar en backend sin bloquear la interfaz
+        get_task_runner(self).submit(
+            self.backend.crear_venta_multiple, self.selected_client_id, items,
+            on_success=on_success, on_error=on_error,
+            owner=self, cancellable=False, busy_widget=self.register_btn
+        )
 
     def clear_form(self):
         """Limpiar formulario."""
@@ -1,13 +1,20 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from datetime import datetime
+from tkinter import ttk, messagebox, filedialog
 from Gui.Pages.Styles.compras_styles import CompraStyles
-from Core.compras_backend import ComprasBackend
+from Core.services import services
+from Core.importador_compras import ImportadorCompras
+from Gui.Widgets.virtual_treeview import VirtualTreeview, PagedRowSource
 from Core.logger import setup_logger
+from Gui.task_runner import get_task_runner
 
 class ComprasFrame(ttk.Frame):
+    # Tables shown by this page (see Gui.page_registry)
+    data_tables = ("compras",)
+
     def __init__(self, parent):
         super().__init__(parent)
-        self.backend = ComprasBackend()
+        self.backend = services.compras
         self.styles = CompraStyles()
         self.logger = setup_logger()
         self.setup_ui()
@@ -72,8 +79,42 @@ class ComprasFrame(ttk.Frame):
         history_frame = ttk.Frame(main_card)
         history_frame.pack(pady=10, padx=25, fill=tk.BOTH, expand=True)
         ttk.Label(history_frame, text="Historial de Compras", font=("Segoe UI", 14, "bold")).pack(pady=5)
+
+        # Filtros (se aplican en el servidor)
+        filter_frame = ttk.Frame(history_frame)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(filter_frame, text="Producto:").pack(side=tk.LEFT)
+        self.filtro_producto_entry = ttk.Entry(filter_frame, width=15)
+        self.filtro_producto_entry.pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(filter_frame, text="Proveedor:").pack(side=tk.LEFT)
+        self.filtro_proveedor_entry = ttk.Entry(filter_frame, width=15)
+        self.filtro_proveedor_entry.pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(filter_frame, text="Tipo:").pack(side=tk.LEFT)
+        self.filtro_tipo_combo = ttk.Combobox(filter_frame, values=["", "granel", "paquetes"], state="readonly", width=9)
+        self.filtro_tipo_combo.pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(filter_frame, text="Desde (AAAA-MM-DD):").pack(side=tk.LEFT)
+        self.filtro_desde_entry = ttk.Entry(filter_frame, width=11)
+        self.filtro_desde_entry.pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(filter_frame, text="Hasta:").pack(side=tk.LEFT)
+        self.filtro_hasta_entry = ttk.Entry(filter_frame, width=11)
+        self.filtro_hasta_entry.pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Button(filter_frame, text="Filtrar", command=self.load_history, style="Secondary.TButton").pack(side=tk.LEFT)
+
         columns = ("Producto", "Cantidad", "Unidad", "Precio Compra", "Precio Total", "Proveedor", "Tipo", "Fecha")
-        self.history_tree = ttk.Treeview(history_frame, columns=columns, show="headings", height=10, style="Modern.Treeview")
+        # Las páginas se piden al servidor a medida que el usuario hace scroll
+        self.history_source = PagedRowSource(self._fetch_history_page, page_size=self.HISTORY_PAGE_SIZE)
+        self.history_tree = VirtualTreeview(
+            history_frame,
+            columns=columns,
+            values=lambda p: (
+                p['producto'], p['cantidad'], p['unidad'],
+                p['precio_compra'], p['precio_total'], p['proveedor'], p['tipo'], p['fecha']
+            ),
+            key=lambda p: p['id'],
+            source=self.history_source,
+            height=10,
+            style="Modern.Treeview"
+        )
         for col in columns:
             self.history_tree.heading(col, text=col)
             self.history_tree.column(col, width=100)
@@ -82,15 +123,18 @@ class ComprasFrame(ttk.Frame):
         # Buttons with modern styling
         button_frame = ttk.Frame(form_card)
         button_frame.pack(pady=(10, 15))
-        ttk.Button(button_frame, text="Guardar Compra", command=self.save_purchase, style="Primary.TButton").pack(side=tk.LEFT, padx=(0, 10))
+        self.save_btn = ttk.Button(button_frame, text="Guardar Compra", command=self.save_purchase, style="Primary.TButton")
+        self.save_btn.pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(button_frame, text="Cargar Historial", command=self.load_history, style="Secondary.TButton").pack(side=tk.LEFT)
+        self.import_btn = ttk.Button(button_frame, text="Importar Factura", command=self.import_invoice, style="Secondary.TButton")
+        self.import_btn.pack(side=tk.LEFT, padx=(10, 0))
+        self.import_status = ttk.Label(button_frame, text="")
+        self.import_status.pack(side=tk.LEFT, padx=(10, 0))
 
         # Initialize form fields visibility
         self.update_fields()
-        self.load_history()
-
-        self.update_fields()
-        self.load_history()
+        # First load once the page is on screen, not while it is being built
+        self.after_idle(self.load_history)
 
     def update_fields(self):
         tipo = self.tipo_var.get()
@@ -105,39 +149,115 @@ class ComprasFrame(ttk.Frame):
         nombre = self.nombre_entry.get()
         proveedor = self.proveedor_entry.get()
         tipo = self.tipo_var.get()
-        try:
-            if tipo == "granel":
-                cantidad = self.cantidad_entry.get()
-                unidad = self.unidad_combo.get()
-                precio_compra = self.precio_entry.get()
-                self.backend.save_purchase(tipo, nombre, proveedor, cantidad=cantidad, unidad=unidad, precio_compra=precio_compra)
-            else:
-                cantidad_paq = self.cantidad_paq_entry.get()
-                precio_paq = self.precio_paq_entry.get()
-                peso_paq = self.peso_paq_entry.get()
-                unidad_peso = self.unidad_peso_combo.get()
-                self.backend.save_purchase(tipo, nombre, proveedor, cantidad_paq=cantidad_paq, precio_paq=precio_paq, peso_paq=peso_paq, unidad_peso=unidad_peso)
+        if tipo == "granel":
+            kwargs = dict(cantidad=self.cantidad_entry.get(), unidad=self.unidad_combo.get(), precio_compra=self.precio_entry.get())
+        else:
+            kwargs = dict(
+                cantidad_paq=self.cantidad_paq_entry.get(), precio_paq=self.precio_paq_entry.get(),
+                peso_paq=self.peso_paq_entry.get(), unidad_peso=self.unidad_peso_combo.get()
+            )
+
+        def on_success(_):
             messagebox.showinfo("Éxito", "Compra guardada exitosamente")
             self.clear_form()
             self.load_history()
-        except ValueError as e:
-            messagebox.showerror("Error", str(e))
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al guardar la compra: {e}")
+
+        def on_error(e):
+            if isinstance(e, ValueError):
+                messagebox.showerror("Error", str(e))
+            else:
+                messagebox.showerror("Error", f"Error al guardar la compra: {e}")
+
+        get_task_runner(self).submit(
+            self.backend.save_purchase, tipo, nombre, proveedor,
+            on_success=on_success, on_error=on_error,
+            owner=self, cancellable=False, busy_widget=self.save_btn, **kwargs
+        )
+
+    def import_invoice(self):
+        ruta = filedialog.askopenfilename(
+            title="Importar factura de proveedor",
+            filetypes=[("Facturas", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx")]
+        )
+        if not ruta:
+            return
+        importador = ImportadorCompras(self.backend)
+        runner = get_task_runner(self)
+
+        def on_error(e):
+            self.import_status.config(text="")
+            if isinstance(e, ValueError):
+                messagebox.showerror("Error", str(e))
+            else:
+                messagebox.showerror("Error", f"Error al importar la factura: {e}")
+
+        def on_importada(resumen):
+            self.import_status.config(text="")
+            messagebox.showinfo("Éxito", f"Factura importada: {resumen['lineas']} líneas")
+            self.load_history()
+
+        def on_validada(resumen):
+            if resumen["errores"]:
+                errores = "\n".join(resumen["errores"][:15])
+                messagebox.showerror("Factura inválida", f"{len(resumen['errores'])} línea(s) con errores:\n\n{errores}")
+                return
+            if not messagebox.askyesno(
+                "Importar factura",
+                f"{resumen['lineas']} líneas de {resumen['productos']} productos por ${resumen['total']:.2f}.\n¿Importar?"
+            ):
+                return
+            # The progress callback runs on the worker: hop to the Tk thread
+            runner.submit(
+                importador.importar, ruta,
+                progress=lambda lineas: runner.call_soon(self._import_progress, lineas),
+                on_success=on_importada, on_error=on_error,
+                owner=self, cancellable=False, busy_widget=self.import_btn
+            )
+
+        # Primero una pasada en seco para validar y mostrar el resumen
+        runner.submit(
+            importador.importar, ruta, dry_run=True,
+            on_success=on_validada, on_error=on_error,
+            key="importar", owner=self, busy_widget=self.import_btn
+        )
+
+    def _import_progress(self, lineas):
+        self.logger.info(f"Importando factura: {lineas} líneas procesadas")
+        if self.import_status.winfo_exists():
+            self.import_status.config(text=f"Importando... {lineas} líneas")
+
+    HISTORY_PAGE_SIZE = 100
+
+    def _read_history_filters(self):
+        filtros = {
+            "producto": self.filtro_producto_entry.get().strip() or None,
+            "proveedor": self.filtro_proveedor_entry.get().strip() or None,
+            "tipo": self.filtro_tipo_combo.get() or None,
+        }
+        for key, entry in (("desde", self.filtro_desde_entry), ("hasta", self.filtro_hasta_entry)):
+            texto = entry.get().strip()
+            filtros[key] = datetime.strptime(texto, "%Y-%m-%d").date() if texto else None
+        return filtros
+
+    def _fetch_history_page(self, despues_de, limite, **filtros):
+        return self.backend.get_purchase_history(limite=limite, despues_de=despues_de, **filtros)
 
     def load_history(self):
+        """Recarga el historial desde la primera página con los filtros actuales."""
         try:
-            history = self.backend.get_purchase_history()
-            for item in self.history_tree.get_children():
-                self.history_tree.delete(item)
-            for purchase in history:
-                self.history_tree.insert("", tk.END, values=(
-                    purchase['producto'], purchase['cantidad'], purchase['unidad'],
-                    purchase['precio_compra'], purchase['precio_total'], purchase['proveedor'], purchase['tipo'], purchase['fecha']
-                ))
+            filtros = self._read_history_filters()
+        except ValueError:
+            messagebox.showerror("Error", "Las fechas deben tener el formato AAAA-MM-DD")
+            return
+        try:
+            self.history_source.set_filters(**filtros)
+            self.history_tree.set_source(self.history_source)
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar el historial: {e}")
 
+    def refresh_stale(self, changed):
+        self.load_history()
+
     def clear_form(self):
         self.nombre_entry.delete(0, tk.END)
         self.proveedor_entry.delete(0, tk.END)
@@ -7,16 +7,26 @@ Página de Producción con interfaz mejorada.
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from Core.produccion_backend import ProduccionBackend
-from Core.inventario_backend import InventarioBackend
+from Core.services import services
 from Core.logger import setup_logger
+from Core.money import ZERO, to_decimal
+from Gui.task_runner import get_task_runner, listen
+from Gui.Widgets.tree_binder import TreeBinder
 
 
 class ProduccionFrame(ttk.Frame):
+    # Tables shown by this page (see Gui.page_registry)
+    # Inventory is followed live through InventarioBackend.subscribe
+    data_tables = ("subproductos", "productos_finales")
+
+    # Ingredient combo entries that are other recipes (nested subproductos)
+    RECETA_PREFIX = "🧪 "
+
     def __init__(self, parent):
         super().__init__(parent)
-        self.backend = ProduccionBackend()
-        self.inv_backend = InventarioBackend()
+        self.backend = services.produccion
+        self.inv_backend = services.inventario
+        self.capacidad_backend = services.capacidad
         self.logger = setup_logger()
         
         # Estado actual
@@ -25,12 +35,21 @@ class ProduccionFrame(ttk.Frame):
         self.selected_subproducto_name = None
         self.subproductos_map = {}  # id -> subproducto data
         self.productos_finales_map = {}  # id -> producto final data
+        self.capacidad_cargada = False
+        self.stock_pendiente = set()  # productos cuyo cambio de stock aún no se aplicó al panel
         
         self.setup_ui()
         self.load_subproductos()
         self.load_productos_finales()
         self.logger.info("ProduccionFrame initialized")
 
+    def refresh_stale(self, changed):
+        """Recarga solo las listas cuyas tablas cambiaron mientras la página estaba oculta."""
+        if "subproductos" in changed:
+            self.load_subproductos()
+        if "productos_finales" in changed:
+            self.load_productos_finales()
+
     def setup_ui(self):
         """Configurar la interfaz de usuario."""
         
@@ -82,7 +101,26 @@ class ProduccionFrame(ttk.Frame):
             font=("Segoe UI", 10),
             width=40
         )
-        self.sub_nombre_entry.pack(fill=tk.X, pady=(0, 15))
+        self.sub_nombre_entry.pack(fill=tk.X, pady=(0, 10))
+        
+        # Rendimiento de un lote (lo que usan las recetas que la incluyen, p.ej. 800 ml de jarabe)
+        rend_frame = ttk.Frame(left_panel)
+        rend_frame.pack(fill=tk.X, pady=(0, 15))
+        
+        ttk.Label(rend_frame, text="Rinde por lote:").grid(row=0, column=0, sticky="w", padx=2)
+        self.rendimiento_entry = tk.Entry(rend_frame, width=10, font=("Segoe UI", 9))
+        self.rendimiento_entry.insert(0, "1")
+        self.rendimiento_entry.grid(row=0, column=1, padx=2)
+        
+        ttk.Label(rend_frame, text="Unidad:").grid(row=0, column=2, sticky="w", padx=2)
+        self.rendimiento_unidad_combo = ttk.Combobox(
+            rend_frame,
+            values=["g", "kg", "ml", "L", "units"],
+            state="readonly",
+            width=10
+        )
+        self.rendimiento_unidad_combo.set("units")
+        self.rendimiento_unidad_combo.grid(row=0, column=3, padx=2)
         
         # Ingredientes
         tk.Label(
@@ -150,7 +188,7 @@ class ProduccionFrame(ttk.Frame):
         action_frame = tk.Frame(left_panel, bg="white")
         action_frame. pack(fill=tk.X)
         
-        create_sub_btn = tk.Button(
+        self.create_sub_btn = create_sub_btn = tk.Button(
             action_frame,
             text="✅ Crear Subproducto",
             command=self. create_subproducto,
@@ -211,6 +249,7 @@ class ProduccionFrame(ttk.Frame):
         self.subproductos_tree.column("Acción", width=70, anchor=tk.CENTER)
         
         self.subproductos_tree.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        self.subproductos_binder = TreeBinder(self.subproductos_tree, key=lambda sub: sub.get('id'), values=self._subproducto_values)
         self.subproductos_tree.bind("<<TreeviewSelect>>", self. on_subproducto_select)
         self.subproductos_tree. bind("<Button-3>", self.on_subproducto_right_click)
         
@@ -270,13 +309,51 @@ class ProduccionFrame(ttk.Frame):
         self.productos_finales_tree.column("Acción", width=70, anchor=tk.CENTER)
         
         self.productos_finales_tree.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        self.productos_finales_binder = TreeBinder(self.productos_finales_tree, key=lambda prod: prod.get('id'), values=self._producto_final_values)
         self.productos_finales_tree.bind("<Button-3>", self.on_producto_right_click)
         
+        # --- Capacidad de producción ---
+        cap_card = tk.LabelFrame(
+            right_panel,
+            text="📊 Capacidad con el Stock Actual",
+            font=("Segoe UI", 12, "bold"),
+            bg="white",
+            padx=10,
+            pady=10,
+            fg="#6f42c1"
+        )
+        cap_card.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
+        
+        cap_cols = ("Subproducto", "Lotes Máx.", "Limitado por")
+        self.capacidad_tree = ttk.Treeview(
+            cap_card,
+            columns=cap_cols,
+            show="headings",
+            height=5
+        )
+        self.capacidad_tree.heading("Subproducto", text="📦 Subproducto")
+        self.capacidad_tree.heading("Lotes Máx.", text="Lotes Máx.")
+        self.capacidad_tree.heading("Limitado por", text="Limitado por")
+        
+        self.capacidad_tree.column("Subproducto", width=150)
+        self.capacidad_tree.column("Lotes Máx.", width=80, anchor=tk.CENTER)
+        self.capacidad_tree.column("Limitado por", width=130)
+        
+        self.capacidad_tree.pack(fill=tk.BOTH, expand=True)
+        self.capacidad_binder = TreeBinder(self.capacidad_tree, key=lambda cap: cap['subproducto_id'], values=self._capacidad_values)
+        
         # ===== FOOTER:  Botón Producir =====
         footer = tk.Frame(right_panel, bg="white")
         footer.pack(fill=tk.X, pady=(10, 0))
         
-        produce_btn = tk.Button(
+        lotes_frame = tk.Frame(footer, bg="white")
+        lotes_frame.pack(fill=tk.X, pady=(0, 5))
+        tk.Label(lotes_frame, text="Lotes:", bg="white", font=("Segoe UI", 10)).pack(side=tk.LEFT)
+        self.lotes_spin = ttk.Spinbox(lotes_frame, from_=1, to=500, width=6)
+        self.lotes_spin.set(1)
+        self.lotes_spin.pack(side=tk.LEFT, padx=(5, 0))
+        
+        self.produce_btn = tk.Button(
             footer,
             text="🚀 Producir Subproducto",
             command=self.produce_subproducto,
@@ -288,88 +365,133 @@ class ProduccionFrame(ttk.Frame):
             relief=tk. FLAT,
             cursor="hand2"
         )
-        produce_btn.pack(fill=tk.X)
+        self.produce_btn.pack(fill=tk.X)
         
         # Cargar datos de inventario para combobox de ingredientes
         self.load_ingredient_combo()
+        listen(self, self.inv_backend.subscribe, lambda cambios: self.load_ingredient_combo())
+        listen(self, self.inv_backend.subscribe, self.on_stock_cambiado)
 
     def load_ingredient_combo(self):
-        """Cargar productos del inventario para el combobox."""
-        try:
-            inventario = self.inv_backend. get_inventario_para_resumen()
+        """Cargar productos del inventario (desde la caché) y recetas existentes para el combobox."""
+        def on_success(inventario):
             productos = [item['producto'] for item in inventario]
+            productos += sorted(self.RECETA_PREFIX + sub['nombre'] for sub in self.subproductos_map.values())
             self.ing_producto_combo['values'] = productos
             self.logger.info(f"Cargados {len(productos)} productos para ingredientes")
-        except Exception as e:
-            self.logger.error(f"Error cargando ingredientes: {e}")
+
+        get_task_runner(self).submit(
+            self.inv_backend.get_inventario_para_resumen,
+            on_success=on_success,
+            on_error=lambda e: self.logger.error(f"Error cargando ingredientes: {e}"),
+            key="ingredientes", owner=self
+        )
 
     def load_subproductos(self):
-        """Cargar subproductos disponibles."""
-        try:
-            for item in self.subproductos_tree.get_children():
-                self.subproductos_tree. delete(item)
-            
-            subproductos = self.backend.get_subproductos_disponibles()
-            self.subproductos_map. clear()
-            
-            for sub in subproductos:
-                sub_id = sub. get('id')
-                self.subproductos_map[sub_id] = sub
-                
-                self.subproductos_tree. insert(
-                    "",
-                    tk.END,
-                    iid=str(sub_id),
-                    values=(
-                        sub.get('nombre', ''),
-                        f"${sub.get('costo_total_subproducto', 0):.2f}",
-                        "🗑️"
-                    )
-                )
-            
-            self. logger.info(f"Cargados {len(subproductos)} subproductos")
-            
-        except Exception as e:
+        """Cargar subproductos disponibles (en segundo plano)."""
+        def on_success(subproductos):
+            self.subproductos_map = {sub.get('id'): sub for sub in subproductos}
+            # Only the rows that changed are touched; selection and scroll are kept
+            self.subproductos_binder.bind(subproductos)
+            self.load_ingredient_combo()
+            self.load_capacidad()
+            self.logger.info(f"Cargados {len(subproductos)} subproductos")
+
+        def on_error(e):
             messagebox.showerror("Error", f"No se pudieron cargar subproductos: {e}")
             self.logger.error(f"Error cargando subproductos: {e}")
 
+        get_task_runner(self).submit(
+            self.backend.get_subproductos_disponibles,
+            on_success=on_success, on_error=on_error,
+            key="subproductos", owner=self
+        )
+
     def load_productos_finales(self):
-        """Cargar productos finales."""
-        try:
-            for item in self.productos_finales_tree.get_children():
-                self.productos_finales_tree.delete(item)
-            
-            productos = self.backend.get_productos_finales_con_precios()
-            self.productos_finales_map.clear()
-            
-            for prod in productos: 
-                prod_id = prod. get('id')
-                self. productos_finales_map[prod_id] = prod
-                
-                costo = float(prod.get('costo_unitario', 0))
-                precio_venta = float(prod. get('precio_venta', 0) or 0)
-                ganancia = precio_venta - costo
-                
-                self.productos_finales_tree.insert(
-                    "",
-                    tk.END,
-                    iid=str(prod_id),
-                    values=(
-                        prod.get('nombre', ''),
-                        prod.get('subproducto_nombre', ''),
-                        f"${costo:.2f}",
-                        f"${precio_venta:.2f}",
-                        f"${ganancia:. 2f}",
-                        "🗑️"
-                    )
-                )
-            
+        """Cargar productos finales (en segundo plano)."""
+        def on_success(productos):
+            self.productos_finales_map = {prod.get('id'): prod for prod in productos}
+            # Only the rows that changed are touched; selection and scroll are kept
+            self.productos_finales_binder.bind(productos)
             self.logger.info(f"Cargados {len(productos)} productos finales")
-            
-        except Exception as e:
+
+        def on_error(e):
             messagebox.showerror("Error", f"No se pudieron cargar productos finales: {e}")
             self.logger.error(f"Error cargando productos finales: {e}")
 
+        get_task_runner(self).submit(
+            self.backend.get_productos_finales_con_precios,
+            on_success=on_success, on_error=on_error,
+            key="productos_finales", owner=self
+        )
+
+    def load_capacidad(self):
+        """Capacidad de todas las recetas en una pasada (en segundo plano)."""
+        def on_success(capacidades):
+            self.capacidad_binder.bind(capacidades)
+            self.capacidad_cargada = True
+        
+        get_task_runner(self).submit(
+            self.capacidad_backend.calcular,
+            on_success=on_success,
+            on_error=lambda e: self.logger.error(f"Error calculando capacidad: {e}"),
+            key="capacidad", owner=self
+        )
+
+    def on_stock_cambiado(self, cambios):
+        """Recalcula en segundo plano solo las recetas que usan los productos cuyo stock cambió."""
+        if not self.capacidad_cargada:
+            return
+        # A newer event supersedes the running task, so it carries every product not applied yet
+        self.stock_pendiente.update(cambios)
+        productos = set(self.stock_pendiente)
+
+        def on_success(resultado):
+            resultados, completo = resultado
+            self.stock_pendiente -= productos
+            if completo:
+                # The recipe graph changed: a full bind also drops deleted recipes
+                self.capacidad_binder.bind(resultados)
+            else:
+                self.capacidad_binder.update_rows(resultados)
+
+        get_task_runner(self).submit(
+            self.capacidad_backend.actualizar, productos,
+            on_success=on_success,
+            on_error=lambda e: self.logger.error(f"Error actualizando capacidad: {e}"),
+            key="capacidad_stock", owner=self
+        )
+
+    @staticmethod
+    def _capacidad_values(cap):
+        return (
+            cap['nombre'],
+            cap['max_lotes'],
+            cap['cuello_botella'] or "—"
+        )
+
+    @staticmethod
+    def _subproducto_values(sub):
+        return (
+            sub.get('nombre', ''),
+            f"${sub.get('costo_total_subproducto', 0):.2f}",
+            "🗑️"
+        )
+
+    @staticmethod
+    def _producto_final_values(prod):
+        costo = prod.get('costo_unitario') or ZERO
+        precio_venta = prod.get('precio_venta') or ZERO
+        ganancia = precio_venta - costo
+        return (
+            prod.get('nombre', ''),
+            prod.get('subproducto_nombre', ''),
+            f"${costo:.2f}",
+            f"${precio_venta:.2f}",
+            f"${ganancia:.2f}",
+            "🗑️"
+        )
+
     def on_subproducto_select(self, event):
         """Manejar selección de subproducto."""
         selection = self.subproductos_tree.selection()
@@ -403,22 +525,30 @@ class ProduccionFrame(ttk.Frame):
                 return
             
             try:
-                float(cantidad)
+                cantidad = to_decimal(cantidad)
             except ValueError:
                 messagebox. showerror("Error", "La cantidad debe ser un número")
                 return
             
+            if producto.startswith(self.RECETA_PREFIX):
+                # Nested recipe: its raw materials are consumed when this one is made
+                nombre = producto[len(self.RECETA_PREFIX):]
+                sub_id = next((i for i, sub in self.subproductos_map.items() if sub['nombre'] == nombre), None)
+                if sub_id is None:
+                    messagebox.showerror("Error", f"Receta '{nombre}' no encontrada")
+                    return
+                ingrediente = {'subproducto_id': sub_id, 'receta': producto}
+            else:
+                ingrediente = {'producto': producto}
+            ingrediente.update(cantidad=cantidad, unidad=unidad)
+            
             self.ingredientes_tree.insert(
                 "",
                 tk.END,
                 values=(producto, cantidad, unidad)
             )
             
-            self.ingredientes_list.append({
-                'producto':  producto,
-                'cantidad': float(cantidad),
-                'unidad': unidad
-            })
+            self.ingredientes_list.append(ingrediente)
             
             # Limpiar campos
             self.ing_producto_combo.set("")
@@ -459,7 +589,7 @@ class ProduccionFrame(ttk.Frame):
             # Eliminar de lista
             self.ingredientes_list = [
                 ing for ing in self.ingredientes_list 
-                if ing['producto'] != values[0]
+                if (ing.get('producto') or ing.get('receta')) != values[0]
             ]
             
             self.logger.info(f"Ingrediente eliminado: {values[0]}")
@@ -469,66 +599,75 @@ class ProduccionFrame(ttk.Frame):
 
     def create_subproducto(self):
         """Crear nuevo subproducto."""
+        nombre = self.sub_nombre_entry.get().strip()
+        
+        if not nombre or not self.ingredientes_list:
+            messagebox.showwarning("Aviso", "Ingresa nombre y al menos un ingrediente")
+            return
+        
+        unidad_rendimiento = self.rendimiento_unidad_combo.get()
         try:
-            nombre = self.sub_nombre_entry.get().strip()
-            
-            if not nombre or not self.ingredientes_list:
-                messagebox.showwarning("Aviso", "Ingresa nombre y al menos un ingrediente")
-                return
-            
-            costo = self.backend.crear_subproducto(nombre, self.ingredientes_list)
-            
+            rendimiento = to_decimal(self.rendimiento_entry.get().strip())
+        except ValueError:
+            messagebox.showerror("Error", "El rendimiento debe ser un número")
+            return
+        if rendimiento <= 0 or not unidad_rendimiento:
+            messagebox.showwarning("Aviso", "Indica cuánto rinde un lote y en qué unidad")
+            return
+        
+        def on_success(costo):
             messagebox.showinfo(
                 "✅ Éxito",
                 f"Subproducto '{nombre}' creado\nCosto Total: ${costo:.2f}"
             )
-            
             self.clear_subproducto()
             self.load_subproductos()
             self.logger.info(f"Subproducto creado: {nombre}")
-            
-        except Exception as e:
+        
+        def on_error(e):
             messagebox.showerror("Error", f"Error: {e}")
             self.logger.error(f"Error creando subproducto: {e}")
+        
+        get_task_runner(self).submit(
+            self.backend.crear_subproducto, nombre, list(self.ingredientes_list), rendimiento, unidad_rendimiento,
+            on_success=on_success, on_error=on_error,
+            owner=self, cancellable=False, busy_widget=self.create_sub_btn
+        )
 
     def produce_subproducto(self):
-        """Producir subproducto (consumir ingredientes del inventario)."""
+        """Producir N lotes del subproducto seleccionado (una sola transacción)."""
         if not self.selected_subproducto_id: 
             messagebox.showwarning("Aviso", "Selecciona un subproducto")
             return
         
+        sub_data = self.subproductos_map.get(self.selected_subproducto_id)
+        if not sub_data: 
+            messagebox.showerror("Error", "Subproducto no encontrado")
+            return
+        
         try:
-            sub_data = self.subproductos_map.get(self.selected_subproducto_id)
-            if not sub_data: 
-                messagebox.showerror("Error", "Subproducto no encontrado")
-                return
-            
-            # Obtener ingredientes del subproducto
-            ingredientes = self.backend.get_subproducto_ingredientes(self.selected_subproducto_id)
-            
-            if not ingredientes:
-                messagebox. showwarning("Aviso", "El subproducto no tiene ingredientes")
-                return
-            
-            # Consumir stock
-            for ing in ingredientes:
-                self. inv_backend.consumir_stock(
-                    ing['producto_ingrediente'],
-                    ing['cantidad_usada'],
-                    ing['unidad_usada']
-                )
-            
+            n_lotes = int(self.lotes_spin.get())
+        except ValueError:
+            messagebox.showerror("Error", "La cantidad de lotes debe ser un número entero")
+            return
+        nombre = self.selected_subproducto_name
+        
+        def on_success(corrida):
             messagebox.showinfo(
                 "✅ Éxito",
-                f"Ingredientes consumidos para:\n{self.selected_subproducto_name}"
+                f"{corrida['lotes']} lote(s) de {nombre} producidos\nCosto: ${corrida['costo_total']:.2f}"
             )
-            
-            self.load_subproductos()
-            self.logger.info(f"Subproducto producido:  {self.selected_subproducto_name}")
-            
-        except Exception as e:
+            self.logger.info(f"Subproducto producido: {nombre} x{corrida['lotes']}")
+        
+        def on_error(e):
             messagebox.showerror("Error", f"Error: {e}")
             self.logger.error(f"Error produciendo subproducto: {e}")
+        
+        get_task_runner(self).submit(
+            self.backend.producir_lotes, self.selected_subproducto_id, n_lotes,
+            on_success=on_success, on_error=on_error,
+            owner=self, cancellable=False, busy_widget=self.produce_btn
+        )
 
     def on_subproducto_right_click(self, event):
         """Click derecho en subproducto."""
@@ -597,6 +736,9 @@ class ProduccionFrame(ttk.Frame):
     def clear_subproducto(self):
         """Limpiar formulario."""
         self.sub_nombre_entry.delete(0, tk. END)
+        self.rendimiento_entry.delete(0, tk.END)
+        self.rendimiento_entry.insert(0, "1")
+        self.rendimiento_unidad_combo.set("units")
         for item in self.ingredientes_tree.get_children():
             self.ingredientes_tree.delete(item)
         self.ingredientes_list. clear()
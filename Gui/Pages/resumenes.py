@@ -6,15 +6,19 @@ import tkinter as tk
 from tkinter import ttk
 from Gui.Pages.ResumenesTabs. inventario_tab import InventarioTab
 from Gui.Pages.ResumenesTabs.contabilidad_tab import ContabilidadTab
-from Core.inventario_backend import InventarioBackend
+from Core.services import services
 from Core.logger import setup_logger
 
 
 class ResumenesFrame(ttk.Frame):
+    # Inventory rows follow changes live (InventarioBackend.subscribe); the
+    # ledger indicators and movements are reloaded when the page is shown again
+    data_tables = ("movimientos",)
+
     def __init__(self, parent):
         super().__init__(parent)
         self.logger = setup_logger()
-        self.backend = InventarioBackend()
+        self.backend = services.inventario
         self.setup_ui()
         self.logger.info("ResumenesFrame initialized")
 
@@ -49,5 +53,8 @@ class ResumenesFrame(ttk.Frame):
         self.notebook.add(self.inv_tab, text="📦 Inventario")
         
         # Tab: Contabilidad (NUEVO)
-        self.contabilidad_tab = ContabilidadTab(self.notebook, self.backend)
-        self.notebook.add(self.contabilidad_tab, text="💰 Contabilidad")
\ No newline at end of file
+        self.contabilidad_tab = ContabilidadTab(self.notebook, self.backend, services.contabilidad)
+        self.notebook.add(self.contabilidad_tab, text="💰 Contabilidad")
+
+    def refresh_stale(self, changed):
+        self.contabilidad_tab.refresh_ledger()
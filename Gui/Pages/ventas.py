@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from Gui.Pages.Styles.ventas_styles import VentasStyles
-from Core.ventas_backend import VentasBackend
+from Core.services import services
 from Gui.Pages.Ventas_Tabs.clientes_tab import ClientesTab
 from Gui.Pages.Ventas_Tabs.history_tab import HistorialTab
 # from Gui.Pages.Ventas_Tabs.precios_tab import PreciosTab
@@ -9,9 +9,12 @@ from Gui.Pages.Ventas_Tabs.ventas_registro_tab import RegistrarVentaTab
 from Core.logger import setup_logger
 
 class VentasFrame(ttk.Frame):
+    # Tables shown by this page (see Gui.page_registry)
+    data_tables = ("clientes", "subproductos", "productos_finales", "ventas")
+
     def __init__(self, parent):
         super().__init__(parent)
-        self.backend = VentasBackend()
+        self.backend = services.ventas
         self.logger = setup_logger()
         self.styles = VentasStyles()
         self.setup_ui()
@@ -29,6 +32,16 @@ class VentasFrame(ttk.Frame):
         self.historial_tab = HistorialTab(self.notebook, self.backend)
         self.notebook.add(self.historial_tab, text="Historial de Ventas")
 
+    def refresh_stale(self, changed):
+        """Recarga solo las pestañas afectadas por las tablas que cambiaron."""
+        if "clientes" in changed:
+            self.clientes_tab.load_clients()
+            self.registrar_tab.load_clients()
+        if changed & {"subproductos", "productos_finales"}:
+            self.registrar_tab.load_products()
+        if changed & {"clientes", "ventas"}:
+            self.historial_tab.load_historial()
+
     def setup_ui(self):
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(fill=tk.BOTH, expand=True)
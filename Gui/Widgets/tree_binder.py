@@ -0,0 +1,82 @@
+"""
+Sincroniza un ttk.Treeview con una lista de filas sin vaciarlo.
+
+TreeBinder compara las filas nuevas con lo que ya muestra el Treeview
+(por iid) y solo inserta, actualiza, mueve o borra las diferencias. Como los
+items que siguen existiendo no se tocan, se mantienen la selección y la
+posición del scroll, y recargar una lista donde cambió un valor cuesta una
+llamada a Tk en lugar de n.
+
+    self.binder = TreeBinder(self.tree, key=lambda r: r["id"], values=self._row_values)
+    self.binder.bind(rows)
+"""
+
+import tkinter as tk
+
+
+class TreeBinder:
+    def __init__(self, tree, key, values):
+        """
+        :param tree: ttk.Treeview to keep in sync. Items are owned by the binder.
+        :param key: callable(row) -> id; ``str(id)`` is used as the item iid.
+        :param values: callable(row) -> tuple of display values.
+        """
+        self.tree = tree
+        self.key = key
+        self.values = values
+        self._shown = {}  # iid -> values tuple currently in the tree
+        self._order = []  # iids in display order
+
+    def bind(self, rows):
+        """Makes the tree show exactly ``rows``, in order, touching only what changed."""
+        new_order = []
+        new_shown = {}
+        for row in rows:
+            iid = str(self.key(row))
+            new_order.append(iid)
+            new_shown[iid] = tuple(self.values(row))
+
+        for iid in self._order:
+            if iid not in new_shown and self.tree.exists(iid):
+                self.tree.delete(iid)
+
+        kept = [iid for iid in self._order if iid in new_shown]
+        for index, iid in enumerate(new_order):
+            values = new_shown[iid]
+            if iid not in self._shown:
+                self.tree.insert("", index, iid=iid, values=values)
+                kept.insert(index, iid)
+                continue
+            if self._shown[iid] != values:
+                self.tree.item(iid, values=values)
+            if kept[index] != iid:
+                self.tree.move(iid, "", index)
+                kept.remove(iid)
+                kept.insert(index, iid)
+
+        self._shown = new_shown
+        self._order = new_order
+
+    def update_rows(self, rows):
+        """Updates (or appends) only the given rows, leaving the others as they are."""
+        for row in rows:
+            iid = str(self.key(row))
+            values = tuple(self.values(row))
+            if iid in self._shown:
+                if self._shown[iid] != values:
+                    self.tree.item(iid, values=values)
+            else:
+                self.tree.insert("", tk.END, iid=iid, values=values)
+                self._order.append(iid)
+            self._shown[iid] = values
+
+    def remove(self, keys):
+        for key in keys:
+            iid = str(key)
+            if self._shown.pop(iid, None) is not None:
+                self._order.remove(iid)
+                if self.tree.exists(iid):
+                    self.tree.delete(iid)
+
+    def clear(self):
+        self.bind([])
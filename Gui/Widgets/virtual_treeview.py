@@ -0,0 +1,404 @@
+"""
+Treeview virtual: solo materializa en Tk las filas visibles.
+
+Un VirtualTreeview muestra filas de un "row source" (ListRowSource para una
+lista en memoria o PagedRowSource para páginas traídas de la base de datos).
+El Treeview interno tiene siempre tantos items como filas caben en pantalla;
+al hacer scroll se reescriben sus valores en lugar de insertar/borrar items,
+así que una tabla de 50.000 filas cuesta lo mismo que una de 20.
+
+Las páginas de un PagedRowSource se piden en segundo plano (TaskRunner): el
+scroll y el redimensionado nunca esperan a la base de datos, y un error al
+traer una página se registra en el log en lugar de romper el evento de Tk.
+"""
+
+import tkinter as tk
+from tkinter import ttk
+from Core.logger import setup_logger
+from Gui.task_runner import get_task_runner
+
+logger = setup_logger("virtual_treeview")
+
+
+class ListRowSource:
+    """Row source over an in-memory list. Sorting and filtering happen here."""
+
+    sortable = True
+
+    def __init__(self, rows=None):
+        self._all = list(rows or [])
+        self._predicate = None
+        self._sort = None  # (key, reverse)
+        self._view = self._all
+
+    def set_rows(self, rows):
+        self._all = list(rows)
+        self._rebuild()
+
+    def update(self, rows, key, removed=()):
+        """Replaces rows by key (new keys are appended) and drops the ``removed`` keys."""
+        by_key = {key(r): r for r in rows}
+        removed = set(removed)
+        kept = []
+        for row in self._all:
+            k = key(row)
+            if k not in removed:
+                kept.append(by_key.pop(k, row))
+        kept.extend(by_key.values())
+        self._all = kept
+        self._rebuild()
+
+    def set_filter(self, predicate):
+        """predicate(row) -> bool, or None to show every row."""
+        self._predicate = predicate
+        self._rebuild()
+
+    def sort(self, key, reverse=False):
+        self._sort = (key, reverse)
+        self._rebuild()
+
+    def _rebuild(self):
+        rows = self._all if self._predicate is None else [r for r in self._all if self._predicate(r)]
+        if self._sort:
+            key, reverse = self._sort
+            rows = sorted(rows, key=key, reverse=reverse)
+        self._view = rows
+
+    def count(self):
+        return len(self._view)
+
+    def has_more(self):
+        return False
+
+    def needs_page(self, stop):
+        return False
+
+    def get(self, start, stop):
+        return self._view[start:stop]
+
+    def rows(self):
+        return self._view
+
+
+class PagedRowSource:
+    """
+    Row source that pulls pages on demand from ``fetch_page``.
+
+    fetch_page(despues_de, limite, **filtros) must return (rows, cursor_siguiente)
+    like ComprasBackend.get_purchase_history. Pages are only requested when the
+    visible window reaches the end of what has been loaded. Ordering is fixed
+    by the query, so sorting is not supported; filters are sent to the server.
+
+    Nothing here blocks: count/get only return what is loaded. The view asks
+    ``needs_page`` and runs the ``page_request()`` fetch off the Tk thread,
+    then hands its result to ``add_page``.
+    """
+
+    sortable = False
+
+    def __init__(self, fetch_page, page_size=200, **filtros):
+        self._fetch_page = fetch_page
+        self._page_size = page_size
+        self._filtros = filtros
+        self._generation = 0
+        self.reset()
+
+    def reset(self):
+        self._rows = []
+        self._cursor = None
+        self._exhausted = False
+        self._started = False
+        self._generation += 1  # pages requested before this are dropped
+
+    def set_filters(self, **filtros):
+        self._filtros = filtros
+        self.reset()
+
+    def needs_page(self, stop):
+        """True if the first page or rows before ``stop`` are still missing."""
+        return not self._exhausted and (not self._started or stop > len(self._rows))
+
+    def page_request(self):
+        """
+        Returns fetch() for the next page with the current cursor and filters.
+        It is safe to call on a worker thread; pass its result to add_page.
+        """
+        token = (self._generation, len(self._rows))
+        cursor, filtros = self._cursor, dict(self._filtros)
+
+        def fetch():
+            return token, self._fetch_page(cursor, self._page_size, **filtros)
+        return fetch
+
+    def add_page(self, page):
+        """
+        Appends a page fetched by page_request(). Returns False (and ignores it)
+        if the source was reset or grew since the request.
+        """
+        token, (rows, cursor) = page
+        if token != (self._generation, len(self._rows)):
+            return False
+        self._started = True
+        self._rows.extend(rows)
+        self._cursor = cursor
+        self._exhausted = cursor is None
+        return True
+
+    def count(self):
+        return len(self._rows)
+
+    def has_more(self):
+        return not self._exhausted
+
+    def get(self, start, stop):
+        return self._rows[start:stop]
+
+    def rows(self):
+        return self._rows
+
+
+class VirtualTreeview(ttk.Frame):
+    """
+    Frame with a Treeview and a scrollbar that renders only the visible window.
+
+    :param columns: column ids, as for ttk.Treeview.
+    :param values: callable(row) -> tuple of display values.
+    :param key: callable(row) -> hashable id, used to keep the selection while scrolling.
+    :param sort_keys: optional {column: callable(row)} enabling sort on heading click.
+    Bind ``<<VirtualSelect>>`` on the widget to react to selection changes;
+    ``<<VirtualPageLoaded>>`` is generated once a page of a paged source has
+    arrived and been drawn (it reaches the toplevel's bindings too).
+    Extra keyword arguments go to the inner ttk.Treeview (style, height, show...).
+    """
+
+    def __init__(self, parent, columns, values, key=None, sort_keys=None, source=None, **tree_kwargs):
+        super().__init__(parent)
+        self.values = values
+        self.key = key or id
+        self.sort_keys = sort_keys or {}
+        self.source = source or ListRowSource()
+        self.offset = 0
+        self._slots = []          # item ids of the materialized rows
+        self._slot_rows = {}      # item id -> row currently shown there
+        self._selected = set()    # keys of selected rows
+        self._sorted_by = None
+        self._rendering = False
+        self._page_task = None      # TaskRunner task fetching the next page, if any
+        self._wanted_offset = None  # offset to restore once the missing rows arrive
+
+        tree_kwargs.setdefault("show", "headings")
+        self.tree = ttk.Treeview(self, columns=columns, selectmode="browse", **tree_kwargs)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        for col in columns:
+            if col in self.sort_keys:
+                self.tree.heading(col, command=lambda c=col: self.sort_by(c))
+
+        self.tree.bind("<Configure>", lambda e: self.refresh())
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select, add="+")
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Up>", lambda e: self._on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self._on_arrow(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self._visible_count()) or "break")
+        self.tree.bind("<Next>", lambda e: self.scroll(self._visible_count()) or "break")
+
+    # --- Treeview passthroughs used by the pages ---
+    def heading(self, *args, **kwargs):
+        return self.tree.heading(*args, **kwargs)
+
+    def column(self, *args, **kwargs):
+        return self.tree.column(*args, **kwargs)
+
+    def bind_tree(self, sequence, func, add="+"):
+        return self.tree.bind(sequence, func, add=add)
+
+    # --- Data ---
+    def set_source(self, source):
+        self.source = source
+        self._selected.clear()
+        self.offset = 0
+        self._wanted_offset = None
+        if self._page_task is not None:
+            self._page_task.cancel()
+            self._page_task = None
+        self.refresh()
+
+    def set_rows(self, rows):
+        """Replace the rows of a ListRowSource, keeping scroll position and selection."""
+        self.source.set_rows(rows)
+        self.refresh()
+
+    def update_rows(self, rows, removed_keys=()):
+        """Updates only the given rows of a ListRowSource (matched with ``key``) and removes ``removed_keys``."""
+        self.source.update(rows, self.key, removed_keys)
+        self._selected.difference_update(removed_keys)
+        self.refresh()
+
+    def selected_rows(self):
+        return [row for row in self._slot_rows.values() if self.key(row) in self._selected]
+
+    def selected_keys(self):
+        return list(self._selected)
+
+    def select_key(self, key):
+        self._selected = {key}
+        self.refresh()
+
+    def clear_selection(self):
+        self._selected.clear()
+        self.refresh()
+
+    def sort_by(self, column):
+        if not self.source.sortable or column not in self.sort_keys:
+            return
+        reverse = self._sorted_by == (column, False)
+        self._sorted_by = (column, reverse)
+        self.source.sort(self.sort_keys[column], reverse=reverse)
+        self.offset = 0
+        self.refresh()
+
+    # --- Rendering ---
+    def _row_height(self):
+        style = self.tree.cget("style") or "Treeview"
+        height = ttk.Style().lookup(style, "rowheight") or ttk.Style().lookup("Treeview", "rowheight")
+        try:
+            return max(int(height), 1)
+        except (TypeError, ValueError):
+            return 20
+
+    def _visible_count(self):
+        height = self.tree.winfo_height()
+        if height <= 1:
+            # Not mapped yet: use the requested number of rows
+            return int(self.tree.cget("height") or 10)
+        header = 0
+        if self._slots:
+            bbox = self.tree.bbox(self._slots[0])
+            if bbox:
+                header = bbox[1]
+        return max((height - header) // self._row_height(), 1)
+
+    def refresh(self):
+        """Re-render the visible window from the current source."""
+        if self._rendering:
+            return
+        self._rendering = True
+        try:
+            visible = self._visible_count()
+            if self.source.needs_page(self.offset + visible):
+                # Show what is loaded now and come back to this offset when the page arrives
+                self._wanted_offset = self.offset
+                self._request_page()
+            else:
+                self._wanted_offset = None
+            total = self.source.count()
+            self.offset = max(0, min(self.offset, max(total - visible, 0)))
+            rows = self.source.get(self.offset, self.offset + visible)
+
+            # Grow/shrink the pool of Tk items to the number of rows to show
+            while len(self._slots) < len(rows):
+                self._slots.append(self.tree.insert("", tk.END, values=()))
+            while len(self._slots) > len(rows):
+                slot = self._slots.pop()
+                self._slot_rows.pop(slot, None)
+                self.tree.delete(slot)
+
+            selected_slots = []
+            for slot, row in zip(self._slots, rows):
+                self._slot_rows[slot] = row
+                self.tree.item(slot, values=self.values(row))
+                if self.key(row) in self._selected:
+                    selected_slots.append(slot)
+            if set(self.tree.selection()) != set(selected_slots):
+                self.tree.selection_set(selected_slots)
+            self._update_scrollbar(total, visible)
+        finally:
+            self._rendering = False
+
+    def _request_page(self):
+        """Fetches the next page of the source in the background (one at a time)."""
+        if self._page_task is not None and not self._page_task.cancelled:
+            return
+        source = self.source
+        self._page_task = get_task_runner(self).submit(
+            source.page_request(),
+            on_success=lambda page: self._on_page(source, page),
+            on_error=self._on_page_error,
+            key="pagina", owner=self
+        )
+
+    def _on_page(self, source, page):
+        self._page_task = None
+        if source is self.source:
+            source.add_page(page)
+        if self._wanted_offset is not None:
+            self.offset = self._wanted_offset
+        # Asks for the next page if the window is still not full
+        self.refresh()
+        self.event_generate("<<VirtualPageLoaded>>")
+
+    def _on_page_error(self, error):
+        # Not retried here: the next scroll or resize asks again
+        self._page_task = None
+        logger.error(f"Error cargando una página de la tabla: {error}")
+
+    def _update_scrollbar(self, total, visible):
+        if total <= 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        # If more pages can still be loaded, leave room so the user can keep scrolling
+        denom = total + (visible if self.source.has_more() else 0)
+        first = self.offset / denom
+        last = min((self.offset + visible) / denom, 1.0)
+        self.scrollbar.set(first, last)
+
+    # --- Scrolling ---
+    def scroll(self, delta):
+        self.offset = max(self.offset + delta, 0)
+        self.refresh()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            total = self.source.count() + (self._visible_count() if self.source.has_more() else 0)
+            self.offset = int(float(value) * total)
+            self.refresh()
+        elif action == "scroll":
+            step = int(value) * (self._visible_count() if unit == "pages" else 1)
+            self.scroll(step)
+
+    def _on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_arrow(self, direction):
+        selection = self.tree.selection()
+        if not selection or not self._slots:
+            return None
+        index = self._slots.index(selection[0]) if selection[0] in self._slots else 0
+        at_edge = (direction < 0 and index == 0) or (direction > 0 and index == len(self._slots) - 1)
+        if not at_edge:
+            return None  # let Tk move the selection inside the window
+        self.scroll(direction)
+        row = self._slot_rows.get(self._slots[index])
+        if row is not None and {self.key(row)} != self._selected:
+            self._selected = {self.key(row)}
+            self.refresh()
+            self.event_generate("<<VirtualSelect>>")
+        return "break"
+
+    def _on_tree_select(self, _event):
+        """Tracks the selection by row key and emits <<VirtualSelect>> when it really changes."""
+        if self._rendering:
+            return
+        visible_keys = {self.key(r) for r in self._slot_rows.values()}
+        selected = {self.key(self._slot_rows[s]) for s in self.tree.selection() if s in self._slot_rows}
+        if not selected:
+            # A selected row that scrolled out of the window stays selected
+            selected = {k for k in self._selected if k not in visible_keys}
+        if selected != self._selected:
+            self._selected = selected
+            self.event_generate("<<VirtualSelect>>")
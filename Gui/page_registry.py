@@ -0,0 +1,156 @@
+"""
+Registro de páginas del menú principal.
+
+Cada página se construye la primera vez que se visita y después se mantiene
+viva: al cambiar de página solo se hace ``pack_forget``/``pack``. Al volver a
+mostrarla se refrescan únicamente los datos que cambiaron mientras estaba
+oculta (ver Core.cambios). Cada vez que se muestra una página se consulta en
+segundo plano qué escribieron los otros terminales (Core.cambios.sincronizar);
+si tocaron algo que la página muestra, se refresca igual.
+
+Una página declara qué tablas muestra y cómo refrescarlas:
+
+    class ComprasFrame(ttk.Frame):
+        data_tables = ("compras",)
+
+        def refresh_stale(self, changed):
+            self.load_history()
+
+Las fábricas pueden ser una clase/callable o un texto ``"modulo:Clase"``; en
+ese caso el módulo se importa recién en la primera visita, así el arranque
+no paga el import de páginas (y backends) que todavía no se abrieron.
+
+``max_pages`` limita cuántas páginas ocultas se conservan (LRU); la menos
+usada se destruye y se vuelve a construir si se visita de nuevo.
+"""
+
+import importlib
+import time
+import tkinter as tk
+from collections import OrderedDict
+from Core.cambios import versiones, sincronizar
+from Core.logger import setup_logger
+from Gui.task_runner import get_task_runner
+
+logger = setup_logger("page_registry")
+
+
+class PageRegistry:
+    def __init__(self, container, factories, default_factory=None, max_pages=None):
+        """
+        :param container: frame where pages are packed.
+        :param factories: {page_name: callable(parent) -> page, or "module:Class"}.
+        :param default_factory: callable(parent, page_name) for names without a factory.
+        :param max_pages: maximum number of pages kept alive (None = all).
+        """
+        self.container = container
+        self.factories = factories
+        self.default_factory = default_factory
+        self.max_pages = max_pages
+        self._pages = OrderedDict()   # page_name -> page, least recently shown first
+        self._seen = {}               # page_name -> {tabla: version} when its data was loaded
+        self.current_name = None
+        self.on_timing = None         # optional callable(label, seconds), used by --profile-startup
+
+    @property
+    def current(self):
+        return self._pages.get(self.current_name)
+
+    def show(self, page_name):
+        """Shows ``page_name``, building it on first visit. Returns the page."""
+        if page_name == self.current_name:
+            return self.current
+
+        if self.current is not None:
+            self.current.pack_forget()
+
+        page = self._pages.get(page_name)
+        if page is None:
+            page = self._build(page_name)
+        else:
+            self._refresh_if_stale(page_name, page)
+        self._pages.move_to_end(page_name)
+        self.current_name = page_name
+        page.pack(fill=tk.BOTH, expand=True)
+        self._evict()
+        self._sincronizar()
+        return page
+
+    def _sincronizar(self):
+        """Picks up what other terminals wrote, then refreshes the visible page if it shows it."""
+        def refresh_current(_):
+            if self.current is not None:
+                self._refresh_if_stale(self.current_name, self.current)
+
+        get_task_runner(self.container).submit(
+            sincronizar, on_success=refresh_current,
+            on_error=lambda e: logger.warning(f"No se pudieron consultar los cambios de otros terminales: {e}"),
+            key="sincronizar", owner=self.container
+        )
+
+    def _resolve(self, page_name):
+        factory = self.factories.get(page_name)
+        if isinstance(factory, str):
+            module_name, class_name = factory.split(":")
+            start = time.perf_counter()
+            factory = getattr(importlib.import_module(module_name), class_name)
+            self._timing(f"import {module_name}", start)
+            self.factories[page_name] = factory
+        return factory
+
+    def _timing(self, label, start):
+        if self.on_timing is not None:
+            self.on_timing(label, time.perf_counter() - start)
+
+    def _build(self, page_name):
+        factory = self._resolve(page_name)
+        start = time.perf_counter()
+        # Snapshot before loading: a write that lands meanwhile leaves the page stale
+        seen = versiones(getattr(factory, "data_tables", ()))
+        if factory is not None:
+            page = factory(self.container)
+        else:
+            page = self.default_factory(self.container, page_name)
+        self._pages[page_name] = page
+        self._seen[page_name] = seen
+        self._timing(f"build {page_name}", start)
+        logger.info(f"Página '{page_name}' construida")
+        return page
+
+    def _refresh_if_stale(self, page_name, page):
+        tables = getattr(page, "data_tables", ())
+        if not tables:
+            return
+        current = versiones(tables)
+        seen = self._seen.get(page_name, {})
+        changed = {t for t in tables if current[t] != seen.get(t)}
+        if not changed:
+            return
+        self._seen[page_name] = current
+        logger.info(f"Refrescando '{page_name}': cambiaron {sorted(changed)}")
+        try:
+            page.refresh_stale(changed)
+        except Exception as e:
+            logger.error(f"Error refrescando la página '{page_name}': {e}")
+
+    def _evict(self):
+        if self.max_pages is None:
+            return
+        while len(self._pages) > self.max_pages:
+            name, page = next(iter(self._pages.items()))
+            if name == self.current_name:
+                break
+            self.discard(name)
+
+    def discard(self, page_name):
+        """Destroys a cached page; it is rebuilt on its next visit."""
+        page = self._pages.pop(page_name, None)
+        self._seen.pop(page_name, None)
+        if page is None:
+            return
+        if page_name == self.current_name:
+            self.current_name = None
+        # Its pending reads are discarded (writes still finish, see TaskRunner.submit)
+        get_task_runner(page).cancel_owner(page)
+        page.destroy()
+        logger.info(f"Página '{page_name}' descartada")
@@ -0,0 +1,252 @@
+"""
+Ejecutor de tareas en segundo plano para la interfaz Tk.
+
+Las llamadas a los backends (pymysql) corren en un pool de hilos y sus
+resultados vuelven al hilo de Tk mediante una cola que se revisa con
+``root.after``. Tk nunca se toca desde un hilo de trabajo.
+
+    runner = get_task_runner(self)
+    runner.submit(self.backend.get_cliente_stats, cliente_id,
+                  on_success=self.show_stats, key="stats", owner=self)
+
+Enviar una tarea con una ``key`` ya usada deja obsoleta a la anterior: su
+resultado se descarta aunque llegue más tarde. ``cancel_owner`` descarta
+todas las tareas de una página (p.ej. al cambiar de página).
+
+Las escrituras (registrar una venta, guardar una compra, producir) se envían
+con ``cancellable=False``: nunca se cancelan, ni al descartar su página ni al
+cerrar la aplicación (``shutdown`` espera a que terminen). Si su página ya no
+existe cuando terminan, el error se muestra en la ventana principal.
+"""
+
+import queue
+from tkinter import messagebox
+from concurrent.futures import ThreadPoolExecutor
+from Core.logger import setup_logger
+
+logger = setup_logger("task_runner")
+
+
+class Task:
+    def __init__(self, key, owner, cancellable=True, name=None):
+        self.key = key
+        self.owner = owner
+        self.cancellable = cancellable
+        self.name = name
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self):
+        if not self.cancellable:
+            return
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class TaskRunner:
+    def __init__(self, root, max_workers=4, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="backend")
+        self._results = queue.Queue()
+        self._latest = {}       # (owner id, key) -> Task
+        self._pending = set()
+        self._busy_widgets = {}  # Task -> widget disabled while it runs
+        self._closed = False
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, fn, *args, on_success=None, on_error=None, key=None, owner=None, busy_widget=None,
+               cancellable=True, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on the pool.
+
+        on_success(result) / on_error(exception) are called on the Tk thread,
+        unless the task was cancelled, superseded by a newer task with the same
+        key and owner, or its owner widget was destroyed in the meantime.
+        ``busy_widget`` is disabled while the task runs.
+
+        ``cancellable=False`` is for writes: the task always runs, and if its
+        owner is gone when it finishes the outcome is logged and errors are
+        shown on the root window instead of being dropped.
+        """
+        if not cancellable and key is not None:
+            raise ValueError("Una escritura no puede reemplazarse por key")
+        task = Task(key, owner, cancellable, getattr(fn, "__name__", repr(fn)))
+        if key is not None:
+            previous = self._latest.get((id(owner), key))
+            if previous is not None:
+                previous.cancel()
+            self._latest[(id(owner), key)] = task
+        self._pending.add(task)
+        if busy_widget is not None:
+            try:
+                busy_widget.config(state="disabled")
+                self._busy_widgets[task] = busy_widget
+            except Exception:
+                pass
+        self._update_cursor()
+
+        def run():
+            if task.cancelled:
+                self._results.put((task, None, None, None, None))
+                return
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._results.put((task, False, e, on_success, on_error))
+            else:
+                self._results.put((task, True, result, on_success, on_error))
+
+        task.future = self._executor.submit(run)
+        task.future.add_done_callback(lambda f: f.cancelled() and self._results.put((task, None, None, None, None)))
+        return task
+
+    def call_soon(self, fn, *args):
+        """Thread-safe: schedule fn(*args) on the Tk thread."""
+        self._results.put((None, True, args, fn, None))
+
+    def cancel(self, key, owner=None):
+        task = self._latest.pop((id(owner), key), None)
+        if task is not None:
+            task.cancel()
+
+    def cancel_owner(self, owner):
+        """
+        Discards every pending read submitted by ``owner`` or any widget inside it.
+        Writes (cancellable=False) keep running; see submit().
+        """
+        path = str(owner)
+
+        def owned(task):
+            return task.owner is not None and (str(task.owner) == path or str(task.owner).startswith(path + "."))
+
+        for task in list(self._pending):
+            if owned(task):
+                task.cancel()
+        for k in [k for k, t in self._latest.items() if owned(t)]:
+            del self._latest[k]
+
+    def shutdown(self):
+        """
+        Stops the runner on exit: pending reads are cancelled, pending writes
+        are waited for (the pool must still be open) and their outcome logged.
+        """
+        self._closed = True
+        for task in list(self._pending):
+            task.cancel()
+        writes = [t for t in self._pending if not t.cancellable]
+        if writes:
+            logger.info(f"Esperando {len(writes)} escritura(s) pendiente(s) antes de salir")
+        self._executor.shutdown(wait=True)
+        while True:
+            try:
+                task, ok, value, _, _ = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if task is not None and not task.cancellable:
+                self._log_outcome(task, ok, value)
+
+    def _update_cursor(self):
+        try:
+            self.root.config(cursor="watch" if self._pending else "")
+        except Exception:
+            pass
+
+    def _owner_alive(self, owner):
+        if owner is None:
+            return True
+        try:
+            return bool(owner.winfo_exists())
+        except Exception:
+            return False
+
+    def _poll(self):
+        if self._closed:
+            return
+        while True:
+            try:
+                task, ok, value, on_success, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if task is None:
+                # call_soon
+                self._safe_call(on_success, *value)
+                continue
+            self._finish(task)
+            if ok is None or task.cancelled:
+                continue
+            if not self._owner_alive(task.owner):
+                if not task.cancellable:
+                    self._report_orphan(task, ok, value)
+                continue
+            if ok:
+                if on_success:
+                    self._safe_call(on_success, value)
+            elif on_error:
+                self._safe_call(on_error, value)
+            else:
+                logger.error(f"Error en tarea de fondo: {value}")
+        self.root.after(self.poll_ms, self._poll)
+
+    def _finish(self, task):
+        self._pending.discard(task)
+        if task.key is not None and self._latest.get((id(task.owner), task.key)) is task:
+            del self._latest[(id(task.owner), task.key)]
+        widget = self._busy_widgets.pop(task, None)
+        if widget is not None:
+            try:
+                widget.config(state="normal")
+            except Exception:
+                pass
+        self._update_cursor()
+
+    @staticmethod
+    def _log_outcome(task, ok, value):
+        if ok:
+            logger.info(f"Escritura '{task.name}' completada")
+        else:
+            logger.error(f"Escritura '{task.name}' falló: {value}")
+
+    def _report_orphan(self, task, ok, value):
+        """Outcome of a write whose page was discarded while it ran."""
+        self._log_outcome(task, ok, value)
+        if not ok:
+            try:
+                messagebox.showerror("Error", f"No se pudo completar la operación ({task.name}): {value}", parent=self.root)
+            except Exception:
+                pass
+
+    def _safe_call(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"Error en callback de tarea: {e}")
+
+
+def listen(widget, subscribe, callback):
+    """
+    Connects a backend event source to a widget: ``subscribe(listener)`` must
+    return an unsubscribe function (e.g. InventarioBackend.subscribe).
+    callback(*args) runs on the Tk thread, and the subscription ends when
+    ``widget`` is destroyed.
+    """
+    runner = get_task_runner(widget)
+    unsubscribe = subscribe(lambda *args: runner.call_soon(callback, *args))
+
+    def on_destroy(event):
+        if event.widget is widget:
+            unsubscribe()
+
+    widget.bind("<Destroy>", on_destroy, add="+")
+    return unsubscribe
+
+
+def get_task_runner(widget):
+    """Returns the TaskRunner of the widget's root window, creating it on first use."""
+    root = widget._root()
+    runner = getattr(root, "task_runner", None)
+    if runner is None:
+        runner = TaskRunner(root)
+        root.task_runner = runner
+    return runner
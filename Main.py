@@ -1,14 +1,61 @@
+import sys
+import time
+
+_START = time.perf_counter()
+PROFILE_STARTUP = "--profile-startup" in sys.argv
+
 import tkinter as tk
 from tkinter import ttk, messagebox
 from Core.logger import setup_logger
-
-# Modulos
+from Gui.task_runner import get_task_runner
+from Gui.page_registry import PageRegistry
 from Gui.Pages.Styles.Main_styles import MainStyles
-from Gui.Pages.resumenes import ResumenesFrame
-from Gui.Pages.compras import ComprasFrame
-from Gui.Pages.produccion import ProduccionFrame
-from Gui.Pages.ventas import VentasFrame
-from Gui.Pages.Productos import ProductosFrame
+
+# Modulos: imported on first visit ("module:Class"), so startup only pays for the first page
+PAGES = {
+    "compras": "Gui.Pages.compras:ComprasFrame",
+    "resumenes": "Gui.Pages.resumenes:ResumenesFrame",
+    "produccion": "Gui.Pages.produccion:ProduccionFrame",
+    "productos": "Gui.Pages.Productos:ProductosFrame",
+    "ventas": "Gui.Pages.ventas:VentasFrame",
+}
+INITIAL_PAGE = "compras"
+
+# Pages kept alive at once (None = all); the least recently used one is rebuilt on demand
+MAX_CACHED_PAGES = None
+
+
+class StartupProfile:
+    """Collects the --profile-startup breakdown and prints it once the first page has data."""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.steps = []  # (label, seconds)
+
+    def step(self, label, seconds):
+        if self.enabled:
+            self.steps.append((label, seconds))
+
+    def mark(self, label):
+        """Records the time elapsed since the process started."""
+        self.step(f"@ {label}", time.perf_counter() - _START)
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("Startup profile (ms)")
+        for label, seconds in self.steps:
+            print(f"  {label:<45} {seconds * 1000:8.1f}")
+
+
+startup_profile = StartupProfile(PROFILE_STARTUP)
+startup_profile.mark("module imports")
+
+
+def _warm_pool():
+    # Runs on a worker thread: imports pymysql, opens the first connection and runs pending migrations
+    from Core.database import get_pool
+    get_pool()
 
 class MainInterface:
     def __init__(self, root):
@@ -17,6 +64,7 @@ class MainInterface:
         self.root.attributes("-fullscreen", True)
         self.styles = MainStyles(self.root)
         self.logger = setup_logger()
+        self.task_runner = get_task_runner(self.root)
 
         # Make menu extensible: List of (label, page_name) tuples
         self.menu_items = [
@@ -47,7 +95,12 @@ class MainInterface:
         self.current_page = None
         self.setup_ui()
         self.root.update()  # Force update to show the UI immediately
-        #self.show_page("compras")  # Load initial page after UI is set up
+        startup_profile.mark("first paint")
+
+        # Data comes after the window is on screen: warm the pool in the background
+        # and build the initial page on the next turn of the event loop
+        self.task_runner.submit(_warm_pool, on_error=lambda e: self.logger.error(f"No se pudo abrir la base de datos: {e}"))
+        self.root.after(0, self._show_initial_page)
 
         # Bind escape key to exit
         self.root.bind("<Escape>", self.confirm_exit)
@@ -98,52 +151,43 @@ class MainInterface:
             side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5, pady=5
         )
 
-        # Initial placeholder page
-        self.show_page("compras")
+        # Pages are built on first visit and kept alive afterwards
+        self.pages = PageRegistry(
+            self.content_frame,
+            dict(PAGES),
+            default_factory=self._placeholder_page,
+            max_pages=MAX_CACHED_PAGES,
+        )
+        self.pages.on_timing = startup_profile.step
 
-    def show_page(self, page_name):
-        # Clear current page
-        if self.current_page:
-            self.current_page.destroy()
-
-        if page_name == "compras":
-            
-            self.current_page = ComprasFrame(self.content_frame)
-            self.current_page.pack(fill=tk.BOTH, expand=True)
-
-        elif page_name == "resumenes":
-            
-            self.current_page = ResumenesFrame(self.content_frame)
-            self.current_page.pack(fill=tk.BOTH, expand=True)
-
-        elif page_name == "produccion":
-            self.current_page = ProduccionFrame(self.content_frame)
-            self.current_page.pack(fill=tk.BOTH, expand=True)
-
-        elif page_name == "productos":
-            self.current_page = ProductosFrame(self.content_frame)
-            self.current_page.pack(fill=tk.BOTH, expand=True)
-            
-        elif page_name == "ventas":
-            self.current_page = VentasFrame(self.content_frame)
-            self.current_page.pack(fill=tk.BOTH, expand=True)
+    def _show_initial_page(self):
+        if startup_profile.enabled:
+            # The page's data arrives later, from a worker: its first table page marks the end
+            self._startup_binding = self.root.bind("<<VirtualPageLoaded>>", self._startup_done, add="+")
+        self.show_page(INITIAL_PAGE)
+        startup_profile.mark(f"{INITIAL_PAGE} shown")
 
-        else:
-            # Create new page frame
-            self.current_page = ttk.Frame(self.content_frame)
-            self.current_page.pack(fill=tk.BOTH, expand=True)
-
-            # Placeholder label for the page
-            placeholder_label = ttk.Label(
-                self.current_page,
-                text=f"Página: {page_name.title()}\n(Placeholder - Contenido a desarrollar)",
-                font=("Arial", 12),
-                justify=tk.CENTER,
-            )
-            placeholder_label.pack(expand=True)
+    def _startup_done(self, event=None):
+        self.root.unbind("<<VirtualPageLoaded>>", self._startup_binding)
+        startup_profile.mark("first data loaded")
+        startup_profile.report()
 
+    def show_page(self, page_name):
+        self.pages.show(page_name)
+        self.current_page = self.pages.current
         self.logger.info(f"Navegando a página: {page_name}")
-        # Here, in future, load actual content from modules (e.g., Gui/pages/resumenes.py)
+
+    def _placeholder_page(self, parent, page_name):
+        page = ttk.Frame(parent)
+        # Placeholder label for the page
+        placeholder_label = ttk.Label(
+            page,
+            text=f"Página: {page_name.title()}\n(Placeholder - Contenido a desarrollar)",
+            font=("Arial", 12),
+            justify=tk.CENTER,
+        )
+        placeholder_label.pack(expand=True)
+        return page
 
     def confirm_exit(self, event=None):
         # Confirm exit with a dialog
@@ -160,6 +204,9 @@ def run_gui():
     root = tk.Tk()
     app = MainInterface(root)
     root.mainloop()
+    app.task_runner.shutdown()
+    from Core.database import close_pool
+    close_pool()
     # Log app exit
     app.logger.info("Aplicación cerrada")
 
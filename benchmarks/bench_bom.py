@@ -0,0 +1,148 @@
+# benchmarks/bench_bom.py
+"""
+Motor de recetas anidadas (Core.bom) sobre un catálogo sintético.
+
+    python -m benchmarks.bench_bom                      # 5.000 recetas
+    python -m benchmarks.bench_bom --recetas 20000 --materias 1000
+
+Mide, en memoria (no usa la base de datos): cargar el grafo, repreciar todo
+el catálogo, el recálculo incremental tras cambiar el costo de una materia
+prima (solo el subárbol invalidado) y la explosión a materias primas de la
+receta más profunda. También la capacidad de producción de todo el catálogo
+(Core.capacidad_backend) con un stock al azar: armar las necesidades por
+lote y la pasada completa con la matriz de enteros (NumPy) y con Decimal
+receta por receta. Al final compara el incremental con un repreciado
+completo, y las dos pasadas de capacidad, para verificar que dan lo mismo.
+"""
+
+import argparse
+import random
+import time
+from decimal import Decimal
+from Core.bom import BomEngine
+from Core.capacidad_backend import CapacidadBackend
+
+
+class Capacidad(CapacidadBackend):
+    """CapacidadBackend over the benchmark's graph instead of services.produccion."""
+
+    def __init__(self, bom):
+        super().__init__()
+        self._bom = bom
+
+    @property
+    def bom(self):
+        return self._bom
+
+
+def catalogo(n_recetas, n_materias, max_lineas):
+    """
+    [(id, nombre, ingredientes, rendimiento, unidad)] where each recipe only
+    uses raw materials and recipes with a lower id (so the graph is a DAG),
+    with a bias towards recent ones to get deep chains.
+    """
+    recetas = []
+    for receta_id in range(1, n_recetas + 1):
+        lineas = []
+        for _ in range(random.randint(2, max_lineas)):
+            if receta_id > 1 and random.random() < 0.4:
+                hija = random.randint(max(1, receta_id - 200), receta_id - 1)
+                lineas.append({'subproducto_id': hija, 'cantidad': random.randint(50, 400), 'unidad': 'g'})
+            else:
+                lineas.append({'producto': f"Materia {random.randrange(n_materias)}",
+                               'cantidad': random.randint(10, 500), 'unidad': 'g'})
+        recetas.append((receta_id, f"Receta {receta_id}", lineas, random.randint(500, 2000), 'g'))
+    return recetas
+
+
+def cronometrar(fn):
+    inicio = time.perf_counter()
+    resultado = fn()
+    return time.perf_counter() - inicio, resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_bom")
+    parser.add_argument("--recetas", type=int, default=5_000)
+    parser.add_argument("--materias", type=int, default=500)
+    parser.add_argument("--lineas", type=int, default=8, help="Máximo de ingredientes por receta")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args(argv)
+    random.seed(args.semilla)
+
+    recetas = catalogo(args.recetas, args.materias, args.lineas)
+    costos = {f"Materia {i}": (random.uniform(0.01, 0.5), 'g') for i in range(args.materias)}
+    bom = BomEngine()
+
+    def cargar():
+        for receta_id, nombre, ingredientes, rendimiento, unidad in recetas:
+            bom.set_receta(receta_id, nombre, ingredientes, rendimiento, unidad)
+        bom.set_costos_materia(costos)
+
+    resultados = []
+    t, _ = cronometrar(cargar)
+    resultados.append(("Cargar grafo y costos", t, f"{args.recetas:,} recetas"))
+
+    t, todo = cronometrar(bom.repreciar_todo)
+    resultados.append(("Repreciar catálogo completo", t, f"{len(todo):,} recetas"))
+
+    t, _ = cronometrar(bom.repreciar_todo)
+    resultados.append(("Repreciar catálogo (2da vez)", t, ""))
+
+    # The most used raw material invalidates the biggest subtree
+    usos = {}
+    for _, _, ingredientes, _, _ in recetas:
+        for ing in ingredientes:
+            if 'producto' in ing:
+                usos[ing['producto']] = usos.get(ing['producto'], 0) + 1
+    materia = max(usos, key=usos.get)
+    costo, unidad = costos[materia]
+
+    t, invalidadas = cronometrar(lambda: bom.set_costos_materia({materia: (costo * 1.1, unidad)}))
+    resultados.append(("Invalidar subárbol de una materia", t, f"{len(invalidadas):,} recetas afectadas"))
+
+    t, incremental = cronometrar(lambda: {r: bom.costo_lote(r) for r in invalidadas})
+    resultados.append(("Recalcular solo las invalidadas", t, ""))
+
+    t, _ = cronometrar(lambda: bom.costo_lote(args.recetas))
+    resultados.append(("Costo de una receta (memo)", t, ""))
+
+    def mas_profunda():
+        profundidad = {}
+        for receta_id in bom.orden_topologico():
+            hijas = [ing['subproducto_id'] for ing in recetas[receta_id - 1][2] if 'subproducto_id' in ing]
+            profundidad[receta_id] = 1 + max((profundidad[h] for h in hijas), default=0)
+        return max(profundidad.items(), key=lambda kv: kv[1])
+
+    receta_profunda, niveles = mas_profunda()
+    t, materias = cronometrar(lambda: bom.explotar_receta(receta_profunda, 10))
+    resultados.append(("Explotar la receta más profunda x10", t, f"{niveles} niveles, {len(materias)} materias"))
+
+    capacidad = Capacidad(bom)
+    existencias = {f"Materia {i}": (Decimal(random.randint(0, 10 ** 9)) / 10 ** 4, 'g') for i in range(args.materias)}
+    t, _ = cronometrar(capacidad._construir)
+    celdas = sum(len(n) for n in capacidad._necesidades.values())
+    resultados.append(("Capacidad: armar necesidades", t, f"{celdas:,} receta x materia"))
+    if capacidad._matriz is not None:
+        t, por_matriz = cronometrar(lambda: capacidad._calcular_matriz(existencias))
+        resultados.append(("Capacidad completa (matriz)", t, ""))
+    else:
+        por_matriz = None
+        resultados.append(("Capacidad completa (matriz)", float('nan'), "sin NumPy"))
+    t, por_decimal = cronometrar(lambda: {r: capacidad._calcular_receta(r, existencias) for r in capacidad._recetas})
+    resultados.append(("Capacidad completa (Decimal)", t, ""))
+
+    print(f"{'Operación':<40}{'seg':>10}")
+    for descripcion, segundos, nota in resultados:
+        print(f"{descripcion:<40}{segundos:>10.4f}  {nota}")
+
+    completo = bom.repreciar_todo()
+    distintas = [r for r, c in incremental.items() if c != completo[r]]
+    print(f"\nIncremental vs. completo: {'iguales' if not distintas else f'{len(distintas)} diferencias'}")
+    if por_matriz is not None:
+        distintas = [r for r in por_decimal if por_matriz[r] != por_decimal[r]]
+        print(f"Capacidad matriz vs. Decimal: {'iguales' if not distintas else f'{len(distintas)} diferencias'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# benchmarks/bench_contabilidad.py
+"""
+Indicadores de la pestaña de Contabilidad sobre un libro sintético.
+
+    python -m benchmarks.bench_contabilidad                 # 1M movimientos
+    python -m benchmarks.bench_contabilidad --filas 5000000 --conservar
+
+Arma `bench_movimientos` con el mismo esquema e índices que `movimientos`
+(migración 7), repartidos en los últimos --anios años, y mide la consulta de
+ContabilidadBackend.get_indicadores para cada período del selector de la
+pestaña. El objetivo es que cada uno tarde bastante menos de un segundo.
+
+Imprime la versión del servidor y, por período, el índice que elige
+EXPLAIN (y si la consulta lo cubre), así una corrida guardada se explica sola.
+
+Usa la base configurada en Core.database y solo toca `bench_movimientos`,
+que se borra al terminar salvo con --conservar.
+"""
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from Core.database import get_connection
+from Core.contabilidad_backend import ContabilidadBackend, COMPRA, VENTA, PRODUCCION
+
+LOTE = 10_000
+OBJETIVO = 1.0  # segundos
+
+ESQUEMA = [
+    "DROP TABLE IF EXISTS bench_movimientos",
+    """
+    CREATE TABLE bench_movimientos (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        tipo VARCHAR(20) NOT NULL,
+        descripcion VARCHAR(255) NOT NULL,
+        monto DECIMAL(14,2) NOT NULL,
+        INDEX idx_movimientos_fecha (fecha, id),
+        INDEX idx_movimientos_fecha_tipo (fecha, tipo, monto),
+        INDEX idx_movimientos_tipo_fecha (tipo, fecha, id)
+    )
+    """,
+]
+
+
+def periodos(hoy):
+    """Same ranges as ContabilidadTab._rango_periodo."""
+    return [
+        ("Este mes", hoy.replace(day=1), hoy),
+        ("Últimos 30 días", hoy - timedelta(days=29), hoy),
+        ("Este año", hoy.replace(month=1, day=1), hoy),
+        ("Todo", None, None),
+    ]
+
+
+def poblar(conn, filas, anios):
+    random.seed(42)
+    fin = datetime.now()
+    minutos = anios * 365 * 24 * 60
+    with conn.cursor() as cursor:
+        for sql in ESQUEMA:
+            cursor.execute(sql)
+        for desde in range(0, filas, LOTE):
+            lote = []
+            for _ in range(min(LOTE, filas - desde)):
+                tipo = random.choices((VENTA, COMPRA, PRODUCCION), weights=(5, 3, 2))[0]
+                fecha = fin - timedelta(minutes=random.randint(0, minutos))
+                lote.append((fecha, tipo, f"Movimiento {tipo}", round(random.uniform(1, 500), 2)))
+            cursor.executemany(
+                "INSERT INTO bench_movimientos (fecha, tipo, descripcion, monto) VALUES (%s, %s, %s, %s)", lote
+            )
+            conn.commit()
+        cursor.execute("ANALYZE TABLE bench_movimientos")
+        cursor.fetchall()
+
+
+def consulta(desde, hasta):
+    """The indicators query of ContabilidadBackend over bench_movimientos, and its params."""
+    condiciones, params = ContabilidadBackend._rango(desde, hasta)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    sql = ContabilidadBackend._INDICADORES_SQL.replace("FROM movimientos", "FROM bench_movimientos").format(where=where)
+    return sql, [VENTA, COMPRA, PRODUCCION] + params
+
+
+def medir(cursor, desde, hasta, repeticiones):
+    sql, params = consulta(desde, hasta)
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor
+
+
+def servidor(cursor):
+    cursor.execute("SELECT VERSION() AS version")
+    return cursor.fetchone()['version']
+
+
+def plan(cursor, desde, hasta):
+    """Index chosen by EXPLAIN (ALL = full scan), plus ' (cubre)' when no table rows are read."""
+    sql, params = consulta(desde, hasta)
+    cursor.execute(f"EXPLAIN {sql}", params)
+    fila = cursor.fetchone()
+    cubre = " (cubre)" if "Using index" in (fila['Extra'] or "") else ""
+    return f"{fila['key'] or 'ALL'}{cubre}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_contabilidad")
+    parser.add_argument("--filas", type=int, default=1_000_000, help="Movimientos sintéticos")
+    parser.add_argument("--anios", type=int, default=5, help="Años de historia que cubren")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Se informa el mejor tiempo")
+    parser.add_argument("--conservar", action="store_true", help="No borrar bench_movimientos")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    if conn is None:
+        raise SystemExit("Sin conexión a MariaDB (ver Core.database.get_connection)")
+    try:
+        with conn.cursor() as cursor:
+            print(f"Servidor {servidor(cursor)}")
+        inicio = time.perf_counter()
+        poblar(conn, args.filas, args.anios)
+        print(f"{args.filas:,} movimientos en {args.anios} años generados en {time.perf_counter() - inicio:.1f}s\n")
+
+        print(f"{'Indicadores del período':<30}{'seg':>10}  {'estado':<14}plan")
+        with conn.cursor() as cursor:
+            for nombre, desde, hasta in periodos(date.today()):
+                segundos = medir(cursor, desde, hasta, args.repeticiones)
+                estado = "ok" if segundos < OBJETIVO else f"supera {OBJETIVO:g}s"
+                print(f"{nombre:<30}{segundos:>10.4f}  {estado:<14}{plan(cursor, desde, hasta)}")
+    finally:
+        if not args.conservar:
+            with conn.cursor() as cursor:
+                cursor.execute(ESQUEMA[0])
+            conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_money.py
+"""
+Agregado de ContabilidadTab.load_contabilidad: float vs. Decimal.
+
+    python -m benchmarks.bench_money                    # 50.000 productos
+    python -m benchmarks.bench_money --productos 200000
+
+Arma filas de inventario como las devuelve pymysql (DECIMAL -> Decimal) y
+mide, en memoria (no usa la base de datos), el paso que hace la pestaña con
+ellas: formatear cada fila (InventarioBackend._formatear) y sumar el valor
+invertido. "antes" es el camino anterior, que pasaba cada valor por float y
+luego por Decimal(str(...)) para sumarlo; "ahora" es el actual, sin
+conversiones por fila. También compara cada total con la suma exacta de
+los valores que muestra la tabla (cada fila redondeada al centavo).
+"""
+
+import argparse
+import random
+import time
+from decimal import Decimal
+from Core.inventario_backend import InventarioBackend
+from Core.money import ZERO, money
+
+
+def filas(n):
+    unidades = ['g', 'ml', 'unit']
+    return [
+        {
+            'producto': f"Producto {i:06d}",
+            'cantidad_stock': Decimal(random.randint(1, 5_000_000)) / 100,
+            'unidad_base': random.choice(unidades),
+            'costo_promedio_ponderado': Decimal(random.randint(1, 500_000)) / 10_000,
+        }
+        for i in range(n)
+    ]
+
+
+def antes(items):
+    """Float pipeline before Core.money (formatting + Decimal(str()) sum)."""
+    resultado = []
+    for item in items:
+        cantidad_base = float(item['cantidad_stock'])
+        costo_por_base = float(item['costo_promedio_ponderado'])
+        display_cantidad, display_unidad = cantidad_base, item['unidad_base']
+        if display_unidad in ('g', 'ml') and cantidad_base >= 1000:
+            display_cantidad = cantidad_base / 1000
+            display_unidad = 'kg' if display_unidad == 'g' else 'l'
+        resultado.append({
+            "producto": item['producto'],
+            "cantidad_display": f"{display_cantidad:.2f}",
+            "unidad_display": display_unidad,
+            "costo_promedio_display": f"${costo_por_base:.4f}",
+            "total_valor": cantidad_base * costo_por_base,
+        })
+    total = Decimal(0)
+    for item in resultado:
+        total += Decimal(str(item['total_valor']))
+    return total
+
+
+def ahora(items):
+    """Current path: Decimal rows formatted as-is and summed without conversions."""
+    resultado = [InventarioBackend._formatear(item) for item in items]
+    return sum((item['total_valor'] for item in resultado), ZERO)
+
+
+def medir(fn, items, repeticiones):
+    mejor, total = None, None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        total = fn(items)
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_money")
+    parser.add_argument("--productos", type=int, default=50_000)
+    parser.add_argument("--repeticiones", type=int, default=5, help="Se informa el mejor tiempo")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args(argv)
+    random.seed(args.semilla)
+
+    items = filas(args.productos)
+    # What the table shows: each row's value to the cent, added up
+    exacto = sum((money(item['cantidad_stock'] * item['costo_promedio_ponderado']) for item in items), ZERO)
+
+    print(f"{'Formatear y sumar':<22}{'seg':>10}{'total':>22}{'error':>12}")
+    for nombre, fn in (("antes (float)", antes), ("ahora (Decimal)", ahora)):
+        segundos, total = medir(fn, items, args.repeticiones)
+        print(f"{nombre:<22}{segundos:>10.4f}{total:>22.4f}{total - exacto:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# benchmarks/bench_productos_fk.py
+"""
+Antes/después de la tabla maestra de productos (migraciones 10-13).
+
+Arma dos copias sintéticas de `compras` con los mismos datos: el esquema
+viejo (nombre VARCHAR + cantidad VARCHAR) y el nuevo (producto_id INT +
+cantidad DECIMAL), más su `inventario`, y mide las consultas que cambiaron.
+
+    python -m benchmarks.bench_productos_fk                 # 1M filas
+    python -m benchmarks.bench_productos_fk --filas 200000 --conservar
+
+Imprime la versión del servidor y, por consulta, el índice que usa cada
+tabla según EXPLAIN, así una corrida guardada se explica sola.
+
+Usa la base configurada en Core.database y solo toca tablas `bench_*`,
+que se borran al terminar salvo con --conservar.
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from Core.database import get_connection
+
+LOTE = 10_000
+
+ESQUEMA = [
+    "DROP TABLE IF EXISTS bench_compras_texto, bench_inventario_texto, bench_compras_id, bench_inventario_id, bench_productos",
+    """
+    CREATE TABLE bench_compras_texto (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        producto VARCHAR(255) NOT NULL,
+        cantidad VARCHAR(255) NOT NULL,
+        unidad VARCHAR(255) NOT NULL,
+        precio_total DECIMAL(10,2) NOT NULL,
+        proveedor VARCHAR(255) NOT NULL,
+        fecha TIMESTAMP NOT NULL,
+        INDEX (fecha, id),
+        INDEX (producto, fecha, id)
+    )
+    """,
+    """
+    CREATE TABLE bench_inventario_texto (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        producto VARCHAR(100) UNIQUE NOT NULL,
+        cantidad_stock DECIMAL(15,4) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE bench_productos (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        UNIQUE KEY (nombre)
+    )
+    """,
+    """
+    CREATE TABLE bench_compras_id (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        producto_id INT NOT NULL,
+        cantidad DECIMAL(15,4) NOT NULL,
+        unidad VARCHAR(255) NOT NULL,
+        precio_total DECIMAL(10,2) NOT NULL,
+        proveedor VARCHAR(255) NOT NULL,
+        fecha TIMESTAMP NOT NULL,
+        INDEX (fecha, id),
+        INDEX (producto_id, fecha, id)
+    )
+    """,
+    """
+    CREATE TABLE bench_inventario_id (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        producto_id INT UNIQUE NOT NULL,
+        cantidad_stock DECIMAL(15,4) NOT NULL
+    )
+    """,
+]
+
+# (descripcion, consulta esquema viejo, consulta esquema nuevo); %s = producto
+CONSULTAS = [
+    (
+        "Historial de un producto (100 filas)",
+        """SELECT id, producto, cantidad, precio_total, fecha FROM bench_compras_texto
+           WHERE producto = %s ORDER BY fecha DESC, id DESC LIMIT 100""",
+        """SELECT c.id, p.nombre, c.cantidad, c.precio_total, c.fecha FROM bench_compras_id c
+           JOIN bench_productos p ON p.id = c.producto_id
+           WHERE c.producto_id = (SELECT id FROM bench_productos WHERE nombre = %s)
+           ORDER BY c.fecha DESC, c.id DESC LIMIT 100""",
+    ),
+    (
+        "Cantidad comprada por producto",
+        "SELECT producto, SUM(CAST(cantidad AS DECIMAL(15,4))) AS total FROM bench_compras_texto GROUP BY producto",
+        """SELECT p.nombre, t.total FROM (
+               SELECT producto_id, SUM(cantidad) AS total FROM bench_compras_id GROUP BY producto_id
+           ) t JOIN bench_productos p ON p.id = t.producto_id""",
+    ),
+    (
+        "Gasto por producto en inventario (join)",
+        """SELECT i.producto, SUM(c.precio_total) FROM bench_inventario_texto i
+           JOIN bench_compras_texto c ON c.producto = i.producto GROUP BY i.producto""",
+        """SELECT p.nombre, SUM(c.precio_total) FROM bench_inventario_id i
+           JOIN bench_compras_id c ON c.producto_id = i.producto_id
+           JOIN bench_productos p ON p.id = i.producto_id GROUP BY i.producto_id, p.nombre""",
+    ),
+]
+
+
+def _nombres(n):
+    palabras = ["harina", "azúcar", "mantequilla", "chocolate", "vainilla", "fresa", "leche", "crema"]
+    return [f"{random.choice(palabras).title()} {random.choice(palabras)} proveedor {i:05d}" for i in range(n)]
+
+
+def poblar(conn, filas, productos):
+    random.seed(42)
+    nombres = _nombres(productos)
+    inicio = datetime(2020, 1, 1)
+    with conn.cursor() as cursor:
+        for sql in ESQUEMA:
+            cursor.execute(sql)
+        cursor.executemany("INSERT INTO bench_productos (nombre) VALUES (%s)", [(n,) for n in nombres])
+        cursor.execute("SELECT id, nombre FROM bench_productos")
+        ids = {r['nombre']: r['id'] for r in cursor.fetchall()}
+        stock = [(n, random.randint(0, 5000)) for n in nombres]
+        cursor.executemany("INSERT INTO bench_inventario_texto (producto, cantidad_stock) VALUES (%s, %s)", stock)
+        cursor.executemany("INSERT INTO bench_inventario_id (producto_id, cantidad_stock) VALUES (%s, %s)",
+                           [(ids[n], s) for n, s in stock])
+        conn.commit()
+
+        for desde in range(0, filas, LOTE):
+            lote = []
+            for _ in range(min(LOTE, filas - desde)):
+                nombre = random.choice(nombres)
+                cantidad = round(random.uniform(0.5, 50), 2)
+                fecha = inicio + timedelta(minutes=random.randint(0, 5 * 365 * 24 * 60))
+                lote.append((nombre, cantidad, "kg", round(cantidad * 3.5, 2), f"Proveedor {random.randint(1, 40)}", fecha))
+            cursor.executemany(
+                "INSERT INTO bench_compras_texto (producto, cantidad, unidad, precio_total, proveedor, fecha) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [(n, str(c), u, t, p, f) for n, c, u, t, p, f in lote]
+            )
+            cursor.executemany(
+                "INSERT INTO bench_compras_id (producto_id, cantidad, unidad, precio_total, proveedor, fecha) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [(ids[n], c, u, t, p, f) for n, c, u, t, p, f in lote]
+            )
+            conn.commit()
+        cursor.execute("ANALYZE TABLE bench_compras_texto, bench_compras_id, bench_productos")
+        cursor.fetchall()
+    return nombres
+
+
+def medir(cursor, sql, params, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor
+
+
+def servidor(cursor):
+    cursor.execute("SELECT VERSION() AS version")
+    return cursor.fetchone()['version']
+
+
+def plan(cursor, sql, params):
+    """'tabla:índice' for every table of the EXPLAIN output (ALL = full scan)."""
+    cursor.execute(f"EXPLAIN {sql}", params)
+    return ", ".join(f"{r['table']}:{r['key'] or 'ALL'}" for r in cursor.fetchall())
+
+
+def tamanos(cursor):
+    cursor.execute("""
+        SELECT TABLE_NAME AS tabla, DATA_LENGTH AS datos, INDEX_LENGTH AS indices
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ('bench_compras_texto', 'bench_compras_id')
+    """)
+    return {r['tabla']: r for r in cursor.fetchall()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_productos_fk")
+    parser.add_argument("--filas", type=int, default=1_000_000, help="Filas de compras sintéticas")
+    parser.add_argument("--productos", type=int, default=2_000)
+    parser.add_argument("--repeticiones", type=int, default=5, help="Se informa el mejor tiempo")
+    parser.add_argument("--conservar", action="store_true", help="No borrar las tablas bench_*")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    if conn is None:
+        raise SystemExit("Sin conexión a MariaDB (ver Core.database.get_connection)")
+    try:
+        with conn.cursor() as cursor:
+            print(f"Servidor {servidor(cursor)}")
+        inicio = time.perf_counter()
+        nombres = poblar(conn, args.filas, args.productos)
+        print(f"{args.filas:,} compras / {args.productos:,} productos generados en {time.perf_counter() - inicio:.1f}s\n")
+
+        with conn.cursor() as cursor:
+            producto = nombres[len(nombres) // 2]
+            print(f"{'Consulta':<42}{'texto (s)':>12}{'id (s)':>12}{'x':>8}")
+            for descripcion, viejo, nuevo in CONSULTAS:
+                params = (producto,) if "%s" in viejo else ()
+                antes = medir(cursor, viejo, params, args.repeticiones)
+                despues = medir(cursor, nuevo, params, args.repeticiones)
+                print(f"{descripcion:<42}{antes:>12.4f}{despues:>12.4f}{antes / despues:>8.1f}")
+
+            print("\nPlanes (EXPLAIN)")
+            for descripcion, viejo, nuevo in CONSULTAS:
+                params = (producto,) if "%s" in viejo else ()
+                print(f"  {descripcion}\n    texto: {plan(cursor, viejo, params)}\n    id:    {plan(cursor, nuevo, params)}")
+
+            print()
+            for tabla, r in sorted(tamanos(cursor).items()):
+                print(f"{tabla:<24} datos {r['datos'] / 2**20:>8.1f} MiB   índices {r['indices'] / 2**20:>8.1f} MiB")
+    finally:
+        if not args.conservar:
+            with conn.cursor() as cursor:
+                cursor.execute(ESQUEMA[0])
+            conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# tests/test_capacidad.py
+"""
+La pasada vectorizada de CapacidadBackend (matriz de enteros, NumPy) contra
+el cálculo receta por receta con Decimal: mismos lotes y mismo cuello de
+botella. Todo en memoria, con un BomEngine propio; se salta sin NumPy.
+
+    python -m pytest -q tests/test_capacidad.py
+"""
+
+import random
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from Core.bom import BomEngine
+from Core.capacidad_backend import CapacidadBackend
+
+
+class _Capacidad(CapacidadBackend):
+    """CapacidadBackend over a given recipe graph instead of services.produccion."""
+
+    def __init__(self, bom):
+        super().__init__()
+        self._bom = bom
+
+    @property
+    def bom(self):
+        return self._bom
+
+
+def _catalogo(n_recetas, n_materias):
+    bom = BomEngine()
+    for receta_id in range(1, n_recetas + 1):
+        lineas = []
+        for _ in range(random.randint(1, 6)):
+            if receta_id > 1 and random.random() < 0.4:
+                lineas.append({'subproducto_id': random.randint(1, receta_id - 1),
+                               'cantidad': random.randint(1, 300), 'unidad': 'g'})
+            else:
+                lineas.append({'producto': f"Materia {random.randrange(n_materias)}",
+                               'cantidad': Decimal(random.randint(1, 5000)) / 10, 'unidad': 'g'})
+        # Yields like 3 or 7 give needs with more decimals than the stock has
+        bom.set_receta(receta_id, f"Receta {receta_id}", lineas, random.choice([1, 3, 7, 250, 1000]), 'g')
+    return bom
+
+
+def _existencias(capacidad, n_materias):
+    existencias = {}
+    necesidades = [n for por_lote in capacidad._necesidades.values() for n in por_lote.items()]
+    for i in range(n_materias):
+        producto = f"Materia {i}"
+        # Exact multiples of some need, so many cells land on a batch boundary,
+        # within what cantidad_stock DECIMAL(15,4) can hold
+        _, (necesario, _) = random.choice(necesidades)
+        cantidad = (necesario * random.randint(0, 50)).quantize(Decimal("0.0001"))
+        if random.random() < 0.7 or cantidad >= 10 ** 11:
+            cantidad = Decimal(random.randint(0, 10 ** 8)) / 10 ** 4
+        existencias[producto] = (cantidad, 'g')
+    existencias["Materia 0"] = (Decimal(5), 'kg')  # unit mismatch counts as no stock
+    return existencias
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_matriz_igual_a_decimal(semilla):
+    random.seed(semilla)
+    capacidad = _Capacidad(_catalogo(300, 40))
+    capacidad._construir()
+    assert capacidad._matriz is not None
+    for _ in range(5):
+        existencias = _existencias(capacidad, 40)
+        esperado = {r: capacidad._calcular_receta(r, existencias) for r in capacidad._recetas}
+        assert capacidad._calcular_matriz(existencias) == esperado
+
+
+def test_necesidad_periodica_es_exacta():
+    # 1 g of a recipe that yields 3 g from 1 g of flour needs 0.333... g of flour per
+    # batch: 1 g of stock is 3 batches (3 x 0.333... <= 1), not the 2 a rounded-up need gives
+    bom = BomEngine()
+    bom.set_receta(1, "Masa", [{'producto': "Harina", 'cantidad': 1, 'unidad': 'g'}], 3, 'g')
+    bom.set_receta(2, "Tercio", [{'subproducto_id': 1, 'cantidad': 1, 'unidad': 'g'}], 1, 'g')
+    capacidad = _Capacidad(bom)
+    capacidad._construir()
+    existencias = {"Harina": (Decimal("1.0000"), 'g')}
+    assert capacidad._calcular_matriz(existencias)[2]['max_lotes'] == 3
+    assert capacidad._calcular_receta(2, existencias)['max_lotes'] == 3
@@ -0,0 +1,175 @@
+# tests/test_compras_concurrencia.py
+"""
+Compras concurrentes contra MariaDB.
+
+El stock y el costo promedio se actualizan con un solo upsert (ver
+InventarioBackend._UPSERT_STOCK_SQL) y es el bloqueo de fila de InnoDB el que
+serializa las compras del mismo producto, así que esto no se puede probar con
+un doble en memoria: usa la base configurada en Core.database y se salta si
+no hay pymysql o no hay conexión. Solo toca productos "Stress <hex>" propios,
+que se borran al terminar.
+
+    python -m pytest -q tests/test_compras_concurrencia.py
+"""
+
+import csv
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("pymysql")
+
+from Core import database
+from Core.importador_compras import ImportadorCompras
+from Core.money import money
+from Core.services import services
+
+HILOS = 12
+COMPRAS = 200
+PROVEEDOR = "Proveedor stress"
+
+
+@pytest.fixture
+def productos():
+    conn = database.get_connection()
+    if conn is None:
+        pytest.skip("Sin conexión a MariaDB (ver Core.database.get_connection)")
+    conn.close()
+    database.get_pool()  # migraciones, antes de largar los hilos
+
+    prefijo = f"Stress {uuid.uuid4().hex[:8]}"
+    yield prefijo
+
+    with database.db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM productos WHERE nombre LIKE %s", (prefijo + "%",))
+            ids = [r['id'] for r in cursor.fetchall()]
+            if ids:
+                placeholders = ", ".join(["%s"] * len(ids))
+                cursor.execute(f"DELETE FROM compras WHERE producto_id IN ({placeholders})", ids)
+                cursor.execute(f"DELETE FROM inventario WHERE producto_id IN ({placeholders})", ids)
+                cursor.execute(f"DELETE FROM productos WHERE id IN ({placeholders})", ids)
+            cursor.execute("DELETE FROM movimientos WHERE descripcion LIKE %s", (prefijo + "%",))
+
+
+def _inventario(nombre):
+    with database.db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT i.cantidad_stock, i.costo_promedio_ponderado
+                FROM inventario i JOIN productos p ON p.id = i.producto_id
+                WHERE p.nombre = %s
+            """, (nombre,))
+            return cursor.fetchone()
+
+
+def _compras(nombre):
+    with database.db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT COUNT(*) AS n, SUM(c.cantidad) AS cantidad
+                FROM compras c JOIN productos p ON p.id = c.producto_id
+                WHERE p.nombre = %s
+            """, (nombre,))
+            return cursor.fetchone()
+
+
+def _en_paralelo(fn, trabajos):
+    with ThreadPoolExecutor(max_workers=HILOS) as pool:
+        for futuro in [pool.submit(fn, t) for t in trabajos]:
+            futuro.result()  # re-raises deadlocks / lock timeouts
+
+
+def test_mismo_costo_stock_y_costo_exactos(productos):
+    """Every purchase at the same unit cost: the average must stay exactly that cost."""
+    nombre = f"{productos} harina"
+    services.compras.save_purchase("granel", nombre, PROVEEDOR, cantidad=1, unidad="kg", precio_compra="3.20")
+    cantidades = [random.randint(1, 25) for _ in range(COMPRAS)]
+
+    _en_paralelo(
+        lambda kg: services.inventario.actualizar_stock_desde_compra(nombre, kg, "kg", money(kg * Decimal("3.20"))),
+        cantidades
+    )
+
+    fila = _inventario(nombre)
+    assert fila['cantidad_stock'] == (1 + sum(cantidades)) * 1000
+    assert fila['costo_promedio_ponderado'] == Decimal("0.0032")
+
+
+def test_compras_en_paralelo_costo_ponderado(productos):
+    """
+    Mixed unit costs through save_purchase: stock is exact and the average
+    matches total spent / total quantity up to the DECIMAL(10,4) rounding of
+    each step (the commit order is unknown, so it is bounded, not replayed).
+    """
+    nombre = f"{productos} chocolate"
+    services.compras.save_purchase("granel", nombre, PROVEEDOR, cantidad=10, unidad="unit", precio_compra="12.00")
+    lineas = [(random.randint(1, 40), Decimal(random.randint(800, 1600)) / 100) for _ in range(COMPRAS)]
+
+    _en_paralelo(
+        lambda linea: services.compras.save_purchase(
+            "granel", nombre, PROVEEDOR, cantidad=linea[0], unidad="unit", precio_compra=linea[1]
+        ),
+        lineas
+    )
+
+    cantidad_total = 10 + sum(c for c, _ in lineas)
+    gastado = Decimal("120.00") + sum(money(c * p) for c, p in lineas)
+    fila = _inventario(nombre)
+    assert _compras(nombre)['n'] == COMPRAS + 1
+    assert fila['cantidad_stock'] == cantidad_total
+    assert abs(fila['costo_promedio_ponderado'] - gastado / cantidad_total) <= (COMPRAS + 1) * Decimal("0.00005")
+
+
+def test_facturas_con_productos_en_distinto_orden(productos):
+    """Invoices listing the same products in opposite order must neither deadlock nor lose stock."""
+    nombres = [f"{productos} {i}" for i in range(4)]
+    services.compras.save_purchases([
+        {'tipo': "granel", 'nombre': n, 'proveedor': PROVEEDOR, 'cantidad': 1, 'unidad': "g", 'precio_compra': "0.01"}
+        for n in nombres
+    ])
+    facturas = []
+    for i in range(COMPRAS // 4):
+        orden = nombres if i % 2 else list(reversed(nombres))
+        facturas.append([
+            {'tipo': "granel", 'nombre': n, 'proveedor': PROVEEDOR, 'cantidad': 100, 'unidad': "g", 'precio_compra': "0.01"}
+            for n in orden
+        ])
+
+    _en_paralelo(services.compras.save_purchases, facturas)
+
+    for n in nombres:
+        fila = _inventario(n)
+        assert fila['cantidad_stock'] == 1 + 100 * len(facturas)
+        assert fila['costo_promedio_ponderado'] == Decimal("0.0100")
+        assert _compras(n)['cantidad'] == 1 + 100 * len(facturas)
+
+
+def test_importaciones_con_productos_en_distinto_orden(productos, tmp_path):
+    """Same as above through ImportadorCompras: whole invoice files imported in parallel."""
+    nombres = [f"{productos} {i}" for i in range(4)]
+    services.compras.save_purchases([
+        {'tipo': "granel", 'nombre': n, 'proveedor': PROVEEDOR, 'cantidad': 1, 'unidad': "g", 'precio_compra': "0.01"}
+        for n in nombres
+    ])
+    rutas = []
+    for i in range(COMPRAS // 10):
+        ruta = tmp_path / f"factura_{i}.csv"
+        with open(ruta, "w", newline="", encoding="utf-8") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(["producto", "proveedor", "cantidad", "unidad", "precio_compra"])
+            for n in (nombres if i % 2 else reversed(nombres)):
+                escritor.writerow([n, PROVEEDOR, 100, "g", "0.01"])
+        rutas.append(str(ruta))
+
+    importador = ImportadorCompras(services.compras)
+    _en_paralelo(importador.importar, rutas)
+
+    for n in nombres:
+        fila = _inventario(n)
+        assert fila['cantidad_stock'] == 1 + 100 * len(rutas)
+        assert fila['costo_promedio_ponderado'] == Decimal("0.0100")
+        assert _compras(n)['cantidad'] == 1 + 100 * len(rutas)